@@ -38,9 +38,11 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'consultation_app',
     'rest_framework',
     'drf_spectacular',
+    'django_filters',
     'rest_framework_simplejwt',
     'rest_framework_simplejwt.token_blacklist'
 ]
@@ -115,6 +117,18 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Алгоритм хэширования паролей при регистрации: pbkdf2 (по умолчанию), scrypt или argon2 (нужен argon2-cffi).
+# Остальные хэшеры остаются в списке, чтобы проверять уже сохранённые пароли; при входе Django перехэширует их
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'pbkdf2')
+_PASSWORD_HASHERS = {
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    hasher for name, hasher in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+]
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -140,16 +154,55 @@ AUTH_USER_MODEL = 'consultation_app.User'
 
 SITE_URL = 'http://localhost:8000'
 
+# Срок действия ссылки подтверждения регистрации, секунды
+ACTIVATION_TOKEN_MAX_AGE = 60 * 60 * 24 * 3
+
+# Рендерер и парсер JSON для DRF: orjson (по умолчанию) или стандартный модуль json.
+# Формат ответов и тела ошибок у обоих одинаковые
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'orjson')
+_JSON_BACKENDS = {
+    'orjson': ('consultation_app.renderers.ORJSONRenderer', 'consultation_app.renderers.ORJSONParser'),
+    'json': ('rest_framework.renderers.JSONRenderer', 'rest_framework.parsers.JSONParser'),
+}
+JSON_RENDERER, JSON_PARSER = _JSON_BACKENDS[JSON_BACKEND]
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        JSON_RENDERER,
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        JSON_PARSER,
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'consultation_app.authentication.CachedJWTAuthentication',
     ),
 }
 
+# размер страницы для keyset-пагинации списков, клиент может уменьшить или увеличить его через ?page_size=
+PAGINATION_PAGE_SIZE = 50
+PAGINATION_MAX_PAGE_SIZE = 500
+# строк на одну порцию серверного курсора и одну часть ответа в потоковом режиме списков (?stream=true)
+LIST_STREAM_CHUNK_SIZE = 2000
+
+# максимальное количество слотов в одном запросе массового создания
+SLOT_BULK_CREATE_MAX_SIZE = 500
+
+# максимальное количество id в одном запросе массовой блокировки или разблокировки
+USER_BULK_BLOCK_MAX_SIZE = 5000
+
+# максимальный срок действия правила расписания, правила разворачиваются в слоты на лету по дням
+AVAILABILITY_RULE_MAX_DAYS = 366
+# насколько далеко от сегодняшнего дня правила разворачиваются в слоты списка: правило начинается не позже
+# чем через AVAILABILITY_RULE_MAX_DAYS дней и действует не дольше AVAILABILITY_RULE_MAX_DAYS дней
+AVAILABILITY_HORIZON_DAYS = 2 * AVAILABILITY_RULE_MAX_DAYS
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'API для записи на приём',
     'DESCRIPTION': 'API для записи на консультацию',
@@ -222,6 +275,12 @@ EMAIL_SERVER = EMAIL_HOST_USER
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 EMAIL_ADMIN = EMAIL_HOST_USER
 
+# воркер держит одно SMTP-соединение и переоткрывает его, если оно простаивало дольше (секунды)
+EMAIL_CONNECTION_MAX_IDLE = 60
+# письма, не отправленные из-за временной ошибки (обрыв, ответ 4xx), повторяются не больше N раз через паузу (секунды)
+EMAIL_SEND_MAX_RETRIES = 3
+EMAIL_SEND_RETRY_DELAY = 60
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -266,12 +325,29 @@ LOGGING = {
     }
 }
 
-# CACHES = {
-#     'default': {
-#         'BACKEND': 'django_redis.cache.RedisCache',
-#         'LOCATION': 'redis://redis:6379/1',
-#         'OPTIONS': {
-#             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
-#         }
-#     }
-# }
+# Кэш списков слотов. Без CACHE_REDIS_URL (например, в тестах) используется память процесса,
+# в этом случае инвалидация работает только в пределах одного процесса
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            }
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# как часто процесс сверяет версию списка заблокированных пользователей в общем кэше (секунды),
+# это максимальная задержка, с которой блокировка или разблокировка в другом процессе вступает в силу
+BLOCKED_USERS_SYNC_INTERVAL = 5
+
+# время жизни закэшированной страницы списка слотов, актуальность обеспечивается версиями
+SLOT_LIST_CACHE_TIMEOUT = 60 * 10
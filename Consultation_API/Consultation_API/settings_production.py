@@ -0,0 +1,52 @@
+"""
+Production settings for Consultation_API project.
+
+Base settings stay in settings.py (development, tests); this module overrides only what differs in production.
+Enable with DJANGO_SETTINGS_MODULE=Consultation_API.settings_production, served by gunicorn (gunicorn.conf.py).
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES
+
+# без DEBUG Django не копит connection.queries на каждый запрос и не отдаёт страницы отладки
+DEBUG = False
+
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+
+ALLOWED_HOSTS = [host.strip() for host in os.getenv('DJANGO_ALLOWED_HOSTS', 'localhost').split(',') if host.strip()]
+
+# Постоянные соединения с БД: поток воркера gunicorn переиспользует соединение между запросами вместо
+# подключения и авторизации в PostgreSQL на каждый запрос. Перед повторным использованием соединение
+# проверяется, поэтому обрыв (рестарт БД, таймаут на стороне сервера) не приводит к ошибке запроса.
+# Под ASGI (GUNICORN_WORKER_MODE=asgi) Django рекомендует отключать постоянные соединения: запросы к БД
+# идут из потоков sync_to_async, а не из потока запроса, поэтому там по умолчанию CONN_MAX_AGE = 0
+_DEFAULT_CONN_MAX_AGE = 0 if os.getenv('GUNICORN_WORKER_MODE') == 'asgi' else 60
+DATABASES = {
+    **DATABASES,
+    'default': {
+        **DATABASES['default'],
+        'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', _DEFAULT_CONN_MAX_AGE)),
+        'CONN_HEALTH_CHECKS': True,
+    },
+}
+
+# письма уходят в очередь воркера Celery, а не выполняются в процессе запроса
+CELERY_TASK_ALWAYS_EAGER = False
+
+# Воркеры gunicorn не делят память: с кэшем в памяти процесса версии списков слотов и список заблокированных
+# пользователей расходились бы между воркерами, поэтому в production общий кэш обязателен
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+if not CACHE_REDIS_URL:
+    raise ImproperlyConfigured('CACHE_REDIS_URL must be set in production')
+CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': CACHE_REDIS_URL,
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+        }
+    }
+}
@@ -0,0 +1,72 @@
+# Пропускная способность отправки писем через локальный фейковый SMTP-сервер:
+# отдельное соединение на каждое письмо (как send_mail) против долгоживущего соединения воркера.
+#
+#   python -m benchmarks.email_throughput --messages 200 --connect-delay 0.05
+#
+# --connect-delay имитирует SSL-рукопожатие и авторизацию на настоящем SMTP-сервере (порт 465)
+import argparse
+import logging
+import os
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Consultation_API.settings')
+django.setup()
+logging.disable(logging.INFO)
+
+from django.conf import settings  # noqa: E402
+from django.core.mail import send_mail  # noqa: E402
+
+from benchmarks.fake_smtp import FakeSMTPServer  # noqa: E402
+from consultation_app.mail import build_message, email_connection, email_payload  # noqa: E402
+from consultation_app.tasks import send_email_batch  # noqa: E402
+
+
+def payloads(count):
+    return [email_payload(f'client_{i}@example.com', 'consultation_rejected') for i in range(count)]
+
+
+def send_one_by_one(messages):
+    for payload in messages:
+        message = build_message(payload)
+        send_mail(message.subject, message.body, settings.DEFAULT_FROM_EMAIL, message.to)
+
+
+def send_pooled(messages):
+    for payload in messages:
+        send_email_batch([payload])
+
+
+def send_batched(messages):
+    send_email_batch(messages)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--connect-delay', type=float, default=0.05)
+    args = parser.parse_args()
+
+    with FakeSMTPServer(connect_delay=args.connect_delay) as server:
+        settings.EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+        settings.EMAIL_HOST = '127.0.0.1'
+        settings.EMAIL_PORT = server.port
+        settings.EMAIL_USE_SSL = False
+        settings.EMAIL_HOST_USER = settings.EMAIL_HOST_PASSWORD = ''
+        settings.DEFAULT_FROM_EMAIL = 'noreply@example.com'
+
+        for name, send in (('send_mail per message', send_one_by_one),
+                           ('pooled connection, task per message', send_pooled),
+                           ('pooled connection, one batch task', send_batched)):
+            email_connection.close()
+            connections, messages = server.connections, server.messages
+            started = time.perf_counter()
+            send(payloads(args.messages))
+            elapsed = time.perf_counter() - started
+            print(f'{name:40} {args.messages / elapsed:10.1f} msg/s  '
+                  f'connections: {server.connections - connections}, delivered: {server.messages - messages}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import socketserver
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    # Минимальный SMTP-сервер: принимает письма и ничего с ними не делает.
+    # connect_delay имитирует SSL-рукопожатие и авторизацию на настоящем сервере
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        time.sleep(server.connect_delay)
+        self.reply('220 fake-smtp ready')
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250-fake-smtp', '250 8BITMIME')
+            elif command.startswith('RCPT'):
+                address = command.partition(':')[2].strip().strip('<>').lower()
+                with server.lock:
+                    server.recipients.append(address)
+                self.reply(server.refused.get(address, '250 OK'))
+            elif command.startswith('DATA'):
+                self.reply('354 end data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                with server.lock:
+                    server.messages += 1
+                self.reply('250 OK')
+            elif command.startswith('QUIT'):
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 OK')
+
+    def reply(self, *lines: str) -> None:
+        self.wfile.write(''.join(f'{line}\r\n' for line in lines).encode())
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, connect_delay: float = 0.0, refused: Optional[Dict[str, str]] = None):
+        super().__init__(('127.0.0.1', 0), FakeSMTPHandler)
+        self.connect_delay = connect_delay
+        # адрес -> ответ сервера на RCPT TO, например '550 mailbox unavailable'
+        self.refused = {address.lower(): reply for address, reply in (refused or {}).items()}
+        self.recipients: List[str] = []
+        self.connections = 0
+        self.messages = 0
+        self.lock = threading.Lock()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def __enter__(self) -> 'FakeSMTPServer':
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+        self.server_close()
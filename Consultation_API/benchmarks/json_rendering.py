@@ -0,0 +1,68 @@
+# Микробенчмарк рендерера и парсера JSON на страницах списка слотов клиента (ClientSlotListSerializer):
+# стандартные JSONRenderer/JSONParser DRF против ORJSONRenderer/ORJSONParser. БД не нужна, слоты строятся в памяти.
+#
+#   python -m benchmarks.json_rendering --rows 50 500 10000 --number 200
+import argparse
+import os
+import timeit
+from datetime import date, time, timedelta
+from io import BytesIO
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Consultation_API.settings')
+django.setup()
+
+from rest_framework.parsers import JSONParser  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from consultation_app.models import Slot, User  # noqa: E402
+from consultation_app.renderers import ORJSONParser, ORJSONRenderer  # noqa: E402
+from consultation_app.serializers import ClientSlotListSerializer  # noqa: E402
+
+
+def page(rows):
+    # ответ списка клиента: реальные и виртуальные слоты разных специалистов, контекст на кириллице
+    specialists = [User(id=i, username=f'specialist_{i}') for i in range(1, 21)]
+    slots = []
+    for i in range(rows):
+        start = 8 + i % 10
+        slot = Slot(id=i + 1 if i % 4 else None, specialist=specialists[i % len(specialists)],
+                    date=date(2024, 9, 23) + timedelta(days=i // 200), start_time=time(start, 0),
+                    end_time=time(start, 30 if i % 2 else 45), context='Первичная консультация' if i % 3 else None)
+        slot.duration = timedelta(minutes=30 if i % 2 else 45)
+        slot.rule_id = None if i % 4 else i % 7 + 1
+        slots.append(slot)
+    return {'next': 'http://localhost:8000/api/client_slots/?cursor=eyJwIjpbIjIwMjQtMDktMjMiXX0=', 'previous': None,
+            'results': ClientSlotListSerializer(slots, many=True).data}
+
+
+def per_call_us(statement, number):
+    return min(timeit.repeat(statement, number=number, repeat=3)) / number * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[50, 500, 10000])
+    parser.add_argument('--number', type=int, default=200)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        data = page(rows)
+        body = JSONRenderer().render(data)
+        assert ORJSONRenderer().render(data) == body
+        assert ORJSONParser().parse(BytesIO(body)) == JSONParser().parse(BytesIO(body))
+        # на больших страницах меньше повторов, чтобы замер укладывался в секунды
+        number = max(args.number * 50 // rows, 5) if rows > 50 else args.number
+
+        for name, stdlib, fast in (
+            ('render', lambda: JSONRenderer().render(data), lambda: ORJSONRenderer().render(data)),
+            ('parse', lambda: JSONParser().parse(BytesIO(body)), lambda: ORJSONParser().parse(BytesIO(body))),
+        ):
+            stdlib_us, fast_us = per_call_us(stdlib, number), per_call_us(fast, number)
+            print(f'{name:6} {rows:>6} rows ({len(body) / 1024:8.1f} KiB)   json {stdlib_us:10.1f} us   '
+                  f'orjson {fast_us:10.1f} us   x{stdlib_us / fast_us:.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# Рендеринг списков слотов и консультаций: сериализаторы DRF по моделям против быстрого пути
+# через .values() (consultation_app/rows.py). Измеряется выборка строк и построение JSON-совместимых данных
+# без HTTP. Данные генерируются внутри транзакции, которая в конце откатывается.
+#
+#   python -m benchmarks.list_rendering --rows 1000 10000 100000 --repeat 3
+import argparse
+import logging
+import os
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Consultation_API.settings')
+django.setup()
+logging.disable(logging.INFO)
+
+from django.db import connection, transaction  # noqa: E402
+
+from consultation_app.models import Consultation, Slot, User  # noqa: E402
+from consultation_app.rows import (ClientConsultationRows, ClientSlotRows, SpecialistConsultationRows,  # noqa: E402
+                                   SpecialistSlotRows)
+from consultation_app.serializers import (ClientConsultationListSerializer, ClientSlotListSerializer,  # noqa: E402
+                                          SpecialistConsultationListSerializer, SpecialistSlotListSerializer)
+
+SLOTS_PER_DAY = 10
+
+
+class Rollback(Exception):
+    pass
+
+
+def seed(rows):
+    specialist = User.objects.create_user(username='bench_specialist', email='bench_specialist@example.com',
+                                          role='Specialist', is_active=True)
+    client = User.objects.create_user(username='bench_client', email='bench_client@example.com',
+                                      role='Client', is_active=True)
+    slot_table = Slot._meta.db_table
+    consultation_table = Consultation._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {slot_table} (specialist_id, date, start_time, end_time, context, is_available) '
+            f'SELECT %s, CURRENT_DATE + 1 + k / {SLOTS_PER_DAY}, '
+            f"time '08:00' + (k %% {SLOTS_PER_DAY}) * interval '1 hour', "
+            f"time '08:30' + (k %% {SLOTS_PER_DAY}) * interval '1 hour', "
+            f"'Some context here', true FROM generate_series(0, %s) AS k",
+            [specialist.id, rows - 1]
+        )
+        # на каждый слот по консультации клиента со всеми статусами по кругу
+        cursor.execute(
+            f'INSERT INTO {consultation_table} (slot_id, client_id, is_canceled, cancel_comment, '
+            f'cancel_reason_choice, is_completed, status) '
+            f"SELECT s.id, %s, false, '', '', false, (ARRAY['Pending', 'Rejected'])[s.id %% 2 + 1] "
+            f'FROM {slot_table} AS s WHERE s.specialist_id = %s',
+            [client.id, specialist.id]
+        )
+        cursor.execute(f'ANALYZE {slot_table}')
+        cursor.execute(f'ANALYZE {consultation_table}')
+    return specialist, client
+
+
+def lists(specialist, client):
+    # (название, queryset как в представлении, сериализатор, быстрый путь)
+    return [
+        ('specialist slots',
+         Slot.objects.filter(specialist=specialist).for_specialist_list().order_by('date', 'start_time', 'id'),
+         SpecialistSlotListSerializer, SpecialistSlotRows),
+        ('client slots',
+         Slot.objects.available_for_booking().for_client_list().order_by('date', 'start_time', 'specialist_id'),
+         ClientSlotListSerializer, ClientSlotRows),
+        ('specialist consultations',
+         Consultation.objects.filter(slot__specialist=specialist).for_specialist_list()
+         .order_by('slot__date', 'slot__start_time', 'id'),
+         SpecialistConsultationListSerializer, SpecialistConsultationRows),
+        ('client consultations',
+         Consultation.objects.filter(client=client).for_client_list().order_by('slot__date', 'slot__start_time', 'id'),
+         ClientConsultationListSerializer, ClientConsultationRows),
+    ]
+
+
+def best_of(repeat, render):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        data = render()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000, data
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    try:
+        with transaction.atomic():
+            specialist, client = seed(max(args.rows))
+            for name, queryset, serializer_class, list_rows in lists(specialist, client):
+                for rows in args.rows:
+                    serializer_ms, expected = best_of(
+                        args.repeat, lambda: serializer_class(list(queryset[:rows]), many=True).data)
+                    fast_ms, data = best_of(
+                        args.repeat, lambda: list_rows.render(list(list_rows.values(queryset)[:rows])))
+                    assert data == expected, name
+                    print(f'{name:25} {rows:>7} rows   serializer {serializer_ms:9.1f} ms   '
+                          f'values {fast_ms:9.1f} ms   x{serializer_ms / fast_ms:.1f}')
+            raise Rollback
+    except Rollback:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+# Нагрузочный тест: одна и та же смесь запросов к нескольким уже запущенным серверам, пропускная способность
+# и задержки каждого относительно первого (базового) сервера. Например, runserver против gunicorn:
+#
+#   python manage.py runserver 0.0.0.0:8000
+#   DJANGO_SETTINGS_MODULE=Consultation_API.settings_production gunicorn -c gunicorn.conf.py --bind 0.0.0.0:8002
+#   python -m benchmarks.load_test --setup --target runserver=http://localhost:8000 \
+#       --target gunicorn=http://localhost:8002 --concurrency 32 --duration 20
+#
+# Режимы воркеров gunicorn сравниваются так же: по умолчанию запрашиваются асинхронные списки, поэтому замер
+# показывает, во что им обходится async_to_sync под WSGI по сравнению с uvicorn:
+#
+#   GUNICORN_WORKER_MODE=asgi gunicorn -c gunicorn.conf.py --bind 0.0.0.0:8011
+#   GUNICORN_WORKER_MODE=wsgi gunicorn -c gunicorn.conf.py --bind 0.0.0.0:8012
+#   python -m benchmarks.load_test --setup --target asgi=http://localhost:8011 --target wsgi=http://localhost:8012
+#
+# --setup создаёт (или переиспользует) клиента и специалиста со слотами и консультациями через ORM, поэтому
+# скрипт должен видеть ту же БД, что и серверы. --cleanup удаляет их после замера.
+import argparse
+import http.client
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+USERNAME = 'load_test_client'
+SPECIALIST_USERNAME = 'load_test_specialist'
+PASSWORD = 'load-test-password'
+# асинхронные представления (async_views.AsyncListAPIView)
+DEFAULT_PATHS = [
+    '/api/client_slots/',
+    '/api/client_slots/?min_duration=00:45:00',
+    '/api/client_consultations/',
+]
+
+
+def django_setup():
+    import os
+
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Consultation_API.settings')
+    django.setup()
+
+
+def setup_data(slots):
+    django_setup()
+    from datetime import time as dt_time, timedelta
+
+    from django.utils import timezone
+
+    from consultation_app.models import Consultation, Slot, User
+
+    client, _ = User.objects.get_or_create(username=USERNAME, defaults={
+        'email': f'{USERNAME}@example.com', 'role': 'Client', 'is_active': True})
+    client.set_password(PASSWORD)
+    client.save(update_fields=['password'])
+    specialist, _ = User.objects.get_or_create(username=SPECIALIST_USERNAME, defaults={
+        'email': f'{SPECIALIST_USERNAME}@example.com', 'role': 'Specialist', 'is_active': True})
+
+    if not Slot.objects.filter(specialist=specialist).exists():
+        tomorrow = timezone.now().date() + timedelta(days=1)
+        Slot.objects.bulk_create([
+            Slot(specialist=specialist, date=tomorrow + timedelta(days=i // 10), start_time=dt_time(8 + i % 10, 0),
+                 end_time=dt_time(8 + i % 10, 30 if i % 2 else 45), context='Первичная консультация')
+            for i in range(slots)
+        ])
+        Consultation.objects.bulk_create([
+            Consultation(slot=slot, client=client) for slot in Slot.objects.filter(specialist=specialist)[:50]
+        ])
+
+
+def cleanup_data():
+    django_setup()
+    from consultation_app.models import User
+
+    User.objects.filter(username__in=[USERNAME, SPECIALIST_USERNAME]).delete()
+
+
+def connect(base_url):
+    parts = urlsplit(base_url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    return connection_class(parts.hostname, parts.port, timeout=30)
+
+
+def obtain_token(base_url):
+    connection = connect(base_url)
+    connection.request('POST', '/api/token/', json.dumps({'username': USERNAME, 'password': PASSWORD}),
+                       {'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    body = response.read()
+    connection.close()
+    if response.status != 200:
+        raise SystemExit(f'{base_url}: cannot obtain token ({response.status}): {body[:200]!r}')
+    return json.loads(body)['access']
+
+
+def run_worker(base_url, token, paths, deadline, offset):
+    # одно keep-alive соединение на виртуального пользователя, запросы по кругу
+    connection = connect(base_url)
+    headers = {'Authorization': f'Bearer {token}'}
+    timings, errors = [], 0
+    i = offset
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            connection.request('GET', paths[i % len(paths)], headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors += 1
+            elif response.getheader('Connection', '').lower() == 'close':
+                connection.close()
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            connection = connect(base_url)
+            continue
+        timings.append(time.perf_counter() - started)
+        i += 1
+    connection.close()
+    return timings, errors
+
+
+def measure(base_url, paths, concurrency, duration, warmup):
+    token = obtain_token(base_url)
+    # прогрев: процессы сервера открывают соединения с БД и заполняют кэши
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(lambda n: run_worker(base_url, token, paths, time.perf_counter() + warmup, n),
+                      range(concurrency)))
+
+    barrier = threading.Barrier(concurrency)
+
+    def worker(n):
+        barrier.wait()
+        return run_worker(base_url, token, paths, time.perf_counter() + duration, n)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    timings = sorted(t for worker_timings, _ in results for t in worker_timings)
+    errors = sum(worker_errors for _, worker_errors in results)
+    if not timings:
+        raise SystemExit(f'{base_url}: no successful requests, errors: {errors}')
+    return {
+        'rps': len(timings) / elapsed,
+        'p50': statistics.median(timings) * 1000,
+        'p99': timings[max(int(len(timings) * 0.99) - 1, 0)] * 1000,
+        'requests': len(timings),
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--target', action='append', required=True,
+                        help='name=base_url, первый target - базовый для сравнения')
+    parser.add_argument('--path', action='append', help='пути запросов (по умолчанию списки клиента)')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--setup', action='store_true')
+    parser.add_argument('--slots', type=int, default=500)
+    parser.add_argument('--cleanup', action='store_true')
+    args = parser.parse_args()
+
+    if args.setup:
+        setup_data(args.slots)
+    targets = [target.split('=', 1) for target in args.target]
+    paths = args.path or DEFAULT_PATHS
+
+    baseline = None
+    try:
+        for name, base_url in targets:
+            result = measure(base_url, paths, args.concurrency, args.duration, args.warmup)
+            baseline = baseline or result['rps']
+            print(f'{name:15} {result["rps"]:9.1f} req/s  x{result["rps"] / baseline:<5.2f} '
+                  f'p50 {result["p50"]:8.1f} ms  p99 {result["p99"]:8.1f} ms  '
+                  f'requests {result["requests"]}, errors {result["errors"]}')
+    finally:
+        if args.cleanup:
+            cleanup_data()
+
+
+if __name__ == '__main__':
+    main()
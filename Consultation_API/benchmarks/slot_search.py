@@ -0,0 +1,125 @@
+# Задержка списка свободных слотов клиента с фильтрами на большой таблице слотов.
+# Данные генерируются одним INSERT ... SELECT generate_series внутри транзакции, которая в конце откатывается,
+# поэтому скрипт можно запускать на рабочей БД разработчика.
+#
+#   python -m benchmarks.slot_search --slots 1000000 --specialists 1000 --requests 200
+import argparse
+import logging
+import os
+import random
+import statistics
+import time
+from datetime import timedelta
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Consultation_API.settings')
+django.setup()
+logging.disable(logging.INFO)
+
+from django.conf import settings  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from consultation_app.models import Slot, User  # noqa: E402
+
+SLOTS_PER_DAY = 10
+
+
+class Rollback(Exception):
+    pass
+
+
+def seed(slots, specialists):
+    user_table = User._meta.db_table
+    slot_table = Slot._meta.db_table
+    per_specialist = slots // specialists
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {user_table} (password, is_superuser, username, first_name, last_name, email, '
+            f'is_staff, is_active, date_joined, role, is_blocked) '
+            f"SELECT '', false, 'bench_specialist_' || n, '', '', 'bench_' || n || '@example.com', "
+            f"false, true, now(), 'Specialist', false FROM generate_series(1, %s) AS n RETURNING id",
+            [specialists]
+        )
+        specialist_ids = [row[0] for row in cursor.fetchall()]
+        # слоты по часу с 8:00, длительность 30 или 60 минут, примерно каждый пятый уже занят
+        cursor.execute(
+            f'INSERT INTO {slot_table} (specialist_id, date, start_time, end_time, context, is_available) '
+            f'SELECT s.id, CURRENT_DATE + 1 + k / {SLOTS_PER_DAY}, '
+            f"time '08:00' + (k %% {SLOTS_PER_DAY}) * interval '1 hour', "
+            f"time '08:00' + (k %% {SLOTS_PER_DAY}) * interval '1 hour' "
+            f"+ ((s.id + k) %% 2 + 1) * interval '30 minutes', "
+            f'NULL, (s.id + k) %% 5 <> 0 '
+            f'FROM unnest(%s::bigint[]) AS s(id), generate_series(0, %s) AS k',
+            [specialist_ids, per_specialist - 1]
+        )
+        cursor.execute(f'ANALYZE {user_table}')
+        cursor.execute(f'ANALYZE {slot_table}')
+    days = per_specialist // SLOTS_PER_DAY
+    return specialist_ids, days
+
+
+def scenarios(specialist_ids, days):
+    today = timezone.now().date()
+
+    def some_day():
+        return today + timedelta(days=random.randint(1, max(days, 1)))
+
+    return [
+        ('no filters', lambda: {}),
+        ('specialist', lambda: {'specialist': random.choice(specialist_ids)}),
+        ('date range', lambda: (lambda day: {'date_from': day, 'date_to': day + timedelta(days=7)})(some_day())),
+        ('time window', lambda: {'time_from': '12:00', 'time_to': '15:00'}),
+        ('min duration', lambda: {'min_duration': '01:00:00'}),
+        ('all filters', lambda: (lambda day: {
+            'date_from': day, 'date_to': day + timedelta(days=30), 'time_from': '09:00', 'time_to': '18:00',
+            'min_duration': '01:00:00',
+        })(some_day())),
+    ]
+
+
+def measure(client, params, requests):
+    url = reverse('client-slots')
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = client.get(url, params())
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.data
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--slots', type=int, default=1_000_000)
+    parser.add_argument('--specialists', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    # ответы не кэшируются, измеряется путь до БД
+    settings.SLOT_LIST_CACHE_TIMEOUT = 0
+    settings.ALLOWED_HOSTS = ['testserver']
+    try:
+        with transaction.atomic():
+            started = time.perf_counter()
+            specialist_ids, days = seed(args.slots, args.specialists)
+            print(f'seeded {args.slots} slots in {time.perf_counter() - started:.1f}s')
+
+            client_user = User.objects.create_user(username='bench_client', email='bench_client@example.com',
+                                                   role='Client', is_active=True)
+            client = APIClient()
+            client.force_authenticate(user=client_user)
+            for name, params in scenarios(specialist_ids, days):
+                p50, p99 = measure(client, params, args.requests)
+                print(f'{name:15} p50 {p50:7.1f} ms   p99 {p99:7.1f} ms')
+            raise Rollback
+    except Rollback:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -33,10 +33,15 @@ admin.site.register(User, UserAdmin)
 class SlotAdmin(admin.ModelAdmin):
     list_display = ['id', 'specialist', 'date', 'start_time', 'end_time', 'duration']
     list_display_links = ['specialist']
-    exclude = ('duration',)
 
 
 @admin.register(Consultation)
 class ConsultationAdmin(admin.ModelAdmin):
     list_display = ['slot', 'client', 'is_canceled', 'status']
     list_display_links = ['slot']
+
+
+@admin.register(AvailabilityRule)
+class AvailabilityRuleAdmin(admin.ModelAdmin):
+    list_display = ['id', 'specialist', 'weekdays', 'start_time', 'end_time', 'slot_duration', 'start_date', 'end_date']
+    list_display_links = ['specialist']
@@ -0,0 +1,60 @@
+import asyncio
+from typing import Any
+
+from django.http.response import HttpResponseBase
+from rest_framework.generics import ListAPIView
+from rest_framework.request import Request
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    # APIView с асинхронным dispatch: под ASGI обработчики (async def get) выполняются в цикле событий
+    # без отдельного потока на запрос. Аутентификация, разрешения и обработка ошибок - те же, что у APIView;
+    # единственный запрос к БД в них (загрузка пользователя по JWT) выполняется через async ORM до initial()
+    # Django определяет асинхронность по обработчикам, а extend_schema_view оборачивает их в синхронные
+    # функции, возвращающие корутину, поэтому признак задаётся явно
+    view_is_async = True
+
+    async def dispatch(self, request, *args, **kwargs) -> HttpResponseBase:
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            # OPTIONS и 405 остаются синхронными обработчиками APIView
+            if asyncio.iscoroutine(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request: Request, *args, **kwargs) -> None:
+        for authenticator in request.authenticators:
+            if hasattr(authenticator, 'aload_user'):
+                await authenticator.aload_user(request)
+        self.initial(request, *args, **kwargs)
+
+
+class AsyncListAPIView(AsyncAPIView, ListAPIView):
+    # список строится методом alist (rows.FastListMixin, cache.VersionedCacheListMixin)
+
+    async def get(self, request: Request, *args, **kwargs) -> Any:
+        return await self.alist(request, *args, **kwargs)
+
+    async def apaginate_queryset(self, queryset) -> Any:
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(queryset, self.request, view=self)
@@ -0,0 +1,99 @@
+from typing import Optional, Tuple
+
+from django.http import HttpRequest
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import Token
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import User
+
+TOKEN_ATTR = '_jwt_validated_token'
+AUTH_RESULT_ATTR = '_jwt_auth_result'
+
+
+def has_auth_header(request: HttpRequest) -> bool:
+    return api_settings.AUTH_HEADER_NAME in request.META
+
+
+def _cached(http_request: HttpRequest, attr: str, compute):
+    # результат (или ошибка аутентификации) сохраняется на HttpRequest и переиспользуется
+    if not hasattr(http_request, attr):
+        try:
+            result = compute()
+        except AuthenticationFailed as exc:
+            result = exc
+        setattr(http_request, attr, result)
+
+    result = getattr(http_request, attr)
+    if isinstance(result, AuthenticationFailed):
+        raise result
+    return result
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    # BlockedUserMiddleware проверяет подпись токена и читает из него user_id,
+    # DRF берёт уже проверенный токен и загружает пользователя: каждый шаг выполняется один раз за запрос
+    def get_request_token(self, request) -> Optional[Token]:
+        def validate() -> Optional[Token]:
+            header = self.get_header(request)
+            if header is None:
+                return None
+            raw_token = self.get_raw_token(header)
+            if raw_token is None:
+                return None
+            return self.get_validated_token(raw_token)
+
+        return _cached(getattr(request, '_request', request), TOKEN_ATTR, validate)
+
+    def authenticate(self, request) -> Optional[Tuple[User, Token]]:
+        def load_user() -> Optional[Tuple[User, Token]]:
+            validated_token = self.get_request_token(request)
+            if validated_token is None:
+                return None
+            return self.get_user(validated_token), validated_token
+
+        return _cached(getattr(request, '_request', request), AUTH_RESULT_ATTR, load_user)
+
+    async def aload_user(self, request) -> None:
+        # Асинхронные представления загружают пользователя через async ORM заранее и кладут результат
+        # туда же, где его ищет authenticate(), поэтому синхронная аутентификация DRF не обращается к БД.
+        # Ошибки сохраняются и поднимаются из authenticate(), как и в синхронном пути
+        http_request = getattr(request, '_request', request)
+        if hasattr(http_request, AUTH_RESULT_ATTR):
+            return
+        try:
+            validated_token = self.get_request_token(request)
+            result = None if validated_token is None else (await self.aget_user(validated_token), validated_token)
+        except AuthenticationFailed as exc:
+            result = exc
+        setattr(http_request, AUTH_RESULT_ATTR, result)
+
+    async def aget_user(self, validated_token: Token) -> User:
+        # повторяет JWTAuthentication.get_user
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        try:
+            user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+
+        return user
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    target_class = 'consultation_app.authentication.CachedJWTAuthentication'
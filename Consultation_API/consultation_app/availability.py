@@ -0,0 +1,104 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Any, Callable, Iterator, List, Optional, Sequence
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import AvailabilityRule, Slot
+
+if TYPE_CHECKING:
+    from .filters import ClientSlotFilter
+
+
+def _active_days(rules: List[AvailabilityRule], first_day: date, last_day: date, reverse: bool) -> Iterator[date]:
+    # дни, в которые действует хотя бы одно правило: от дня к дню переходим сразу к ближайшему дню действия
+    # какого-либо правила, а не перебираем все календарные дни между далеко отстоящими правилами
+    step = timedelta(days=-1 if reverse else 1)
+    day = first_day
+    while (day >= last_day) if reverse else (day <= last_day):
+        days = [active_day for active_day in (rule.next_active_day(day, reverse) for rule in rules)
+                if active_day is not None]
+        if not days:
+            return
+        day = max(days) if reverse else min(days)
+        if (day < last_day) if reverse else (day > last_day):
+            return
+        yield day
+        day += step
+
+
+def _without_taken(slots: List[Slot]) -> List[Slot]:
+    # виртуальный слот скрывается, если пересекается с любым реальным слотом специалиста,
+    # в том числе с уже созданным из него самого при записи на консультацию
+    if not slots:
+        return slots
+    taken = defaultdict(list)
+    for specialist_id, day, start_time, end_time in Slot.objects.filter(
+        specialist_id__in={slot.specialist_id for slot in slots},
+        date__range=(min(slot.date for slot in slots), max(slot.date for slot in slots)),
+    ).values_list('specialist_id', 'date', 'start_time', 'end_time'):
+        taken[specialist_id, day].append((start_time, end_time))
+
+    return [
+        slot for slot in slots
+        if not any(start_time < slot.end_time and end_time > slot.start_time
+                   for start_time, end_time in taken[slot.specialist_id, slot.date])
+    ]
+
+
+def virtual_slots(position: Optional[Sequence[Any]], reverse: bool, limit: int,
+                  key: Callable[[Slot], List[Any]], slot_filter: Optional['ClientSlotFilter'] = None) -> List[Slot]:
+    # Разворачивает правила в виртуальные слоты, начиная с позиции курсора, по дням, пока не наберётся limit.
+    # Возвращает их в порядке key (по убыванию при reverse), чтобы их можно было слить со страницей реальных слотов
+    now = timezone.now()
+    today = now.date()
+    # правила разворачиваются не дальше горизонта: один запрос перебирает ограниченное число дней,
+    # даже если правила, созданные до ограничения даты начала, отстоят далеко в будущее
+    horizon = today + timedelta(days=settings.AVAILABILITY_HORIZON_DAYS)
+    rules = AvailabilityRule.objects.filter(end_date__gte=today, start_date__lte=horizon)
+    date_from, date_to = None, None
+    if slot_filter is not None:
+        rules = slot_filter.filter_rules(rules)
+        date_from, date_to = slot_filter.date_bounds()
+    rules = list(rules.select_related('specialist').only(
+        'id', 'weekdays', 'start_time', 'end_time', 'slot_duration', 'start_date', 'end_date', 'context',
+        'specialist', 'specialist__username'
+    ))
+    if not rules:
+        return []
+
+    # фильтр по датам сужает перебираемые дни, а не отбрасывает слоты после разворачивания
+    earliest = max(today, min(rule.start_date for rule in rules), date_from or today)
+    latest = min(max(rule.end_date for rule in rules), date_to or date.max, horizon)
+    if reverse:
+        first_day, last_day = min(position[0], latest), earliest
+    else:
+        first_day = max(earliest, position[0]) if position is not None else earliest
+        last_day = latest
+
+    result: List[Slot] = []
+    pending: List[Slot] = []
+    for day in _active_days(rules, first_day, last_day, reverse):
+        day_slots = {}
+        for rule in rules:
+            for slot in rule.iter_slots(day):
+                if day == today and slot.start_time < now.time():
+                    continue
+                if slot_filter is not None and not slot_filter.matches(slot):
+                    continue
+                if position is not None and (key(slot) >= position if reverse else key(slot) <= position):
+                    continue
+                # пересекающиеся правила одного специалиста не должны давать дубли позиции
+                day_slots.setdefault(tuple(key(slot)), slot)
+        pending.extend(sorted(day_slots.values(), key=key, reverse=reverse))
+
+        # занятость проверяется одним запросом на набранную пачку дней
+        if len(result) + len(pending) >= limit:
+            result.extend(_without_taken(pending))
+            pending = []
+            if len(result) >= limit:
+                break
+
+    result.extend(_without_taken(pending))
+    return result[:limit]
@@ -0,0 +1,66 @@
+import time
+from typing import FrozenSet, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import User
+
+VERSION_KEY = 'blocked_users:version'
+
+
+class BlockedUserRegistry:
+    # Множество id заблокированных пользователей в памяти процесса. Процесс сверяет версию в общем кэше
+    # не чаще раза в BLOCKED_USERS_SYNC_INTERVAL секунд и перечитывает id из БД, только если версия изменилась
+    def __init__(self):
+        self._ids: FrozenSet[int] = frozenset()
+        self._version: Optional[int] = None
+        self._checked_at = 0.0
+
+    def is_blocked(self, user_id: int) -> bool:
+        self.sync()
+        return user_id in self._ids
+
+    async def ais_blocked(self, user_id: int) -> bool:
+        # сверка с кэшем и БД нужна раз в BLOCKED_USERS_SYNC_INTERVAL, остальные запросы не покидают цикл событий
+        if self._sync_due():
+            await sync_to_async(self.sync)()
+        return user_id in self._ids
+
+    def _sync_due(self) -> bool:
+        return self._version is None or time.monotonic() - self._checked_at >= settings.BLOCKED_USERS_SYNC_INTERVAL
+
+    def sync(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and not self._sync_due():
+            return
+
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+            version = cache.get(VERSION_KEY)
+        if version != self._version:
+            self._ids = frozenset(User.objects.filter(is_blocked=True).values_list('id', flat=True))
+            self._version = version
+        self._checked_at = now
+
+    def changed(self) -> None:
+        def bump() -> None:
+            try:
+                cache.incr(VERSION_KEY)
+            except ValueError:
+                cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+            # текущий процесс видит изменение сразу, остальные - при следующей сверке версии
+            self.sync(force=True)
+
+        transaction.on_commit(bump)
+
+    def reset(self) -> None:
+        self._ids = frozenset()
+        self._version = None
+        self._checked_at = 0.0
+
+
+blocked_users = BlockedUserRegistry()
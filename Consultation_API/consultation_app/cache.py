@@ -0,0 +1,101 @@
+import hashlib
+import time
+from typing import Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+# Версия списка всех доступных слотов и версии списков слотов каждого специалиста.
+# Ключ закэшированного ответа содержит версию, поэтому изменение слота делает старые записи недостижимыми,
+# а сами они вытесняются по таймауту.
+GLOBAL_SLOTS_SCOPE = 'all'
+
+
+def _version_key(scope: str) -> str:
+    return f'slots:version:{scope}'
+
+
+def specialist_scope(specialist_id: int) -> str:
+    return f'specialist:{specialist_id}'
+
+
+def get_slots_version(scope: str) -> int:
+    key = _version_key(scope)
+    version = cache.get(key)
+    if version is None:
+        # начальная версия берётся из времени, чтобы после вытеснения ключа версии
+        # не совпасть с версией ещё живых записей
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_slots_version(scope: str) -> int:
+    key = _version_key(scope)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_slots_version(specialist_ids: Iterable[int]) -> None:
+    scopes = [GLOBAL_SLOTS_SCOPE] + [specialist_scope(specialist_id) for specialist_id in set(specialist_ids)]
+
+    def bump() -> None:
+        for scope in scopes:
+            try:
+                cache.incr(_version_key(scope))
+            except ValueError:
+                cache.add(_version_key(scope), time.time_ns(), timeout=None)
+
+    # версия меняется только после коммита, иначе параллельный запрос может закэшировать
+    # ещё не изменённые данные под новой версией
+    transaction.on_commit(bump)
+
+
+class VersionedCacheListMixin:
+    cache_prefix = 'slots:list'
+    # область версии: список слотов текущего специалиста или общий список доступных слотов
+    cache_per_specialist = False
+
+    def get_cache_scope(self) -> str:
+        if self.cache_per_specialist:
+            return specialist_scope(self.request.user.id)
+        return GLOBAL_SLOTS_SCOPE
+
+    def get_cache_timeout(self) -> int:
+        return settings.SLOT_LIST_CACHE_TIMEOUT
+
+    def get_list_cache_key(self, request: Request, version: int) -> str:
+        url_hash = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+        return f'{self.cache_prefix}:{self.get_cache_scope()}:{version}:{url_hash}'
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        key = self.get_list_cache_key(request, get_slots_version(self.get_cache_scope()))
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        # потоковые ответы (FastListMixin, ?stream=true) не кэшируются
+        timeout = 0 if response.streaming else self.get_cache_timeout()
+        if timeout > 0:
+            cache.set(key, response.data, timeout=timeout)
+        return response
+
+    async def alist(self, request: Request, *args, **kwargs) -> Response:
+        # то же для асинхронных представлений (async_views.AsyncListAPIView)
+        key = self.get_list_cache_key(request, await aget_slots_version(self.get_cache_scope()))
+        data = await cache.aget(key)
+        if data is not None:
+            return Response(data)
+
+        response = await super().alist(request, *args, **kwargs)
+        timeout = 0 if response.streaming else self.get_cache_timeout()
+        if timeout > 0:
+            await cache.aset(key, response.data, timeout=timeout)
+        return response
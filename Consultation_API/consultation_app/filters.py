@@ -0,0 +1,50 @@
+from datetime import date
+from typing import Optional, Tuple
+
+import django_filters
+from django.db.models import QuerySet
+
+from .models import Slot
+
+
+class ClientSlotFilter(django_filters.FilterSet):
+    # Фильтры списка свободных слотов. Те же условия применяются к виртуальным слотам из правил расписания
+    # (filter_rules и matches), поэтому страница остаётся согласованной при слиянии реальных и виртуальных слотов
+    specialist = django_filters.NumberFilter(field_name='specialist_id', label='id специалиста')
+    date_from = django_filters.DateFilter(field_name='date', lookup_expr='gte', label='Дата не раньше')
+    date_to = django_filters.DateFilter(field_name='date', lookup_expr='lte', label='Дата не позже')
+    time_from = django_filters.TimeFilter(field_name='start_time', lookup_expr='gte', label='Начало не раньше')
+    time_to = django_filters.TimeFilter(field_name='end_time', lookup_expr='lte', label='Окончание не позже')
+    min_duration = django_filters.DurationFilter(field_name='duration', lookup_expr='gte',
+                                                 label='Минимальная длительность')
+
+    class Meta:
+        model = Slot
+        fields = ['specialist', 'date_from', 'date_to', 'time_from', 'time_to', 'min_duration']
+
+    def date_bounds(self) -> Tuple[Optional[date], Optional[date]]:
+        return self.form.cleaned_data.get('date_from'), self.form.cleaned_data.get('date_to')
+
+    def filter_rules(self, rules: QuerySet) -> QuerySet:
+        # отсекает в БД правила, которые не могут дать ни одного подходящего слота
+        data = self.form.cleaned_data
+        if data.get('specialist') is not None:
+            rules = rules.filter(specialist_id=data['specialist'])
+        if data.get('date_from'):
+            rules = rules.filter(end_date__gte=data['date_from'])
+        if data.get('date_to'):
+            rules = rules.filter(start_date__lte=data['date_to'])
+        if data.get('time_from'):
+            rules = rules.filter(end_time__gt=data['time_from'])
+        if data.get('time_to'):
+            rules = rules.filter(start_time__lt=data['time_to'])
+        if data.get('min_duration'):
+            rules = rules.filter(slot_duration__gte=data['min_duration'])
+        return rules
+
+    def matches(self, slot: Slot) -> bool:
+        data = self.form.cleaned_data
+        return not (
+            (data.get('time_from') and slot.start_time < data['time_from'])
+            or (data.get('time_to') and slot.end_time > data['time_to'])
+        )
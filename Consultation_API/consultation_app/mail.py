@@ -0,0 +1,104 @@
+import logging
+import smtplib
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+logger = logging.getLogger(__name__)
+
+
+class PooledEmailConnection:
+    # Одно долгоживущее SMTP-соединение на процесс воркера: SSL-рукопожатие и авторизация
+    # выполняются один раз, а не для каждого письма. Соединение, простоявшее дольше
+    # EMAIL_CONNECTION_MAX_IDLE секунд, открывается заново, оборванное сервером - переоткрывается
+    def __init__(self):
+        self._connection: Optional[BaseEmailBackend] = None
+        self._used_at = 0.0
+        self._lock = threading.Lock()
+
+    def send_messages(self, messages: List[EmailMessage]) -> List[Tuple[int, Exception]]:
+        # Возвращает индексы и ошибки неотправленных писем. Ошибка одного письма (например, сервер отклонил
+        # адрес) не прерывает отправку остальных писем пачки
+        failed = []
+        with self._lock:
+            for index, message in enumerate(messages):
+                try:
+                    self._send(message)
+                except (smtplib.SMTPException, OSError) as e:
+                    logger.error(f'Failed to send email to {message.to}: {e!r}')
+                    failed.append((index, e))
+                self._used_at = time.monotonic()
+        return failed
+
+    def _send(self, message: EmailMessage) -> int:
+        # письма отправляются по одному, чтобы после переподключения повторить только неотправленное
+        try:
+            return self._get_connection().send_messages([message])
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            logger.warning('SMTP connection was dropped, reconnecting')
+            self.close()
+            return self._get_connection().send_messages([message])
+
+    def _get_connection(self) -> BaseEmailBackend:
+        if self._connection is not None and time.monotonic() - self._used_at > settings.EMAIL_CONNECTION_MAX_IDLE:
+            self.close()
+        if self._connection is None:
+            connection = get_connection(fail_silently=False)
+            connection.open()
+            self._connection = connection
+            self._used_at = time.monotonic()
+        return self._connection
+
+    def close(self) -> None:
+        if self._connection is None:
+            return
+        try:
+            self._connection.close()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._connection = None
+
+
+email_connection = PooledEmailConnection()
+
+
+# Шаблоны писем: ключ шаблона -> (тема, текст). В задачу Celery уходит только получатель, ключ шаблона
+# и параметры подстановки, собранные при постановке в очередь, поэтому воркер не обращается к БД
+EMAIL_TEMPLATES = {
+    'registration_confirmation': (
+        'Подтверждение регистрации',
+        'Здравствуйте, {username}!\n\n'
+        'Пожалуйста, подтвердите вашу регистрацию, перейдя по следующей ссылке: {confirmation_url}\n\n'
+        'Ваш логин: {username}\n'
+    ),
+    'consultation_accepted': (
+        'Изменение статуса консультации',
+        'Здравствуйте!\n\nСпециалист подтвердил вашу консультацию.'
+    ),
+    'consultation_rejected': (
+        'Изменение статуса консультации',
+        'Здравствуйте!\n\nСпециалист отклонил ваш запрос на консультацию.'
+    ),
+}
+
+
+def email_payload(recipient: str, template: str, **params: Any) -> Dict[str, Any]:
+    if template not in EMAIL_TEMPLATES:
+        raise ValueError(f'Unknown email template: {template}')
+    return {'recipient': recipient, 'template': template, 'params': params}
+
+
+def is_permanent_failure(error: Exception) -> bool:
+    # адрес отклонён кодом 5xx: повторная отправка на него не поможет, в отличие от обрыва соединения и ответов 4xx
+    return (isinstance(error, smtplib.SMTPRecipientsRefused)
+            and all(code >= 500 for code, _ in error.recipients.values()))
+
+
+def build_message(payload: Dict[str, Any]) -> EmailMessage:
+    subject, body = EMAIL_TEMPLATES[payload['template']]
+    return EmailMessage(subject=subject, body=body.format(**payload['params']),
+                        from_email=settings.DEFAULT_FROM_EMAIL, to=[payload['recipient']])
@@ -0,0 +1,79 @@
+import re
+from datetime import time, timedelta
+from typing import List, Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, QuerySet
+from django.utils import timezone
+
+from consultation_app.models import Consultation, Slot
+from consultation_app.pagination import ClientSlotCursorPagination, ConsultationCursorPagination, SlotCursorPagination
+
+INDEX_SCAN = re.compile(r'(Index Only Scan|Index Scan|Bitmap Index Scan) (?:Backward )?(?:using|on) (\S+)')
+SEQ_SCAN = re.compile(r'Seq Scan on (\S+)')
+
+
+def hot_queries(specialist_id: int = 1, client_id: int = 1, slot_id: int = 1,
+                page_size: int = 50) -> List[Tuple[str, QuerySet]]:
+    # те же выборки, что выполняют списки и запись на консультацию
+    today = timezone.now().date()
+    return [
+        ('client_slots', Slot.objects.available_for_booking().for_client_list()
+         .order_by(*ClientSlotCursorPagination.ordering)[:page_size + 1]),
+        # фильтры списка клиента: окно времени и длительность проверяются по записям slot_available_search_idx
+        ('client_slots_filtered', Slot.objects.available_for_booking().filter(
+            date__range=(today, today + timedelta(days=7)), start_time__gte=time(9), end_time__lte=time(18),
+            duration__gte=timedelta(minutes=45),
+        ).for_client_list().order_by(*ClientSlotCursorPagination.ordering)[:page_size + 1]),
+        ('client_slots_by_specialist', Slot.objects.available_for_booking().filter(specialist_id=specialist_id)
+         .for_client_list().order_by(*ClientSlotCursorPagination.ordering)[:page_size + 1]),
+        ('specialist_slots', Slot.objects.filter(specialist_id=specialist_id).for_specialist_list()
+         .order_by(*SlotCursorPagination.ordering)[:page_size + 1]),
+        ('specialist_slots_by_dates', Slot.objects.filter(
+            specialist_id=specialist_id, date__range=(today, today + timedelta(days=30))
+        ).values_list('date', 'start_time', 'end_time')),
+        ('booking_checks', Slot.objects.annotate(
+            has_accepted=Exists(Consultation.objects.filter(slot=OuterRef('pk'), status='Accepted',
+                                                            is_canceled=False)),
+            already_requested=Exists(Consultation.objects.filter(slot=OuterRef('pk'), client_id=client_id)),
+        ).filter(id=slot_id)),
+        ('slot_consultations', Consultation.objects.filter(slot_id=slot_id).exclude(id=0)),
+        ('specialist_consultations', Consultation.objects.filter(slot__specialist_id=specialist_id)
+         .for_specialist_list().order_by(*ConsultationCursorPagination.ordering)[:page_size + 1]),
+        ('client_consultations', Consultation.objects.filter(client_id=client_id)
+         .for_client_list().order_by(*ConsultationCursorPagination.ordering)[:page_size + 1]),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Выводит планы EXPLAIN для основных запросов списков и записи и проверяет, что они используют индексы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--disable-seqscan', action='store_true',
+                            help='Запретить планировщику seq scan (на пустой или маленькой БД он дешевле индекса)')
+        parser.add_argument('--check', action='store_true',
+                            help='Завершиться с ошибкой, если какой-то запрос читает таблицу целиком')
+        parser.add_argument('--verbose-plans', action='store_true', help='Печатать полные планы')
+
+    def handle(self, *args, **options):
+        failed = []
+        with transaction.atomic():
+            if options['disable_seqscan']:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for name, queryset in hot_queries():
+                plan = queryset.explain()
+                indexes = sorted({match.group(2) for match in INDEX_SCAN.finditer(plan)})
+                seq_scans = sorted(set(SEQ_SCAN.findall(plan)))
+                if seq_scans:
+                    failed.append(name)
+                    self.stdout.write(self.style.ERROR(f'SEQ  {name}: seq scan on {", ".join(seq_scans)}'))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'OK   {name}: {", ".join(indexes)}'))
+                if options['verbose_plans']:
+                    self.stdout.write(plan + '\n')
+
+        if failed and options['check']:
+            raise CommandError(f'Queries without index scan: {", ".join(failed)}')
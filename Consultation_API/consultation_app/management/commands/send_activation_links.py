@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from consultation_app.models import User
+from consultation_app.tasks import EmailBatch
+from consultation_app.tokens import make_activation_token
+
+
+class Command(BaseCommand):
+    help = ('Отправляет неподтверждённым пользователям новую подписанную ссылку подтверждения. Выполняется '
+            'после миграции 0008: ссылки из писем до неё содержали UUID из удалённой колонки activation_token '
+            'и больше не принимаются')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Сколько писем отправлять одной задачей Celery')
+        parser.add_argument('--dry-run', action='store_true', help='Только вывести число получателей')
+
+    def handle(self, *args, **options):
+        # заблокированным пользователям ссылка не отправляется
+        users = User.objects.filter(is_active=False, is_blocked=False).order_by('id').values_list(
+            'id', 'username', 'email'
+        )
+        if options['dry_run']:
+            self.stdout.write(f'Inactive users: {users.count()}')
+            return
+
+        sent = 0
+        batch = EmailBatch()
+        for user_id, username, email in users.iterator(chunk_size=options['batch_size']):
+            batch.add(email, 'registration_confirmation', username=username,
+                      confirmation_url=f'{settings.SITE_URL}/confirm/{make_activation_token(user_id)}/')
+            sent += 1
+            if sent % options['batch_size'] == 0:
+                batch.send_on_commit()
+        batch.send_on_commit()
+        self.stdout.write(self.style.SUCCESS(f'Activation links queued for {sent} users'))
@@ -1,26 +1,53 @@
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.http import JsonResponse
 from rest_framework.exceptions import AuthenticationFailed
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from .authentication import CachedJWTAuthentication, has_auth_header
+from .blocked_users import blocked_users
+
 
 class BlockedUserMiddleware:
+    # поддерживает оба режима, чтобы под ASGI цепочка middleware не переключалась в поток ради синхронного звена
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.auth = CachedJWTAuthentication()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        auth = JWTAuthentication()
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
 
-        user = None
-        auth_result = None
+        user_id = self.token_user_id(request)
+        # блокировка проверяется по user_id из токена без загрузки пользователя из БД
+        if user_id is not None and blocked_users.is_blocked(user_id):
+            return self.blocked_response()
 
+        response = self.get_response(request)
+        return response
+
+    async def __acall__(self, request):
+        user_id = self.token_user_id(request)
+        if user_id is not None and await blocked_users.ais_blocked(user_id):
+            return self.blocked_response()
+        return await self.get_response(request)
+
+    def token_user_id(self, request) -> Optional[int]:
+        # запросы без токена (swagger, подтверждение регистрации) не разбираем
+        if not has_auth_header(request):
+            return None
         try:
-            auth_result = auth.authenticate(request)
+            validated_token = self.auth.get_request_token(request)
         except AuthenticationFailed:
-            pass
-
-        if auth_result:
-            user, _ = auth_result
-            if user.is_blocked:
-                return JsonResponse({'error': 'Ваш аккаунт заблокирован'}, status=403)
+            return None
+        return validated_token.get(api_settings.USER_ID_CLAIM) if validated_token else None
 
-        response = self.get_response(request)
-        return response
+    @staticmethod
+    def blocked_response() -> JsonResponse:
+        return JsonResponse({'error': 'Ваш аккаунт заблокирован'}, status=403)
@@ -0,0 +1,43 @@
+from django.db import migrations, models
+from django.db.models import Case, Count, When
+
+
+def remove_duplicate_consultations(apps, schema_editor):
+    Consultation = apps.get_model('consultation_app', 'Consultation')
+
+    # для пары слот-клиент оставляем подтверждённую заявку, а если её нет - самую раннюю
+    duplicates = (Consultation.objects.values('slot_id', 'client_id')
+                  .annotate(count=Count('id')).filter(count__gt=1))
+    for pair in duplicates:
+        consultations = Consultation.objects.filter(slot_id=pair['slot_id'], client_id=pair['client_id']).order_by(
+            Case(When(status='Accepted', then=0), default=1), 'id')
+        keep = consultations.first()
+        consultations.exclude(id=keep.id).delete()
+
+    # если у слота несколько подтверждённых консультаций, подтверждённой остаётся самая ранняя
+    accepted = (Consultation.objects.filter(status='Accepted').values('slot_id')
+                .annotate(count=Count('id')).filter(count__gt=1))
+    for row in accepted:
+        consultations = Consultation.objects.filter(slot_id=row['slot_id'], status='Accepted').order_by('id')
+        keep = consultations.first()
+        consultations.exclude(id=keep.id).update(status='Rejected')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultation_app', '0002_alter_user_is_active'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_consultations, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='consultation',
+            constraint=models.UniqueConstraint(fields=('slot', 'client'), name='unique_consultation_slot_client'),
+        ),
+        migrations.AddConstraint(
+            model_name='consultation',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'Accepted')), fields=('slot',),
+                                               name='unique_accepted_consultation_slot'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1 on 2026-10-17 11:50
+
+import consultation_app.models
+import django.contrib.postgres.constraints
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultation_app', '0003_consultation_unique_constraints'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='slot',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(expressions=[(consultation_app.models.Int8Range(models.F('specialist'), models.F('specialist'), models.Value('[]')), '&&'), (consultation_app.models.TsRange(models.ExpressionWrapper(django.db.models.expressions.CombinedExpression(models.F('date'), '+', models.F('start_time')), output_field=models.DateTimeField()), models.ExpressionWrapper(django.db.models.expressions.CombinedExpression(models.F('date'), '+', models.F('end_time')), output_field=models.DateTimeField())), '&&')], name='exclude_overlapping_specialist_slots', violation_error_message='Время слота пересекается с другим слотом'),
+        ),
+    ]
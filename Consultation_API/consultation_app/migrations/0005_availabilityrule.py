@@ -0,0 +1,30 @@
+# Generated by Django 5.1 on 2026-10-17 11:57
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultation_app', '0004_slot_exclusion_constraint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilityRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekdays', django.contrib.postgres.fields.ArrayField(base_field=models.PositiveSmallIntegerField(choices=[(0, 'Понедельник'), (1, 'Вторник'), (2, 'Среда'), (3, 'Четверг'), (4, 'Пятница'), (5, 'Суббота'), (6, 'Воскресенье')]), size=None, verbose_name='Дни недели')),
+                ('start_time', models.TimeField(verbose_name='Начало')),
+                ('end_time', models.TimeField(verbose_name='Окончание')),
+                ('slot_duration', models.DurationField(verbose_name='Длительность слота')),
+                ('start_date', models.DateField(verbose_name='Действует с')),
+                ('end_date', models.DateField(db_index=True, verbose_name='Действует по')),
+                ('context', models.CharField(blank=True, max_length=255, null=True, verbose_name='Контекст')),
+                ('specialist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_rules', to=settings.AUTH_USER_MODEL, verbose_name='Специалист')),
+            ],
+        ),
+    ]
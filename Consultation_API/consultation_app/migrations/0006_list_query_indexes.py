@@ -0,0 +1,76 @@
+# Generated by Django 5.1 on 2026-10-17 12:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultation_app', '0005_availabilityrule'),
+    ]
+
+    operations = [
+        # AlterField для внешнего ключа пересоздаёт FK-ограничение и вместе с индексом по slot_id удаляет
+        # частичный уникальный индекс unique_accepted_consultation_slot, поэтому индексы удаляются напрямую
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='consultation',
+                    name='slot',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='consultations', to='consultation_app.slot', verbose_name='Слот'),
+                ),
+                migrations.AlterField(
+                    model_name='slot',
+                    name='specialist',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='slots', to=settings.AUTH_USER_MODEL, verbose_name='Специалист'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    sql='DROP INDEX IF EXISTS "consultation_app_consultation_slot_id_0f3e2d84"',
+                    reverse_sql='CREATE INDEX "consultation_app_consultation_slot_id_0f3e2d84" '
+                                'ON "consultation_app_consultation" ("slot_id")',
+                ),
+                migrations.RunSQL(
+                    sql='DROP INDEX IF EXISTS "consultation_app_slot_specialist_id_3fbce49a"',
+                    reverse_sql='CREATE INDEX "consultation_app_slot_specialist_id_3fbce49a" '
+                                'ON "consultation_app_slot" ("specialist_id")',
+                ),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='consultation',
+            name='status',
+            field=models.CharField(choices=[('Pending', 'Ожидает'), ('Accepted', 'Принят'), ('Rejected', 'Отклонён')], default='Pending', max_length=15, verbose_name='Статус'),
+        ),
+        migrations.AlterField(
+            model_name='slot',
+            name='date',
+            field=models.DateField(verbose_name='Дата'),
+        ),
+        migrations.AlterField(
+            model_name='slot',
+            name='end_time',
+            field=models.TimeField(verbose_name='Окончание'),
+        ),
+        migrations.AlterField(
+            model_name='slot',
+            name='is_available',
+            field=models.BooleanField(default=True, verbose_name='Доступно'),
+        ),
+        migrations.AlterField(
+            model_name='slot',
+            name='start_time',
+            field=models.TimeField(verbose_name='Начало'),
+        ),
+        migrations.AddIndex(
+            model_name='slot',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['date', 'start_time', 'specialist'], name='slot_available_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='slot',
+            index=models.Index(fields=['specialist', 'date', 'start_time', 'id'], name='slot_specialist_keyset_idx'),
+        ),
+    ]
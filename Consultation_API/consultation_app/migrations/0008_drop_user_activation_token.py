@@ -0,0 +1,17 @@
+# Generated by Django 5.1 on 2026-10-17 12:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultation_app', '0007_user_email_unique'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='user',
+            name='activation_token',
+        ),
+    ]
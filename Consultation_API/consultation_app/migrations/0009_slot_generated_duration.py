@@ -0,0 +1,25 @@
+# Generated by Django 5.1 on 2026-10-17 12:40
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultation_app', '0008_drop_user_activation_token'),
+    ]
+
+    # обычную колонку нельзя превратить в генерируемую через ALTER, поэтому она пересоздаётся;
+    # значения для существующих строк PostgreSQL вычисляет сам при добавлении колонки
+    operations = [
+        migrations.RemoveField(
+            model_name='slot',
+            name='duration',
+        ),
+        migrations.AddField(
+            model_name='slot',
+            name='duration',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('end_time'), '-', models.F('start_time')), output_field=models.DurationField(), verbose_name='Длительность'),
+        ),
+    ]
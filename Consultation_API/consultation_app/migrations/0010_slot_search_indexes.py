@@ -0,0 +1,25 @@
+# Generated by Django 5.1 on 2026-10-17 12:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultation_app', '0009_slot_generated_duration'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='slot',
+            name='slot_available_keyset_idx',
+        ),
+        migrations.AddIndex(
+            model_name='slot',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['date', 'start_time', 'specialist', 'end_time', 'duration'], name='slot_available_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='slot',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['specialist', 'date', 'start_time', 'end_time', 'duration'], name='slot_available_specialist_idx'),
+        ),
+    ]
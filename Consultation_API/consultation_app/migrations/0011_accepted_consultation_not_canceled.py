@@ -0,0 +1,22 @@
+# Generated by Django 5.1 on 2026-10-17 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultation_app', '0010_slot_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='consultation',
+            name='unique_accepted_consultation_slot',
+        ),
+        migrations.AddConstraint(
+            model_name='consultation',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_canceled', False), ('status', 'Accepted')),
+                                               fields=('slot',), name='unique_accepted_consultation_slot'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1 on 2026-10-17 13:24
+
+import consultation_app.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('consultation_app', '0011_accepted_consultation_not_canceled'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', consultation_app.models.UserManager()),
+            ],
+        ),
+    ]
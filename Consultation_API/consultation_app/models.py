@@ -1,11 +1,39 @@
-import uuid
-from datetime import timedelta
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
-from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.contrib.auth.models import AbstractUser, UserManager as DjangoUserManager
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import ArrayField, BigIntegerRangeField, DateTimeRangeField, RangeOperators
+from django.db import connection, models
+from django.db.models import ExpressionWrapper, F, Func, Value
+from django.utils import timezone
 
 
 # Create your models here.
+class UserManager(DjangoUserManager):
+    def set_blocked(self, user_ids: Iterable[int], blocked: bool) -> Dict[str, List[int]]:
+        # Один запрос: UPDATE в CTE меняет только строки с другим значением is_blocked, внешний SELECT
+        # по снимку до UPDATE находит существующие id. Реестр blocked_users обновляет вызывающий код
+        ids = sorted(set(user_ids))
+        quote = connection.ops.quote_name
+        table = quote(self.model._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'WITH changed AS (UPDATE {table} SET is_blocked = %s '
+                f'WHERE id = ANY(%s) AND is_blocked <> %s RETURNING id) '
+                f'SELECT u.id, u.id IN (SELECT id FROM changed) FROM {table} AS u WHERE u.id = ANY(%s)',
+                [blocked, ids, blocked, ids]
+            )
+            rows = cursor.fetchall()
+
+        existing = {user_id for user_id, _ in rows}
+        return {
+            'changed': sorted(user_id for user_id, is_changed in rows if is_changed),
+            'unchanged': sorted(user_id for user_id, is_changed in rows if not is_changed),
+            'not_found': [user_id for user_id in ids if user_id not in existing],
+        }
+
+
 class User(AbstractUser):
     ROLE_CHOICES = [
         ('Admin', 'Админ'),
@@ -16,9 +44,10 @@ class User(AbstractUser):
     role = models.CharField(max_length=15, choices=ROLE_CHOICES, verbose_name='Роль')
     is_blocked = models.BooleanField(default=False, verbose_name='Заблокирован')
     is_active = models.BooleanField(default=False)
-    activation_token = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     email = models.EmailField(unique=True)
 
+    objects = UserManager()
+
     def __str__(self):
         return self.username
 
@@ -32,26 +61,185 @@ class User(AbstractUser):
         return self.role == 'Client'
 
 
+class TsRange(Func):
+    function = 'TSRANGE'
+    output_field = DateTimeRangeField()
+
+
+class Int8Range(Func):
+    function = 'INT8RANGE'
+    output_field = BigIntegerRangeField()
+
+
+class SlotQuerySet(models.QuerySet):
+    # каждый список выбирает только те колонки, которые читает его сериализатор
+    def for_specialist_list(self) -> 'SlotQuerySet':
+        return self.only('id', 'date', 'start_time', 'end_time', 'duration', 'context', 'is_available')
+
+    def available_for_booking(self) -> 'SlotQuerySet':
+        # свободные слоты, которые начинаются сегодня позже текущего времени или в следующие дни.
+        # Дублирующее условие date >= сегодня даёт границу для range scan по slot_available_search_idx
+        now = timezone.now()
+        return self.filter(
+            models.Q(is_available=True, date__gte=now.date()) &
+            (models.Q(date__gt=now.date()) | models.Q(date=now.date(), start_time__gte=now.time()))
+        )
+
+    def for_client_list(self) -> 'SlotQuerySet':
+        return self.select_related('specialist').only(
+            'id', 'date', 'start_time', 'end_time', 'duration', 'context',
+            'specialist', 'specialist__username'
+        )
+
+
 class Slot(models.Model):
-    specialist = models.ForeignKey(User, on_delete=models.CASCADE, related_name='slots', verbose_name='Специалист')
-    date = models.DateField(verbose_name='Дата', db_index=True)
-    start_time = models.TimeField(verbose_name='Начало', db_index=True)
-    end_time = models.TimeField(verbose_name='Окончание', db_index=True)
-    duration = models.DurationField(blank=True, null=True, verbose_name='Длительность')
+    # отдельные индексы по колонкам заменены составными в Meta.indexes
+    specialist = models.ForeignKey(User, on_delete=models.CASCADE, related_name='slots', verbose_name='Специалист',
+                                   db_index=False)
+    date = models.DateField(verbose_name='Дата')
+    start_time = models.TimeField(verbose_name='Начало')
+    end_time = models.TimeField(verbose_name='Окончание')
+    # вычисляется и хранится самой БД, поэтому корректна при bulk_create, QuerySet.update() и правке в админке
+    duration = models.GeneratedField(expression=F('end_time') - F('start_time'), output_field=models.DurationField(),
+                                     db_persist=True, verbose_name='Длительность')
     context = models.CharField(max_length=255, blank=True, null=True, verbose_name='Контекст')
-    is_available = models.BooleanField(default=True, verbose_name='Доступно', db_index=True)
+    is_available = models.BooleanField(default=True, verbose_name='Доступно')
+
+    objects = SlotQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # список клиента: is_available AND (date, start_time) >= now, сортировка (date, start_time, specialist).
+            # end_time и duration в конце ключа: фильтры по окну времени и длительности проверяются
+            # по записям индекса, без чтения строк таблицы, которые им не подходят
+            models.Index(fields=['date', 'start_time', 'specialist', 'end_time', 'duration'],
+                         condition=models.Q(is_available=True), name='slot_available_search_idx'),
+            # тот же поиск с фильтром по специалисту
+            models.Index(fields=['specialist', 'date', 'start_time', 'end_time', 'duration'],
+                         condition=models.Q(is_available=True), name='slot_available_specialist_idx'),
+            # список специалиста с сортировкой (date, start_time, id) и выборки слотов специалиста за диапазон дат
+            models.Index(fields=['specialist', 'date', 'start_time', 'id'], name='slot_specialist_keyset_idx'),
+        ]
+        constraints = [
+            # Слоты одного специалиста не пересекаются по времени. Специалист сравнивается как вырожденный
+            # диапазон [id, id], чтобы GiST-индекс строился без расширения btree_gist
+            ExclusionConstraint(
+                name='exclude_overlapping_specialist_slots',
+                expressions=[
+                    (Int8Range(F('specialist'), F('specialist'), Value('[]')), RangeOperators.OVERLAPS),
+                    (TsRange(ExpressionWrapper(F('date') + F('start_time'), output_field=models.DateTimeField()),
+                             ExpressionWrapper(F('date') + F('end_time'), output_field=models.DateTimeField())),
+                     RangeOperators.OVERLAPS),
+                ],
+                violation_error_message='Время слота пересекается с другим слотом',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.specialist} {self.date} {self.start_time} - {self.end_time}'
 
-    def save(self, *args, **kwargs):
-        if self.start_time and self.end_time:
-            start = timedelta(hours=self.start_time.hour, minutes=self.start_time.minute,
-                              seconds=self.start_time.second)
-            end = timedelta(hours=self.end_time.hour, minutes=self.end_time.minute,
-                            seconds=self.end_time.second)
-            self.duration = end - start
-        super().save(*args, **kwargs)
+
+class AvailabilityRule(models.Model):
+    WEEKDAY_CHOICES = [
+        (0, 'Понедельник'),
+        (1, 'Вторник'),
+        (2, 'Среда'),
+        (3, 'Четверг'),
+        (4, 'Пятница'),
+        (5, 'Суббота'),
+        (6, 'Воскресенье'),
+    ]
+
+    specialist = models.ForeignKey(User, on_delete=models.CASCADE, related_name='availability_rules',
+                                   verbose_name='Специалист')
+    weekdays = ArrayField(models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES), verbose_name='Дни недели')
+    start_time = models.TimeField(verbose_name='Начало')
+    end_time = models.TimeField(verbose_name='Окончание')
+    slot_duration = models.DurationField(verbose_name='Длительность слота')
+    start_date = models.DateField(verbose_name='Действует с')
+    end_date = models.DateField(verbose_name='Действует по', db_index=True)
+    context = models.CharField(max_length=255, blank=True, null=True, verbose_name='Контекст')
+
+    def __str__(self):
+        return f'{self.specialist} {self.weekdays} {self.start_time} - {self.end_time}'
+
+    def is_active_on(self, day: date) -> bool:
+        return self.start_date <= day <= self.end_date and day.weekday() in self.weekdays
+
+    def next_active_day(self, day: date, reverse: bool = False) -> Optional[date]:
+        # ближайший начиная с day (назад при reverse) день действия правила, None если такого нет
+        step = timedelta(days=-1 if reverse else 1)
+        day = min(day, self.end_date) if reverse else max(day, self.start_date)
+        for _ in range(7):
+            if not self.start_date <= day <= self.end_date:
+                return None
+            if day.weekday() in self.weekdays:
+                return day
+            day += step
+        return None
+
+    def iter_slots(self, day: date) -> Iterator['Slot']:
+        # виртуальные слоты правила на день: окно делится на отрезки slot_duration, неполный хвост отбрасывается
+        if not self.is_active_on(day):
+            return
+        start = datetime.combine(day, self.start_time)
+        window_end = datetime.combine(day, self.end_time)
+        while start + self.slot_duration <= window_end:
+            yield self.build_slot(day, start.time())
+            start += self.slot_duration
+
+    def slot_at(self, day: date, start_time: time) -> Optional['Slot']:
+        for slot in self.iter_slots(day):
+            if slot.start_time == start_time:
+                return slot
+        return None
+
+    def build_slot(self, day: date, start_time: time) -> 'Slot':
+        end_time = (datetime.combine(day, start_time) + self.slot_duration).time()
+        slot = Slot(specialist=self.specialist, date=day, start_time=start_time, end_time=end_time,
+                    context=self.context)
+        # виртуальный слот не сохранён, длительность, которую вычислила бы БД, задаётся вручную
+        slot.duration = self.slot_duration
+        slot.rule_id = self.id
+        return slot
+
+
+class ConsultationQuerySet(models.QuerySet):
+    def for_specialist_list(self) -> 'ConsultationQuerySet':
+        return self.select_related('slot', 'client').only(
+            'id', 'status', 'is_canceled', 'is_completed',
+            'slot', 'slot__date', 'slot__start_time', 'slot__end_time',
+            'client', 'client__username'
+        )
+
+    def for_client_list(self) -> 'ConsultationQuerySet':
+        return self.select_related('slot__specialist').only(
+            'id', 'status', 'is_canceled',
+            'slot', 'slot__date', 'slot__start_time', 'slot__end_time',
+            'slot__specialist', 'slot__specialist__username'
+        )
+
+
+class ConsultationManager(models.Manager.from_queryset(ConsultationQuerySet)):
+    # метод менеджера, а не QuerySet: запрос всегда затрагивает все консультации слота, и цепочка
+    # filter(...).reject_others(...) не должна выглядеть так, будто она сужает обновление
+    def reject_others(self, slot_id: int, accepted_id: int) -> List[Tuple[int, str]]:
+        # Одним UPDATE ... RETURNING отклоняет остальные запросы на слот и сразу возвращает id и email клиентов
+        # для уведомлений. Уже отклонённые не трогаются, отменённые клиентом консультации не уведомляются.
+        # Действующая подтверждённая консультация тоже не трогается: подтверждение второй упрётся
+        # в ограничение unique_accepted_consultation_slot, а не отклонит первую
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {quote(self.model._meta.db_table)} AS c SET status = %s '
+                f'FROM {quote(User._meta.db_table)} AS u '
+                f'WHERE u.id = c.client_id AND c.slot_id = %s AND c.id <> %s AND c.status <> %s '
+                f'AND NOT (c.status = %s AND NOT c.is_canceled) '
+                f'RETURNING c.id, u.email, c.is_canceled',
+                ['Rejected', slot_id, accepted_id, 'Rejected', 'Accepted']
+            )
+            return [(consultation_id, email) for consultation_id, email, is_canceled in cursor.fetchall()
+                    if not is_canceled]
 
 
 class Consultation(models.Model):
@@ -68,15 +256,28 @@ class Consultation(models.Model):
         ('Rejected', 'Отклонён'),
     ]
 
-    slot = models.ForeignKey(Slot, on_delete=models.CASCADE, related_name='consultations', verbose_name='Слот')
+    # выборки по slot_id обслуживают индексы ограничений unique_consultation_slot_client и
+    # unique_accepted_consultation_slot, отдельный индекс по внешнему ключу не нужен
+    slot = models.ForeignKey(Slot, on_delete=models.CASCADE, related_name='consultations', verbose_name='Слот',
+                             db_index=False)
     client = models.ForeignKey(User, on_delete=models.CASCADE, related_name='consultations', verbose_name='Клиент')
     is_canceled = models.BooleanField(default=False, verbose_name='Отменен')
     cancel_comment = models.CharField(max_length=255, blank=True, verbose_name='Комментарий при отмене')
     cancel_reason_choice = models.CharField(max_length=50, choices=CANCEL_CHOICE, blank=True,
                                             verbose_name='Причина отмены из списка')
     is_completed = models.BooleanField(default=False, verbose_name='Завершен')
-    status = models.CharField(max_length=15, choices=STATUS_CHOICE, default='Pending', verbose_name='Статус',
-                              db_index=True)
+    status = models.CharField(max_length=15, choices=STATUS_CHOICE, default='Pending', verbose_name='Статус')
+
+    objects = ConsultationManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['slot', 'client'], name='unique_consultation_slot_client'),
+            # у слота может быть только одна действующая подтверждённая консультация: отменённая клиентом
+            # остаётся Accepted, но освобождает слот для новой записи
+            models.UniqueConstraint(fields=['slot'], condition=models.Q(status='Accepted', is_canceled=False),
+                                    name='unique_accepted_consultation_slot'),
+        ]
 
     def __str__(self):
         return f'Specialist: {self.slot.specialist.username}, client: {self.client.username}'
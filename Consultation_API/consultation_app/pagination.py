@@ -0,0 +1,236 @@
+import base64
+import binascii
+import heapq
+import json
+from itertools import islice
+from typing import Any, List, Optional, Sequence, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Field, Model, Q, QuerySet
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .availability import virtual_slots
+from .rows import field_value
+
+
+class KeysetCursorPagination(BasePagination):
+    # Keyset-пагинация: курсор хранит значения полей сортировки последней строки страницы,
+    # поэтому следующая страница выбирается условием по индексу, а не OFFSET
+    ordering: Sequence[str] = ()
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Некорректный курсор'
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request, view=None) -> List[Any]:
+        position, reverse = self.start_page(queryset, request, view)
+        # берём на одну строку больше, чтобы узнать, есть ли следующая страница
+        return self.finish_page(self.get_rows(queryset, position, reverse, self.page_size + 1), position, reverse)
+
+    async def apaginate_queryset(self, queryset: QuerySet, request: Request, view=None) -> List[Any]:
+        position, reverse = self.start_page(queryset, request, view)
+        return self.finish_page(await self.aget_rows(queryset, position, reverse, self.page_size + 1),
+                                position, reverse)
+
+    def start_page(self, queryset: QuerySet, request: Request, view) -> Tuple[Optional[List[Any]], bool]:
+        self.request = request
+        self.view = view
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        return self.decode_cursor(request, queryset.model)
+
+    def finish_page(self, results: List[Any], position: Optional[List[Any]], reverse: bool) -> List[Any]:
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        self.page = results
+        return results
+
+    def get_rows(self, queryset: QuerySet, position: Optional[List[Any]], reverse: bool, limit: int) -> List[Any]:
+        return list(self._page_queryset(queryset, position, reverse, limit))
+
+    async def aget_rows(self, queryset: QuerySet, position: Optional[List[Any]], reverse: bool,
+                        limit: int) -> List[Any]:
+        return [row async for row in self._page_queryset(queryset, position, reverse, limit).aiterator()]
+
+    def _page_queryset(self, queryset: QuerySet, position: Optional[List[Any]], reverse: bool,
+                       limit: int) -> QuerySet:
+        if reverse:
+            queryset = queryset.order_by(*[f'-{field}' for field in self.ordering])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self._keyset_filter(position, reverse))
+        return queryset[:limit]
+
+    def get_page_size(self, request: Request) -> int:
+        page_size = settings.PAGINATION_PAGE_SIZE
+        raw_value = request.query_params.get(self.page_size_query_param)
+        if raw_value:
+            try:
+                requested = int(raw_value)
+            except ValueError:
+                return page_size
+            if requested > 0:
+                return min(requested, settings.PAGINATION_MAX_PAGE_SIZE)
+        return page_size
+
+    def get_paginated_response(self, data: List[Any]) -> Response:
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                    'example': 'http://localhost:8000/api/client_slots/?cursor=eyJwIjpbIjIwMjQtMDktMjMiXX0=',
+                },
+                'previous': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                    'example': None,
+                },
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.has_next or not self.page:
+            return None
+        return self._build_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self) -> Optional[str]:
+        if not self.has_previous or not self.page:
+            return None
+        return self._build_link(self.page[0], reverse=True)
+
+    def get_schema_operation_parameters(self, view) -> List[dict]:
+        parameters = [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Курсор страницы из полей next/previous',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Количество записей на странице',
+                'schema': {'type': 'integer'},
+            },
+        ]
+        stream_query_param = getattr(view, 'stream_query_param', None)
+        if stream_query_param:
+            parameters.append({
+                'name': stream_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'true - весь список одним JSON-массивом без пагинации, ответ передаётся потоком',
+                'schema': {'type': 'boolean'},
+            })
+        return parameters
+
+    def encode_cursor(self, position: Sequence[Any], reverse: bool) -> str:
+        values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in position]
+        payload = json.dumps({'p': values, 'r': int(reverse)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, request: Request, model: type[Model]) -> Tuple[Optional[List[Any]], bool]:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            values, reverse = payload['p'], bool(payload['r'])
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError
+            position = [self._resolve_field(model, field).to_python(value)
+                        for field, value in zip(self.ordering, values)]
+        except (TypeError, ValueError, KeyError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def get_position(self, obj: Any) -> List[Any]:
+        # строка страницы - модель или словарь из .values() (быстрый путь списков в rows.py)
+        return [field_value(obj, field) for field in self.ordering]
+
+    def _build_link(self, obj: Any, reverse: bool) -> str:
+        cursor = self.encode_cursor(self.get_position(obj), reverse)
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def _keyset_filter(self, position: Sequence[Any], reverse: bool) -> Q:
+        # (a, b, c) > (x, y, z)  <=>  a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        lookup = 'lt' if reverse else 'gt'
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, position):
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        # дублирующее условие по первому полю даёт планировщику границу для range scan по индексу
+        return Q(**{f'{self.ordering[0]}__{lookup}e': position[0]}) & condition
+
+    @staticmethod
+    def _resolve_field(model: type[Model], path: str) -> Field:
+        *relations, name = path.split('__')
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        try:
+            return model._meta.get_field(name)
+        except FieldDoesNotExist:
+            raise ValueError(path)
+
+
+class SlotCursorPagination(KeysetCursorPagination):
+    ordering = ('date', 'start_time', 'id')
+
+
+class ConsultationCursorPagination(KeysetCursorPagination):
+    ordering = ('slot__date', 'slot__start_time', 'id')
+
+
+class ClientSlotCursorPagination(KeysetCursorPagination):
+    # Слоты одного специалиста не пересекаются, поэтому (дата, начало, специалист) однозначно задаёт позицию
+    # и для реальных слотов, и для виртуальных слотов из правил, у которых ещё нет id
+    ordering = ('date', 'start_time', 'specialist_id')
+
+    def get_rows(self, queryset: QuerySet, position: Optional[List[Any]], reverse: bool, limit: int) -> List[Any]:
+        rows = super().get_rows(queryset, position, reverse, limit)
+        return self._merge(rows, self._virtual_slots(position, reverse, limit), reverse, limit)
+
+    async def aget_rows(self, queryset: QuerySet, position: Optional[List[Any]], reverse: bool,
+                        limit: int) -> List[Any]:
+        rows = await super().aget_rows(queryset, position, reverse, limit)
+        # async ORM Django сам выполняет запросы через sync_to_async, поэтому разворачивание правил
+        # с его двумя запросами переносится в поток одним переходом
+        virtual = await sync_to_async(self._virtual_slots)(position, reverse, limit)
+        return self._merge(rows, virtual, reverse, limit)
+
+    def _virtual_slots(self, position: Optional[List[Any]], reverse: bool, limit: int) -> List[Any]:
+        # фильтры списка (view.get_filterset) применяются и к виртуальным слотам
+        return virtual_slots(position, reverse, limit, key=self.get_position,
+                             slot_filter=self.view.get_filterset())
+
+    def _merge(self, rows: List[Any], virtual: List[Any], reverse: bool, limit: int) -> List[Any]:
+        return list(islice(heapq.merge(rows, virtual, key=self.get_position, reverse=reverse), limit))
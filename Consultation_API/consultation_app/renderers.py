@@ -0,0 +1,64 @@
+import codecs
+import math
+from decimal import Decimal
+from io import BytesIO
+from typing import Any, Optional
+
+import orjson
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# date, time и datetime передаются в default, поэтому кодируются той же функцией DRF, что и в JSONRenderer:
+# datetime в UTC с суффиксом Z, timedelta строкой с секундами, ленивые строки переводов через force_str
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+_default = JSONEncoder().default
+
+
+def _has_non_finite(data: Any) -> bool:
+    if isinstance(data, dict):
+        return any(_has_non_finite(value) for value in data.values())
+    if isinstance(data, (list, tuple)):
+        return any(_has_non_finite(value) for value in data)
+    if isinstance(data, Decimal):
+        return not data.is_finite()
+    return isinstance(data, float) and not math.isfinite(data)
+
+
+class ORJSONRenderer(JSONRenderer):
+    # Тот же JSON, что у JSONRenderer (компактный, без экранирования не-ASCII), но кодирование выполняет orjson.
+    # Отступы (Accept: application/json; indent=4 и Browsable API) отдаются стандартному рендереру
+
+    def render(self, data: Any, accepted_media_type: Optional[str] = None, renderer_context: Optional[dict] = None
+               ) -> bytes:
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+        if b'null' in ret and _has_non_finite(data):
+            # orjson записывает NaN и Infinity как null, а JSONRenderer в строгом режиме бросает ValueError.
+            # Данные проверяются, только если в ответе есть null
+            return super().render(data, accepted_media_type, renderer_context)
+        # как и JSONRenderer, полностью экранирует U+2028 и U+2029, чтобы ответ оставался подмножеством JavaScript
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type: Optional[str] = None, parser_context: Optional[dict] = None) -> Any:
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        body = stream.read()
+        try:
+            # orjson, как и JSONParser в строгом режиме, не принимает NaN и Infinity
+            return orjson.loads(body if codecs.lookup(encoding).name == 'utf-8' else body.decode(encoding))
+        except ValueError:
+            # Тело, которое orjson не разобрал, повторно разбирает JSONParser: текст ошибки тот же, что при
+            # JSON_BACKEND=json, а тела, которые принимает только модуль json (например, одиночные суррогаты
+            # в \u-последовательностях), разбираются так же, как раньше
+            return super().parse(BytesIO(body), media_type, parser_context)
@@ -0,0 +1,185 @@
+from itertools import islice
+from typing import (Any, AsyncIterable, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Sequence,
+                    Tuple)
+
+from django.conf import settings
+from django.db.models import Expression, IntegerField, QuerySet, Value
+from django.http import StreamingHttpResponse
+from django.http.response import HttpResponseBase
+from django.utils.duration import duration_string
+from django.utils.module_loading import import_string
+from rest_framework.renderers import BaseRenderer
+from rest_framework.request import Request
+
+from .models import Consultation
+
+STATUS_DISPLAY = dict(Consultation.STATUS_CHOICE)
+
+
+def field_value(row: Any, path: str) -> Any:
+    # строка из .values() - словарь с ключами вида slot__date, модель (виртуальный слот) - цепочка атрибутов
+    if isinstance(row, dict):
+        return row[path]
+    for attr in path.split('__'):
+        row = getattr(row, attr)
+    return row
+
+
+def _isoformat(value: Any) -> str:
+    return value.isoformat()
+
+
+def _status_display(value: str) -> str:
+    return STATUS_DISPLAY.get(value, value)
+
+
+class ListRows:
+    # Быстрый путь рендеринга списков только для чтения: строки выбираются через .values() и переводятся
+    # в тот же JSON, что отдаёт сериализатор списка, без создания моделей и обхода полей сериализатора.
+    # columns: (ключ в ответе, путь в .values(), преобразование значения)
+    columns: Sequence[Tuple[str, str, Optional[Callable[[Any], Any]]]] = ()
+    # поля, нужные только пагинации (ключ курсора), и вычисляемые в SQL значения
+    extra_sources: Sequence[str] = ()
+    annotations: Dict[str, Expression] = {}
+
+    @classmethod
+    def values(cls, queryset: QuerySet) -> QuerySet:
+        sources = [source for _, source, _ in cls.columns if source not in cls.annotations]
+        return queryset.values(*sources, *cls.extra_sources, **cls.annotations)
+
+    @classmethod
+    def render(cls, rows: Sequence[Any]) -> List[Dict[str, Any]]:
+        rendered = []
+        for row in rows:
+            item = {}
+            for key, source, convert in cls.columns:
+                value = row[source] if isinstance(row, dict) else field_value(row, source)
+                item[key] = value if convert is None or value is None else convert(value)
+            rendered.append(item)
+        return rendered
+
+
+class SpecialistSlotRows(ListRows):
+    columns = (
+        ('id', 'id', None),
+        ('date', 'date', _isoformat),
+        ('start_time', 'start_time', _isoformat),
+        ('end_time', 'end_time', _isoformat),
+        ('duration', 'duration', duration_string),
+        ('context', 'context', None),
+        ('is_available', 'is_available', None),
+    )
+
+
+class ClientSlotRows(ListRows):
+    columns = (
+        ('id', 'id', None),
+        ('specialist_username', 'specialist__username', None),
+        ('date', 'date', _isoformat),
+        ('start_time', 'start_time', _isoformat),
+        ('end_time', 'end_time', _isoformat),
+        ('duration', 'duration', duration_string),
+        ('context', 'context', None),
+        ('rule_id', 'rule_id', None),
+    )
+    extra_sources = ('specialist_id',)
+    # у реальных слотов rule_id нет, у виртуальных он задаётся атрибутом
+    annotations = {'rule_id': Value(None, output_field=IntegerField())}
+
+
+class SpecialistConsultationRows(ListRows):
+    columns = (
+        ('id', 'id', None),
+        ('slot_id', 'slot_id', None),
+        ('client_username', 'client__username', None),
+        ('date', 'slot__date', _isoformat),
+        ('start_time', 'slot__start_time', _isoformat),
+        ('end_time', 'slot__end_time', _isoformat),
+        ('status_display', 'status', _status_display),
+        ('is_canceled', 'is_canceled', None),
+        ('is_completed', 'is_completed', None),
+    )
+
+
+class ClientConsultationRows(ListRows):
+    columns = (
+        ('id', 'id', None),
+        ('specialist_username', 'slot__specialist__username', None),
+        ('date', 'slot__date', _isoformat),
+        ('start_time', 'slot__start_time', _isoformat),
+        ('end_time', 'slot__end_time', _isoformat),
+        ('status_display', 'status', _status_display),
+        ('is_canceled', 'is_canceled', None),
+    )
+
+
+def json_renderer() -> BaseRenderer:
+    # рендерер из JSON_BACKEND, чтобы поток кодировался так же, как обычные ответы
+    return import_string(settings.JSON_RENDERER)()
+
+
+def stream_json_array(rows: Iterable[Any], list_rows: type[ListRows], chunk_size: int,
+                      renderer: BaseRenderer) -> Iterator[bytes]:
+    # JSON-массив отдаётся частями по chunk_size строк, в памяти держится только текущая часть
+    rows = iter(rows)
+    yield b'['
+    separator = b''
+    while chunk := list(islice(rows, chunk_size)):
+        yield separator + renderer.render(list_rows.render(chunk))[1:-1]
+        separator = b','
+    yield b']'
+
+
+async def astream_json_array(rows: AsyncIterable[Any], list_rows: type[ListRows], chunk_size: int,
+                             renderer: BaseRenderer) -> AsyncIterator[bytes]:
+    # то же для ASGI: синхронный итератор ASGI-обработчик Django прочитал бы целиком перед отправкой
+    yield b'['
+    separator = b''
+    chunk = []
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield separator + renderer.render(list_rows.render(chunk))[1:-1]
+            separator = b','
+            chunk = []
+    if chunk:
+        yield separator + renderer.render(list_rows.render(chunk))[1:-1]
+    yield b']'
+
+
+class FastListMixin:
+    # Списки отдаются через ListRows; serializer_class остаётся для схемы OpenAPI и описывает тот же JSON.
+    # С ?stream=true весь список без пагинации и кэша отдаётся потоком: строки читаются серверным курсором
+    # через .iterator() (.aiterator() в асинхронных представлениях), поэтому память воркера не растёт
+    # с размером выборки. None отключает потоковый режим
+    list_rows: type[ListRows]
+    stream_query_param: Optional[str] = 'stream'
+
+    def stream_requested(self, request: Request) -> bool:
+        return bool(self.stream_query_param) and request.query_params.get(self.stream_query_param) in ('true', '1')
+
+    def stream_queryset(self) -> QuerySet:
+        queryset = self.filter_queryset(self.get_queryset()).order_by(*self.pagination_class.ordering)
+        return self.list_rows.values(queryset)
+
+    def list(self, request: Request, *args, **kwargs) -> HttpResponseBase:
+        chunk_size = settings.LIST_STREAM_CHUNK_SIZE
+        if self.stream_requested(request):
+            rows = self.stream_queryset().iterator(chunk_size=chunk_size)
+            return StreamingHttpResponse(stream_json_array(rows, self.list_rows, chunk_size, json_renderer()),
+                                         content_type='application/json')
+
+        queryset = self.list_rows.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(self.list_rows.render(page))
+
+    async def alist(self, request: Request, *args, **kwargs) -> HttpResponseBase:
+        chunk_size = settings.LIST_STREAM_CHUNK_SIZE
+        if self.stream_requested(request):
+            rows = self.stream_queryset().aiterator(chunk_size=chunk_size)
+            return StreamingHttpResponse(astream_json_array(rows, self.list_rows, chunk_size, json_renderer()),
+                                         content_type='application/json')
+
+        queryset = self.list_rows.values(self.filter_queryset(self.get_queryset()))
+        page = await self.apaginate_queryset(queryset)
+        return self.get_paginated_response(self.list_rows.render(page))
@@ -1,12 +1,20 @@
-from typing import Dict, Any, Optional
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
 
+from django.conf import settings
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.db import IntegrityError, transaction
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 from .tasks import *
 from django.utils import timezone
+from .cache import bump_slots_version
+from .timing import StageTimer
 from .models import *
 
 
+OVERLAP_CONSTRAINT = 'exclude_overlapping_specialist_slots'
+
 #
 # class LoginSerializer(serializers.Serializer):
 #     username = serializers.CharField()
@@ -17,16 +25,12 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
     password_confirm = serializers.CharField(write_only=True)
     email = serializers.EmailField(required=True)
-    raw_password = None
 
     class Meta:
         model = User
         fields = ['username', 'password', 'password_confirm', 'email', 'role']
-
-    def validate_email(self, value: str) -> str:
-        if User.objects.filter(email=value).exists():
-            raise serializers.ValidationError('Этот email уже используется')
-        return value
+        # уникальность username и email проверяют ограничения БД при INSERT, а не отдельные SELECT
+        extra_kwargs = {'username': {'validators': [UnicodeUsernameValidator()]}}
 
     def validate(self, data: Dict[str, Any]) -> Dict[str, Any]:
         if data['password'] != data['password_confirm']:
@@ -34,13 +38,22 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data: Dict[str, Any]) -> User:
+        timer = self.context.get('timer') or StageTimer()
         password = validated_data.pop('password')
         validated_data.pop('password_confirm')
         user = User(**validated_data)
-        user.set_password(password)
-        user.activation_token = uuid.uuid4()
-        user.save()
-        self.raw_password = password
+        with timer.stage('hash'):
+            user.set_password(password)
+        try:
+            with timer.stage('insert'), transaction.atomic():
+                user.save()
+        except IntegrityError:
+            # запрос к БД только на редком пути конфликта, чтобы указать, какое поле занято
+            if User.objects.filter(username=user.username).exists():
+                raise serializers.ValidationError({'username': ['Пользователь с таким именем уже существует']})
+            if User.objects.filter(email=user.email).exists():
+                raise serializers.ValidationError({'email': ['Этот email уже используется']})
+            raise
         return user
 
 
@@ -48,8 +61,15 @@ class BlockUserSerializer(serializers.Serializer):
     id = serializers.IntegerField()
 
 
+class BulkBlockUserSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False,
+                                max_length=settings.USER_BULK_BLOCK_MAX_SIZE)
+
+
 class SlotSerializer(serializers.ModelSerializer):
     context = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    # DRF не знает GeneratedField и без явного поля отдал бы str(timedelta)
+    duration = serializers.DurationField(read_only=True)
 
     class Meta:
         model = Slot
@@ -66,26 +86,96 @@ class SlotSerializer(serializers.ModelSerializer):
         if data['date'] == now.date() and data['start_time'] <= now.time():
             raise serializers.ValidationError({'detail': 'Нельзя создать слот на прошедшее время'})
 
-        # проверяем на пересечение времени слотов
+        return data
+
+    def create(self, validated_data: Dict[str, Any]) -> Slot:
+        # пересечение с другими слотами специалиста проверяет exclusion-ограничение в БД
+        try:
+            with transaction.atomic():
+                return Slot.objects.create(**validated_data)
+        except IntegrityError as e:
+            if OVERLAP_CONSTRAINT not in str(e):
+                raise
+            raise serializers.ValidationError({'detail': ['Время слота пересекается с другим слотом']})
+
+
+class BulkSlotSerializer(serializers.Serializer):
+    slots = SlotSerializer(many=True, allow_empty=False, max_length=settings.SLOT_BULK_CREATE_MAX_SIZE)
+
+    def to_internal_value(self, data: Any) -> Dict[str, Any]:
+        try:
+            validated = super().to_internal_value(data)
+        except serializers.ValidationError as exc:
+            slots = data.get('slots') if isinstance(data, dict) else None
+            errors = exc.detail.get('slots') if isinstance(exc.detail, dict) else None
+            # ошибка не в отдельных слотах (не список, пустой или слишком длинный запрос)
+            if (not isinstance(slots, list) or not isinstance(errors, list) or len(errors) != len(slots)
+                    or not all(isinstance(error, dict) for error in errors)):
+                raise
+            # пересечения проверяются и среди слотов, прошедших проверку полей, чтобы все ошибки пришли одним ответом
+            child = self.fields['slots'].child
+            self.add_overlap_errors([(index, child.run_validation(slot))
+                                     for index, (slot, error) in enumerate(zip(slots, errors)) if not error], errors)
+            raise serializers.ValidationError({'slots': errors})
+
+        errors = [{} for _ in validated['slots']]
+        self.add_overlap_errors(list(enumerate(validated['slots'])), errors)
+        if any(errors):
+            raise serializers.ValidationError({'slots': errors})
+        return validated
+
+    def add_overlap_errors(self, slots: List[Tuple[int, Dict[str, Any]]], errors: List[Dict[str, List[str]]]) -> None:
+        if not slots:
+            return
         specialist = self.context['request'].user
-        date = data['date']
-        start_time = data['start_time']
-        end_time = data['end_time']
 
-        same_time_slots = Slot.objects.filter(
+        # слоты из запроса и уже существующие слоты специалиста за те же даты (один запрос)
+        existing = Slot.objects.filter(
             specialist=specialist,
-            date=date,
-            start_time__lt=end_time,
-            end_time__gt=start_time
-        )
-
-        if same_time_slots.exists():
-            raise serializers.ValidationError({'detail': 'Время слота пересекается с другим слотом'})
+            date__range=(min(slot['date'] for _, slot in slots), max(slot['date'] for _, slot in slots))
+        ).values_list('date', 'start_time', 'end_time')
+        intervals = [(date, start_time, end_time, None) for date, start_time, end_time in existing]
+        intervals += [(slot['date'], slot['start_time'], slot['end_time'], index) for index, slot in slots]
+        intervals.sort(key=lambda interval: (interval[0], interval[1]))
+
+        # проход по отсортированным интервалам: слот пересекается с каждым из ещё не закончившихся к его началу
+        # интервалов той же даты. Сообщение зависит от того, с чем именно пересёкся слот: с существующим слотом
+        # (index None) или с другим слотом запроса
+        active = []
+        for interval in intervals:
+            date, start_time, end_time, index = interval
+            active = [other for other in active if other[0] == date and other[2] > start_time]
+            for other in active:
+                for current, partner in ((index, other[3]), (other[3], index)):
+                    if current is None:
+                        continue
+                    message = ('Время слота пересекается с другим слотом' if partner is None
+                               else 'Время слота пересекается с другим слотом в запросе')
+                    detail = errors[current].setdefault('detail', [])
+                    if message not in detail:
+                        detail.append(message)
+            active.append(interval)
+
+    def create(self, validated_data: Dict[str, Any]) -> List[Slot]:
+        specialist = self.context['request'].user
+        slots = [Slot(specialist=specialist, **slot_data) for slot_data in validated_data['slots']]
 
-        return data
+        # длительность вычисляет БД и возвращает через RETURNING вместе с id.
+        # bulk_create не отправляет post_save, поэтому версия кэша списков увеличивается явно
+        try:
+            with transaction.atomic():
+                created = Slot.objects.bulk_create(slots)
+                bump_slots_version([specialist.id])
+        except IntegrityError as e:
+            if OVERLAP_CONSTRAINT not in str(e):
+                raise
+            raise serializers.ValidationError({'detail': ['Время слота пересекается с другим слотом']})
+        return created
 
 
 class SpecialistSlotListSerializer(serializers.ModelSerializer):
+    duration = serializers.DurationField(read_only=True)
+
     class Meta:
         model = Slot
         fields = ['id', 'date', 'start_time', 'end_time', 'duration', 'context', 'is_available']
@@ -93,10 +183,98 @@ class SpecialistSlotListSerializer(serializers.ModelSerializer):
 
 class ClientSlotListSerializer(serializers.ModelSerializer):
     specialist_username = serializers.CharField(source='specialist.username')
+    # у виртуальных слотов из правил расписания id = null, запись на них идёт по rule_id, date и start_time
+    rule_id = serializers.IntegerField(read_only=True, allow_null=True, default=None)
+    duration = serializers.DurationField(read_only=True)
 
     class Meta:
         model = Slot
-        fields = ['id', 'specialist_username', 'date', 'start_time', 'end_time', 'duration', 'context']
+        fields = ['id', 'specialist_username', 'date', 'start_time', 'end_time', 'duration', 'context', 'rule_id']
+
+
+class AvailabilityRuleSerializer(serializers.ModelSerializer):
+    weekdays = serializers.ListField(child=serializers.ChoiceField(choices=AvailabilityRule.WEEKDAY_CHOICES),
+                                     allow_empty=False)
+
+    class Meta:
+        model = AvailabilityRule
+        fields = ['id', 'weekdays', 'start_time', 'end_time', 'slot_duration', 'start_date', 'end_date', 'context']
+
+    def validate(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        if data['end_time'] <= data['start_time']:
+            raise serializers.ValidationError({'detail': 'Время окончания должно быть позже времени начала'})
+
+        window = (datetime.combine(data['start_date'], data['end_time'])
+                  - datetime.combine(data['start_date'], data['start_time']))
+        if not timedelta(0) < data['slot_duration'] <= window:
+            raise serializers.ValidationError({'detail': 'Длительность слота должна укладываться в окно правила'})
+
+        if data['start_date'] < timezone.now().date():
+            raise serializers.ValidationError({'detail': 'Дата не может быть ранее сегодняшнего дня'})
+
+        if data['start_date'] > timezone.now().date() + timedelta(days=settings.AVAILABILITY_RULE_MAX_DAYS):
+            raise serializers.ValidationError(
+                {'detail': f'Правило не может начинаться позже чем через {settings.AVAILABILITY_RULE_MAX_DAYS} дней'})
+
+        if data['end_date'] < data['start_date']:
+            raise serializers.ValidationError({'detail': 'Дата окончания должна быть не раньше даты начала'})
+
+        if (data['end_date'] - data['start_date']).days > settings.AVAILABILITY_RULE_MAX_DAYS:
+            raise serializers.ValidationError(
+                {'detail': f'Правило не может действовать дольше {settings.AVAILABILITY_RULE_MAX_DAYS} дней'})
+
+        data['weekdays'] = sorted(set(data['weekdays']))
+        overlapping_rules = AvailabilityRule.objects.filter(
+            specialist=self.context['request'].user,
+            weekdays__overlap=data['weekdays'],
+            start_date__lte=data['end_date'],
+            end_date__gte=data['start_date'],
+            start_time__lt=data['end_time'],
+            end_time__gt=data['start_time']
+        )
+        if overlapping_rules.exists():
+            raise serializers.ValidationError({'detail': 'Правило пересекается с другим правилом'})
+
+        return data
+
+
+class VirtualSlotSerializer(serializers.Serializer):
+    rule_id = serializers.IntegerField()
+    date = serializers.DateField()
+    start_time = serializers.TimeField()
+
+    def validate(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        rule = AvailabilityRule.objects.select_related('specialist').filter(id=data['rule_id']).first()
+        if rule is None:
+            raise serializers.ValidationError({'rule_id': 'Правила с таким id не существует'})
+
+        slot = rule.slot_at(data['date'], data['start_time'])
+        if slot is None:
+            raise serializers.ValidationError({'detail': 'В расписании специалиста нет слота на это время'})
+
+        if datetime.combine(slot.date, slot.start_time) < datetime.now():
+            raise serializers.ValidationError({'detail': 'Дата и время консультации не могут быть ранее текущего времени'})
+
+        data['slot'] = slot
+        return data
+
+    def create(self, validated_data: Dict[str, Any]) -> Slot:
+        # реальный слот создаётся только при записи; если его уже создал параллельный запрос,
+        # INSERT упирается в exclusion-ограничение и используется существующий слот
+        slot = validated_data['slot']
+        try:
+            with transaction.atomic():
+                slot.save()
+            return slot
+        except IntegrityError as e:
+            if OVERLAP_CONSTRAINT not in str(e):
+                raise
+
+        existing = Slot.objects.filter(specialist_id=slot.specialist_id, date=slot.date,
+                                       start_time=slot.start_time, end_time=slot.end_time).first()
+        if existing is None:
+            raise serializers.ValidationError({'detail': 'Время слота пересекается с другим слотом специалиста'})
+        return existing
 
 
 class ConsultationSerializer(serializers.ModelSerializer):
@@ -168,25 +346,37 @@ class UpdateStatusConsultationSerializer(serializers.ModelSerializer):
 
     def update(self, instance: Consultation, validated_data: Dict[str, Any]) -> Consultation:
         status = validated_data.get('status', instance.status)
+        # письма уходят одной задачей только после коммита, при откате транзакции они не отправляются
+        emails = EmailBatch()
 
         if status == 'Accepted':
             slot = instance.slot
+            # Условный UPDATE одной колонки: слот занимается, только если он ещё свободен. UPDATE блокирует строку
+            # слота, поэтому параллельные подтверждения на один слот выполняются по очереди, и второе не изменит
+            # ни одной строки. update() не отправляет post_save, поэтому кэш списков слотов сбрасывается явно
+            if not Slot.objects.filter(id=slot.id, is_available=True).update(is_available=False):
+                raise serializers.ValidationError(
+                    {'detail': 'Для данного слота уже существует подтверждённая консультация'})
             slot.is_available = False
-            slot.save()
+            bump_slots_version([slot.specialist_id])
 
-            Consultation.objects.filter(slot=slot).exclude(id=instance.id).update(status='Rejected')
-            send_accepted_status_email.delay(instance.id)
+            emails.add(instance.client.email, 'consultation_accepted')
+            # остальные клиенты получают отказ в той же пачке писем, сколько бы их ни было
+            for _, email in Consultation.objects.reject_others(slot.id, instance.id):
+                emails.add(email, 'consultation_rejected')
 
         if status == 'Rejected':
-            send_rejected_status_email.delay(instance.id)
+            emails.add(instance.client.email, 'consultation_rejected')
 
         instance.status = status
         instance.save(update_fields=['status'])
+        emails.send_on_commit()
         return instance
 
 
 class SlotUpdateSerializer(serializers.ModelSerializer):
     specialist_username = serializers.CharField(write_only=True, required=False)
+    duration = serializers.DurationField(read_only=True)
 
     class Meta:
         model = Slot
@@ -226,12 +416,25 @@ class SlotUpdateSerializer(serializers.ModelSerializer):
             except User.DoesNotExist:
                 raise serializers.ValidationError({'specialist_username': 'Специалист с таким юзернеймом не найден'})
 
-        self._validate_slot_time(new_specialist, validated_data, instance)
+        if new_specialist.id != instance.specialist_id:
+            # слот остаётся у текущего специалиста, поэтому exclusion-ограничение проверит пересечение только
+            # с его слотами; пересечение со слотами указанного специалиста проверяется запросом, как и прежде
+            self._validate_slot_time(new_specialist, validated_data, instance)
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
-        instance.save()
+        # пересечение с другими слотами специалиста проверяет exclusion-ограничение в БД
+        try:
+            with transaction.atomic():
+                instance.save()
+        except IntegrityError as e:
+            if OVERLAP_CONSTRAINT not in str(e):
+                raise
+            raise serializers.ValidationError({'detail': 'Время слота пересекается с другим слотом специалиста'})
+        if 'start_time' in validated_data or 'end_time' in validated_data:
+            # UPDATE не возвращает пересчитанную БД длительность
+            instance.refresh_from_db(fields=['duration'])
         return instance
 
     def _validate_slot_time(self, new_specialist: User, data: Dict[str, Any], instance: Slot) -> None:
@@ -275,7 +478,15 @@ class CancelConsultationSerializer(serializers.ModelSerializer):
         instance.is_canceled = True
         instance.cancel_reason_choice = validated_data.get('cancel_reason', instance.cancel_reason_choice)
         instance.cancel_comment = validated_data.get('cancel_comment', instance.cancel_comment)
+        with transaction.atomic():
+            # условный UPDATE: из двух параллельных отмен строку меняет только одна
+            canceled = Consultation.objects.filter(id=instance.id, is_canceled=False).update(
+                is_canceled=True, cancel_reason_choice=instance.cancel_reason_choice,
+                cancel_comment=instance.cancel_comment
+            )
+            if not canceled:
+                raise serializers.ValidationError({'detail': 'Вы уже отменили консультацию'})
+            Slot.objects.filter(id=instance.slot_id).update(is_available=True)
         instance.slot.is_available = True
-        instance.slot.save()
-        instance.save()
+        bump_slots_version([instance.slot.specialist_id])
         return instance
@@ -1,5 +1,7 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from .blocked_users import blocked_users
+from .cache import bump_slots_version
 from .models import *
 from .tasks import *
 
@@ -8,3 +10,25 @@ from .tasks import *
 # def user_post_save(sender, instance, created, **kwargs):
 #     if created:
 #         send_confirmation_email.delay(instance.id)
+
+
+@receiver(post_save, sender=Slot)
+@receiver(post_delete, sender=Slot)
+def slot_changed(sender, instance, **kwargs):
+    bump_slots_version([instance.specialist_id])
+
+
+@receiver(post_save, sender=AvailabilityRule)
+@receiver(post_delete, sender=AvailabilityRule)
+def availability_rule_changed(sender, instance, **kwargs):
+    # виртуальные слоты правила попадают в кэшированные страницы списка клиента
+    bump_slots_version([instance.specialist_id])
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, created, update_fields=None, **kwargs):
+    # новый незаблокированный пользователь и сохранения без is_blocked не меняют список блокировок
+    if created and not instance.is_blocked:
+        return
+    if update_fields is None or 'is_blocked' in update_fields:
+        blocked_users.changed()
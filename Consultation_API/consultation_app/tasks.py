@@ -1,54 +1,99 @@
 import logging
-from celery import shared_task
-from django.core.mail import send_mail
+from typing import Any, Dict, List, Tuple
+
+from celery import Task, shared_task
+from celery.signals import worker_process_shutdown
 from django.conf import settings
-from .models import *
+from django.db import transaction
+from .mail import build_message, email_connection, email_payload, is_permanent_failure
+from .models import Consultation, User
+from .tokens import make_activation_token
 
 logger = logging.getLogger(__name__)
 
 
+# Задачи получают готовый payload (получатель, ключ шаблона, параметры) и не читают БД.
+# Письма, не отправленные из-за временной ошибки, повторяются следующей попыткой задачи только для них
+RETRY_OPTIONS = {'max_retries': settings.EMAIL_SEND_MAX_RETRIES, 'default_retry_delay': settings.EMAIL_SEND_RETRY_DELAY}
+
+
+@shared_task(bind=True, **RETRY_OPTIONS)
+def send_email(self, payload: Dict[str, Any]) -> int:
+    sent, retry = send_payloads([payload])
+    if retry:
+        retry_failed(self, [payload], retry)
+    if sent:
+        logger.info(f"Email '{payload['template']}' sent to: {payload['recipient']}")
+    return sent
+
+
+@shared_task(bind=True, **RETRY_OPTIONS)
+def send_email_batch(self, payloads: List[Dict[str, Any]]) -> int:
+    sent, retry = send_payloads(payloads)
+    if retry:
+        retry_failed(self, [retry], retry)
+    logger.info(f"Email batch of {sent} messages sent")
+    return sent
+
+
+def send_payloads(payloads: List[Dict[str, Any]]) -> Tuple[int, List[Dict[str, Any]]]:
+    # число отправленных писем и payload писем, которые стоит отправить повторно (адреса, отклонённые
+    # сервером окончательно, не повторяются)
+    failed = email_connection.send_messages([build_message(payload) for payload in payloads])
+    return len(payloads) - len(failed), [payloads[index] for index, error in failed if not is_permanent_failure(error)]
+
+
+def retry_failed(task: Task, args: List[Any], payloads: List[Dict[str, Any]]) -> None:
+    if task.request.retries < task.max_retries:
+        raise task.retry(args=args)
+    logger.error(f'Giving up on {len(payloads)} emails after {task.request.retries} retries: '
+                 f'{[payload["recipient"] for payload in payloads]}')
+
+
+# Прежние задачи по типам писем. Остаются на один релиз, чтобы воркер обработал сообщения, поставленные
+# в брокер до обновления: читают пользователя или консультацию по id и ставят payload в очередь send_email,
+# у которой свои повторные попытки. Новый код их не вызывает
 @shared_task
-def send_confirmation_email(user_id, raw_password):
-    try:
-        user = User.objects.get(id=user_id)
-        confirmation_url = f'{settings.SITE_URL}/confirm/{user.activation_token}/'
-        if user.is_active == False:
-            send_mail(
-                subject='Подтверждение регистрации',
-                message=(
-                    f'Здравствуйте, {user.username}!\n\n'
-                    f'Пожалуйста, подтвердите вашу регистрацию, перейдя по следующей ссылке: {confirmation_url}\n\n'
-                    f'Ваш логин: {user.username}\n'
-                    f'Ваш пароль: {raw_password}\n'
-                ),
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email])
-            logger.info(f"Confirmation email sent to: {user.email}")
-    except User.DoesNotExist:
-        logger.error(f"User with ID {user_id} does not exist.")
+def send_confirmation_email(user_id: int, raw_password: str) -> None:
+    # пароль в письмо больше не попадает
+    user = User.objects.filter(id=user_id, is_active=False).first()
+    if user is None:
+        logger.error(f'Inactive user with ID {user_id} does not exist.')
+        return
+    send_email.delay(email_payload(
+        user.email, 'registration_confirmation', username=user.username,
+        confirmation_url=f'{settings.SITE_URL}/confirm/{make_activation_token(user.id)}/'
+    ))
 
 
 @shared_task
-def send_accepted_status_email(consultation_id):
-    consultation = Consultation.objects.get(id=consultation_id)
-    user = consultation.client
-    send_mail(
-        subject='Изменение статуса консультации',
-        message='Здравствуйте!\n\nСпециалист подтвердил вашу консультацию.',
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[user.email]
-    )
-    logger.info(f"Email with information sent to: {user.email}")
+def send_accepted_status_email(consultation_id: int) -> None:
+    consultation = Consultation.objects.select_related('client').get(id=consultation_id)
+    send_email.delay(email_payload(consultation.client.email, 'consultation_accepted'))
 
 
 @shared_task
-def send_rejected_status_email(consultation_id):
-    consultation = Consultation.objects.get(id=consultation_id)
-    user = consultation.client
-    send_mail(
-        subject='Изменение статуса консультации',
-        message='Здравствуйте!\n\nСпециалист отклонил ваш запрос на консультацию.',
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[user.email]
-    )
-    logger.info(f"Email with information sent to: {user.email}")
+def send_rejected_status_email(consultation_id: int) -> None:
+    consultation = Consultation.objects.select_related('client').get(id=consultation_id)
+    send_email.delay(email_payload(consultation.client.email, 'consultation_rejected'))
+
+
+@worker_process_shutdown.connect
+def close_email_connection(**kwargs):
+    email_connection.close()
+
+
+class EmailBatch:
+    # Письма, накопленные за одну операцию, уходят одной задачей Celery после коммита транзакции
+    # и отправляются воркером по одному SMTP-соединению
+    def __init__(self):
+        self.payloads: List[Dict[str, Any]] = []
+
+    def add(self, recipient: str, template: str, **params: Any) -> None:
+        self.payloads.append(email_payload(recipient, template, **params))
+
+    def send_on_commit(self) -> None:
+        if not self.payloads:
+            return
+        payloads, self.payloads = self.payloads, []
+        transaction.on_commit(lambda: send_email_batch.delay(payloads))
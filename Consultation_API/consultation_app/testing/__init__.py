@@ -1,2 +1,9 @@
 from .test_specialist import *
-from .test_client import *
\ No newline at end of file
+from .test_client import *
+from .test_admin import *
+from .test_queries import *
+from .test_mail import *
+from .test_rows import *
+from .test_renderers import *
+from .test_async_views import *
+from .test_settings import *
@@ -0,0 +1,46 @@
+import pytest
+from datetime import time
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+from consultation_app.blocked_users import blocked_users
+from consultation_app.mail import email_connection
+from consultation_app.models import Consultation, Slot
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # кэш в памяти процесса переживает тесты, а id объектов в новых тестах повторяются
+    cache.clear()
+    blocked_users.reset()
+    # SMTP-соединение воркера тоже живёт в процессе и может остаться от теста с другим EMAIL_BACKEND
+    email_connection.close()
+
+
+# Пользователи и консультации для тестов списков (test_rows, test_async_views)
+@pytest.fixture
+def user_client(db):
+    return get_user_model().objects.create_user(username='client_user', email='client@example.com',
+                                                password='password123', role='Client', is_active=True)
+
+
+@pytest.fixture
+def user_specialist(db):
+    return get_user_model().objects.create_user(username='specialist_user', email='specialist@example.com',
+                                                password='password123', role='Specialist', is_active=True)
+
+
+@pytest.fixture
+def consultations(user_client, user_specialist):
+    tomorrow = timezone.now().date() + timezone.timedelta(days=1)
+    slots = [
+        Slot.objects.create(specialist=user_specialist, date=tomorrow, start_time=time(9 + i, 0),
+                            end_time=time(9 + i, 30 + 15 * (i % 2)), context='Some context here' if i % 2 else None,
+                            is_available=i != 0)
+        for i in range(4)
+    ]
+    return [
+        Consultation.objects.create(slot=slots[0], client=user_client, status='Accepted'),
+        Consultation.objects.create(slot=slots[1], client=user_client, status='Rejected', is_canceled=True),
+        Consultation.objects.create(slot=slots[2], client=user_client),
+    ]
@@ -0,0 +1,178 @@
+import pytest
+from datetime import time
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from django.urls import reverse
+from rest_framework import status
+from django.utils import timezone
+from consultation_app.models import *
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def user_client(db):
+    User = get_user_model()
+    user = User.objects.create_user(
+        username='client_user',
+        email='client@example.com',
+        password='password123'
+    )
+    user.role = 'Client'
+    user.is_active = True
+    user.save()
+    return user
+
+
+@pytest.fixture
+def authenticated_api_admin(db):
+    User = get_user_model()
+    admin = User.objects.create_superuser(
+        username='admin_user',
+        email='admin@example.com',
+        password='password123'
+    )
+    api_client = APIClient()
+    api_client.force_authenticate(user=admin)
+    return api_client
+
+
+@pytest.fixture
+def token_api_client(api_client, user_client):
+    # в отличие от force_authenticate запрос проходит через BlockedUserMiddleware и JWT-аутентификацию
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user_client)}')
+    return api_client
+
+
+@pytest.mark.django_db
+class TestBlockedUserMiddleware:
+
+    def test_token_decoded_once(self, token_api_client, user_client, django_assert_num_queries):
+        url = reverse('client-consultations')
+        # первый запрос процесса загружает список заблокированных id
+        token_api_client.get(url)
+        # дальше проверка блокировки не обращается к БД: один запрос за пользователем и один за страницей
+        with django_assert_num_queries(2):
+            response = token_api_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_blocked_user(self, token_api_client, user_client):
+        user_client.is_blocked = True
+        user_client.save()
+        url = reverse('client-consultations')
+        response = token_api_client.get(url)
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert response.json() == {'error': 'Ваш аккаунт заблокирован'}
+
+    def test_invalid_token(self, api_client):
+        api_client.credentials(HTTP_AUTHORIZATION='Bearer invalid')
+        url = reverse('client-consultations')
+        response = api_client.get(url)
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_anonymous_request(self, api_client, django_assert_num_queries):
+        url = reverse('client-consultations')
+        with django_assert_num_queries(0):
+            response = api_client.get(url)
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_block_user_api(self, token_api_client, authenticated_api_admin, user_client,
+                            django_capture_on_commit_callbacks):
+        url = reverse('client-consultations')
+        assert token_api_client.get(url).status_code == status.HTTP_200_OK
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = authenticated_api_admin.post(reverse('block-user'), {'id': user_client.id})
+        assert response.status_code == status.HTTP_200_OK
+
+        assert token_api_client.get(url).status_code == status.HTTP_403_FORBIDDEN
+
+    def test_unblock_user_api(self, token_api_client, authenticated_api_admin, user_client,
+                              django_capture_on_commit_callbacks):
+        user_client.is_blocked = True
+        user_client.save()
+        url = reverse('client-consultations')
+        assert token_api_client.get(url).status_code == status.HTTP_403_FORBIDDEN
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = authenticated_api_admin.post(reverse('unblock-user'), {'id': user_client.id})
+        assert response.status_code == status.HTTP_200_OK
+
+        assert token_api_client.get(url).status_code == status.HTTP_200_OK
+
+    def test_block_user_single_update(self, authenticated_api_admin, user_client, django_assert_num_queries):
+        # один условный UPDATE is_blocked без чтения пользователя
+        with django_assert_num_queries(1):
+            response = authenticated_api_admin.post(reverse('block-user'), {'id': user_client.id})
+        assert response.status_code == status.HTTP_200_OK
+
+        response = authenticated_api_admin.post(reverse('block-user'), {'id': user_client.id})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['detail'] == 'Пользователь с таким id уже заблокирован'
+
+    def test_unblock_user_errors(self, authenticated_api_admin, user_client):
+        response = authenticated_api_admin.post(reverse('unblock-user'), {'id': user_client.id})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+        response = authenticated_api_admin.post(reverse('unblock-user'), {'id': 10 ** 9})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestBulkBlockUserAPIView:
+
+    @pytest.fixture
+    def users(self):
+        User = get_user_model()
+        return [User.objects.create_user(username=f'user_{i}', email=f'user_{i}@example.com', role='Client')
+                for i in range(4)]
+
+    def test_bulk_block(self, authenticated_api_admin, users, django_assert_num_queries,
+                        django_capture_on_commit_callbacks):
+        User.objects.filter(id=users[0].id).update(is_blocked=True)
+        ids = [user.id for user in users] + [10 ** 9]
+
+        # один запрос на всю пачку и одно обновление версии реестра блокировок
+        with django_capture_on_commit_callbacks() as callbacks, django_assert_num_queries(1):
+            response = authenticated_api_admin.post(reverse('block-users'), {'ids': ids}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {'changed': sorted(ids[1:4]), 'unchanged': [users[0].id], 'not_found': [10 ** 9]}
+        assert len(callbacks) == 1
+        assert User.objects.filter(id__in=ids, is_blocked=True).count() == 4
+
+    def test_bulk_unblock(self, authenticated_api_admin, users):
+        User.objects.filter(id__in=[users[0].id, users[1].id]).update(is_blocked=True)
+        ids = [user.id for user in users]
+
+        response = authenticated_api_admin.post(reverse('unblock-users'), {'ids': ids}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['changed'] == sorted([users[0].id, users[1].id])
+        assert response.data['unchanged'] == sorted([users[2].id, users[3].id])
+        assert not User.objects.filter(id__in=ids, is_blocked=True).exists()
+
+    def test_bulk_block_nothing_changed(self, authenticated_api_admin, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks() as callbacks:
+            response = authenticated_api_admin.post(reverse('block-users'), {'ids': [10 ** 9]}, format='json')
+
+        assert response.data == {'changed': [], 'unchanged': [], 'not_found': [10 ** 9]}
+        assert callbacks == []
+
+    def test_bulk_block_empty(self, authenticated_api_admin):
+        response = authenticated_api_admin.post(reverse('block-users'), {'ids': []}, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'ids' in response.data
+
+    def test_bulk_block_not_admin(self, api_client, user_client):
+        api_client.force_authenticate(user=user_client)
+        response = api_client.post(reverse('block-users'), {'ids': [user_client.id]}, format='json')
+        assert response.status_code == status.HTTP_403_FORBIDDEN
@@ -0,0 +1,104 @@
+import json
+import pytest
+from datetime import time
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.test import AsyncClient
+from django.urls import resolve, reverse
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+from django.utils import timezone
+from consultation_app.models import *
+from consultation_app.serializers import ClientConsultationListSerializer, SpecialistConsultationListSerializer
+
+
+def asgi_get(url, user=None, token=None, **params):
+    # запрос проходит через ASGIHandler: асинхронную цепочку middleware и асинхронный dispatch
+    headers = {}
+    if user is not None or token is not None:
+        headers['Authorization'] = f'Bearer {token or AccessToken.for_user(user)}'
+
+    async def get():
+        response = await AsyncClient().get(url, params, headers=headers)
+        content = (b''.join([part async for part in response.streaming_content])
+                   if response.streaming else response.content)
+        return response, content
+
+    return async_to_sync(get)()
+
+
+@pytest.mark.django_db
+class TestAsyncListViews:
+
+    @pytest.mark.parametrize('url_name', ['client-slots', 'client-consultations', 'specialist-consultations'])
+    def test_views_are_async(self, url_name):
+        assert iscoroutinefunction(resolve(reverse(url_name)).func)
+
+    def test_specialist_slots_stay_sync(self):
+        assert not iscoroutinefunction(resolve(reverse('specialist-slots')).func)
+
+    def test_client_consultations(self, user_client, consultations):
+        response, content = asgi_get(reverse('client-consultations'), user_client)
+
+        assert response.status_code == status.HTTP_200_OK
+        expected = ClientConsultationListSerializer(consultations, many=True).data
+        assert json.loads(content)['results'] == expected
+
+    def test_specialist_consultations_paginated(self, user_specialist, consultations):
+        url = reverse('specialist-consultations')
+        _, first = asgi_get(url, user_specialist, page_size=2)
+        first = json.loads(first)
+        _, second = asgi_get(first['next'], user_specialist)
+        results = first['results'] + json.loads(second)['results']
+
+        assert results == SpecialistConsultationListSerializer(consultations, many=True).data
+
+    def test_stream(self, user_specialist, consultations):
+        response, content = asgi_get(reverse('specialist-consultations'), user_specialist, stream='true')
+
+        assert response.streaming
+        assert json.loads(content) == SpecialistConsultationListSerializer(consultations, many=True).data
+
+    def test_client_slots_with_virtual(self, user_client, user_specialist):
+        tomorrow = timezone.now().date() + timezone.timedelta(days=1)
+        Slot.objects.create(specialist=user_specialist, date=tomorrow, start_time=time(9, 0), end_time=time(9, 30))
+        AvailabilityRule.objects.create(specialist=user_specialist, weekdays=[tomorrow.weekday()],
+                                        start_time=time(10, 0), end_time=time(11, 0),
+                                        slot_duration=timezone.timedelta(minutes=30),
+                                        start_date=tomorrow, end_date=tomorrow)
+
+        response, content = asgi_get(reverse('client-slots'), user_client)
+
+        assert response.status_code == status.HTTP_200_OK
+        results = json.loads(content)['results']
+        assert [(slot['start_time'], slot['rule_id'] is not None) for slot in results] == [
+            ('09:00:00', False), ('10:00:00', True), ('10:30:00', True)
+        ]
+
+    def test_wrong_role(self, user_client):
+        response, _ = asgi_get(reverse('specialist-consultations'), user_client)
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_invalid_token(self, db):
+        response, content = asgi_get(reverse('client-consultations'), token='invalid')
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert json.loads(content)['code'] == 'token_not_valid'
+
+    def test_inactive_user(self, user_client):
+        user_client.is_active = False
+        user_client.save()
+
+        response, content = asgi_get(reverse('client-consultations'), user_client)
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert json.loads(content) == {'detail': 'User is inactive'}
+
+    def test_blocked_user(self, user_client):
+        user_client.is_blocked = True
+        user_client.save()
+
+        response, content = asgi_get(reverse('client-consultations'), user_client)
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert json.loads(content) == {'error': 'Ваш аккаунт заблокирован'}
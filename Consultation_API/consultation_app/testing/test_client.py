@@ -1,11 +1,17 @@
 import pytest
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import time
+from django.db import connection
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from django.urls import reverse
 from rest_framework import status
 from django.utils import timezone
+from django.conf import settings
 from consultation_app.models import *
+from consultation_app.serializers import CancelConsultationSerializer
+from rest_framework.exceptions import ValidationError
 
 
 @pytest.fixture
@@ -124,6 +130,17 @@ class TestClientConsultationAPIView:
         assert response.status_code == status.HTTP_400_BAD_REQUEST
         assert response.data['detail'] == 'Для данного слота уже существует подтверждённая консультация'
 
+    def test_create_consultation_after_cancel(self, authenticated_api_client, valid_slot):
+        user_client_2 = get_user_model().objects.create_user(username='client_user_2', email='client2@example.com',
+                                                             role='Client')
+        slot = Slot.objects.create(**valid_slot)
+        # отменённая подтверждённая консультация не занимает слот
+        Consultation.objects.create(slot=slot, client=user_client_2, status='Accepted', is_canceled=True)
+        url = reverse('create-consultation')
+        response = authenticated_api_client.post(url, {'slot_id': slot.id})
+
+        assert response.status_code == status.HTTP_200_OK
+
     def test_create_consultation_already_sent(self, user_client, authenticated_api_client, valid_slot):
         slot = Slot.objects.create(**valid_slot)
         Consultation.objects.create(slot=slot, client=user_client)
@@ -157,6 +174,321 @@ class TestClientConsultationAPIView:
         assert response.status_code == status.HTTP_404_NOT_FOUND
         assert response.data['detail'] == 'Слота с таким id не существует'
 
+    @staticmethod
+    def book_concurrently(slot, clients):
+        url = reverse('create-consultation')
+        barrier = threading.Barrier(len(clients))
+
+        def book(client):
+            api_client = APIClient()
+            api_client.force_authenticate(user=client)
+            barrier.wait()
+            try:
+                return api_client.post(url, {'slot_id': slot.id}).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+            return list(executor.map(book, clients))
+
+    def test_create_consultation_concurrent_same_client(self, user_client, valid_slot):
+        slot = Slot.objects.create(**valid_slot)
+        results = self.book_concurrently(slot, [user_client] * 10)
+
+        assert results.count(status.HTTP_200_OK) == 1
+        assert results.count(status.HTTP_400_BAD_REQUEST) == 9
+        assert Consultation.objects.filter(slot=slot).count() == 1
+
+    def test_create_consultation_concurrent_clients(self, valid_slot):
+        User = get_user_model()
+        clients = [User.objects.create_user(username=f'client_{i}', email=f'client_{i}@example.com', role='Client')
+                   for i in range(10)]
+        slot = Slot.objects.create(**valid_slot)
+        results = self.book_concurrently(slot, clients)
+
+        assert results == [status.HTTP_200_OK] * 10
+        assert Consultation.objects.filter(slot=slot).count() == 10
+
+
+@pytest.mark.django_db
+class TestClientSlotListView:
+
+    @pytest.fixture
+    def many_slots(self, user_specialist):
+        User = get_user_model()
+        another_specialist = User.objects.create_user(
+            username='specialist_user_2',
+            email='specialist2@example.com',
+            password='password123',
+            role='Specialist'
+        )
+        date = timezone.now().date() + timezone.timedelta(days=1)
+        slots = []
+        # у двух специалистов совпадают дата и время начала, порядок между ними определяет id специалиста
+        for specialist in (user_specialist, another_specialist):
+            for hour in (10, 11, 12):
+                slots.append(Slot.objects.create(specialist=specialist, date=date,
+                                                 start_time=time(hour, 0), end_time=time(hour, 30)))
+        return sorted(slots, key=lambda s: (s.date, s.start_time, s.specialist_id))
+
+    def test_get_slots_paginated(self, authenticated_api_client, many_slots):
+        url = reverse('client-slots')
+        response = authenticated_api_client.get(url, {'page_size': 4})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [s['id'] for s in response.data['results']] == [s.id for s in many_slots[:4]]
+        assert response.data['previous'] is None
+        assert response.data['next'] is not None
+
+    def test_get_slots_follow_cursor(self, authenticated_api_client, many_slots):
+        url = reverse('client-slots')
+        received = []
+        response = authenticated_api_client.get(url, {'page_size': 4})
+        received.extend(s['id'] for s in response.data['results'])
+        next_page = authenticated_api_client.get(response.data['next'])
+        received.extend(s['id'] for s in next_page.data['results'])
+
+        assert received == [s.id for s in many_slots]
+        assert next_page.data['next'] is None
+
+        previous_page = authenticated_api_client.get(next_page.data['previous'])
+        assert [s['id'] for s in previous_page.data['results']] == [s.id for s in many_slots[:4]]
+
+    def test_get_slots_query_count(self, authenticated_api_client, many_slots, django_assert_num_queries):
+        url = reverse('client-slots')
+        # количество запросов не зависит от числа слотов и специалистов на странице: слоты и правила расписания
+        with django_assert_num_queries(2):
+            response = authenticated_api_client.get(url)
+
+        assert len(response.data['results']) == len(many_slots)
+        assert {s['specialist_username'] for s in response.data['results']} == {'specialist_user', 'specialist_user_2'}
+
+    def test_get_slots_cached(self, authenticated_api_client, many_slots, django_assert_num_queries):
+        url = reverse('client-slots')
+        first_response = authenticated_api_client.get(url)
+
+        with django_assert_num_queries(0):
+            response = authenticated_api_client.get(url)
+
+        assert response.data == first_response.data
+
+    def test_get_slots_cache_invalidated(self, authenticated_api_client, many_slots, user_specialist,
+                                         django_capture_on_commit_callbacks):
+        url = reverse('client-slots')
+        authenticated_api_client.get(url)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            new_slot = Slot.objects.create(specialist=user_specialist, date=many_slots[0].date,
+                                           start_time=time(15, 0), end_time=time(15, 30))
+        response = authenticated_api_client.get(url)
+        assert new_slot.id in [s['id'] for s in response.data['results']]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            new_slot.delete()
+        response = authenticated_api_client.get(url)
+        assert new_slot.id not in [s['id'] for s in response.data['results']]
+
+    def test_get_slots_invalid_cursor(self, authenticated_api_client, many_slots):
+        url = reverse('client-slots')
+        response = authenticated_api_client.get(url, {'cursor': 'invalid'})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.data['detail'] == 'Некорректный курсор'
+
+    def test_filter_slots_by_specialist(self, authenticated_api_client, many_slots, user_specialist):
+        response = authenticated_api_client.get(reverse('client-slots'), {'specialist': user_specialist.id})
+
+        assert [s['id'] for s in response.data['results']] == [
+            s.id for s in many_slots if s.specialist_id == user_specialist.id
+        ]
+
+    def test_filter_slots_by_time_window(self, authenticated_api_client, many_slots):
+        response = authenticated_api_client.get(reverse('client-slots'), {'time_from': '10:30', 'time_to': '12:30'})
+
+        assert [s['start_time'] for s in response.data['results']] == ['11:00:00', '11:00:00', '12:00:00', '12:00:00']
+
+    def test_filter_slots_by_date_and_duration(self, authenticated_api_client, many_slots, user_specialist):
+        later = many_slots[0].date + timezone.timedelta(days=3)
+        long_slot = Slot.objects.create(specialist=user_specialist, date=later,
+                                        start_time=time(10, 0), end_time=time(11, 30))
+        url = reverse('client-slots')
+
+        response = authenticated_api_client.get(url, {'min_duration': '01:00:00'})
+        assert [s['id'] for s in response.data['results']] == [long_slot.id]
+
+        response = authenticated_api_client.get(url, {'date_from': later.isoformat()})
+        assert [s['id'] for s in response.data['results']] == [long_slot.id]
+
+        response = authenticated_api_client.get(url, {'date_to': many_slots[0].date.isoformat()})
+        assert len(response.data['results']) == len(many_slots)
+
+    def test_filter_slots_follow_cursor(self, authenticated_api_client, many_slots, user_specialist):
+        url = reverse('client-slots')
+        response = authenticated_api_client.get(url, {'specialist': user_specialist.id, 'page_size': 2})
+        next_page = authenticated_api_client.get(response.data['next'])
+
+        assert [s['id'] for s in response.data['results'] + next_page.data['results']] == [
+            s.id for s in many_slots if s.specialist_id == user_specialist.id
+        ]
+
+    def test_filter_slots_invalid(self, authenticated_api_client, many_slots):
+        response = authenticated_api_client.get(reverse('client-slots'), {'date_from': 'tomorrow'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'date_from' in response.data
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAvailabilityRuleSlots:
+
+    @pytest.fixture
+    def rule(self, user_specialist):
+        tomorrow = timezone.now().date() + timezone.timedelta(days=1)
+        # по правилу два дня (завтра и через неделю) по четыре слота
+        return AvailabilityRule.objects.create(
+            specialist=user_specialist,
+            weekdays=[tomorrow.weekday()],
+            start_time=time(10, 0),
+            end_time=time(12, 0),
+            slot_duration=timezone.timedelta(minutes=30),
+            start_date=tomorrow,
+            end_date=tomorrow + timezone.timedelta(days=13)
+        )
+
+    def test_get_virtual_slots(self, authenticated_api_client, rule):
+        url = reverse('client-slots')
+        response = authenticated_api_client.get(url)
+
+        assert response.status_code == status.HTTP_200_OK
+        results = response.data['results']
+        assert len(results) == 8
+        assert all(s['id'] is None and s['rule_id'] == rule.id for s in results)
+        assert [s['start_time'] for s in results[:4]] == ['10:00:00', '10:30:00', '11:00:00', '11:30:00']
+        assert results[0]['duration'] == '00:30:00'
+        assert not Slot.objects.exists()
+
+    def test_get_virtual_slots_merged_with_real(self, authenticated_api_client, user_specialist, rule):
+        real_slot = Slot.objects.create(specialist=user_specialist, date=rule.start_date,
+                                        start_time=time(9, 0), end_time=time(9, 30))
+        # реальный слот скрывает пересекающиеся с ним виртуальные
+        Slot.objects.create(specialist=user_specialist, date=rule.start_date,
+                            start_time=time(10, 45), end_time=time(11, 15), is_available=False)
+        url = reverse('client-slots')
+        response = authenticated_api_client.get(url, {'page_size': 3})
+
+        results = response.data['results']
+        assert [(s['id'], s['start_time']) for s in results] == [
+            (real_slot.id, '09:00:00'), (None, '10:00:00'), (None, '11:30:00')]
+
+        received = [(s['id'], s['date'], s['start_time']) for s in results]
+        next_url = response.data['next']
+        while next_url:
+            page = authenticated_api_client.get(next_url)
+            received.extend((s['id'], s['date'], s['start_time']) for s in page.data['results'])
+            next_url = page.data['next']
+        assert len(received) == len(set(received)) == 7
+
+        previous_page = authenticated_api_client.get(page.data['previous'])
+        assert previous_page.data['results'][-1]['date'] == page.data['results'][0]['date']
+
+    def test_filter_virtual_slots(self, authenticated_api_client, user_specialist, rule):
+        url = reverse('client-slots')
+
+        response = authenticated_api_client.get(url, {'time_from': '10:45', 'time_to': '11:30'})
+        assert [s['start_time'] for s in response.data['results']] == ['11:00:00', '11:00:00']
+
+        response = authenticated_api_client.get(url, {'date_from': (rule.start_date + timezone.timedelta(days=1))})
+        assert {s['date'] for s in response.data['results']} == {str(rule.start_date + timezone.timedelta(days=7))}
+
+        response = authenticated_api_client.get(url, {'min_duration': '01:00:00'})
+        assert response.data['results'] == []
+
+        response = authenticated_api_client.get(url, {'specialist': user_specialist.id + 1000})
+        assert response.data['results'] == []
+
+    def test_virtual_slots_far_apart_rules(self, authenticated_api_client, user_specialist, rule):
+        far_start = rule.start_date + timezone.timedelta(days=300)
+        far_rule = AvailabilityRule.objects.create(
+            specialist=user_specialist, weekdays=[far_start.weekday()], start_time=time(15, 0),
+            end_time=time(16, 0), slot_duration=timezone.timedelta(minutes=30),
+            start_date=far_start, end_date=far_start)
+        # правило за горизонтом (созданное до ограничения даты начала) не разворачивается
+        beyond = timezone.now().date() + timezone.timedelta(days=settings.AVAILABILITY_HORIZON_DAYS + 1)
+        AvailabilityRule.objects.create(
+            specialist=user_specialist, weekdays=list(range(7)), start_time=time(15, 0), end_time=time(16, 0),
+            slot_duration=timezone.timedelta(minutes=30), start_date=beyond, end_date=beyond)
+        url = reverse('client-slots')
+
+        received = []
+        next_url = url + '?page_size=5'
+        while next_url:
+            page = authenticated_api_client.get(next_url)
+            received.extend((s['date'], s['rule_id']) for s in page.data['results'])
+            next_url = page.data['next']
+
+        assert len(received) == 10
+        assert received[-2:] == [(str(far_start), far_rule.id)] * 2
+
+    def test_rule_next_active_day(self, rule):
+        after_first = rule.start_date + timezone.timedelta(days=1)
+
+        assert rule.next_active_day(rule.start_date - timezone.timedelta(days=30)) == rule.start_date
+        assert rule.next_active_day(after_first) == rule.start_date + timezone.timedelta(days=7)
+        assert rule.next_active_day(after_first, reverse=True) == rule.start_date
+        assert rule.next_active_day(rule.end_date + timezone.timedelta(days=1), reverse=True) == (
+            rule.start_date + timezone.timedelta(days=7))
+        assert rule.next_active_day(rule.start_date + timezone.timedelta(days=8)) is None
+
+    def test_book_virtual_slot(self, authenticated_api_client, rule):
+        url = reverse('create-consultation')
+        data = {'rule_id': rule.id, 'date': rule.start_date, 'start_time': '10:30'}
+        response = authenticated_api_client.post(url, data)
+
+        assert response.status_code == status.HTTP_200_OK
+        slot = Slot.objects.get()
+        assert slot.start_time == time(10, 30)
+        assert slot.end_time == time(11, 0)
+        assert slot.duration == timezone.timedelta(minutes=30)
+        assert Consultation.objects.get().slot == slot
+
+        results = authenticated_api_client.get(reverse('client-slots')).data['results']
+        assert len(results) == 8
+        assert [s['id'] for s in results if s['start_time'] == '10:30:00'] == [slot.id, None]
+
+    def test_book_virtual_slot_not_in_rule(self, authenticated_api_client, rule):
+        url = reverse('create-consultation')
+        data = {'rule_id': rule.id, 'date': rule.start_date, 'start_time': '10:15'}
+        response = authenticated_api_client.post(url, data)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['detail'][0] == 'В расписании специалиста нет слота на это время'
+        assert not Slot.objects.exists()
+
+    def test_book_virtual_slot_concurrently(self, rule):
+        User = get_user_model()
+        clients = [User.objects.create_user(username=f'client_{i}', email=f'client_{i}@example.com', role='Client')
+                   for i in range(5)]
+        url = reverse('create-consultation')
+        data = {'rule_id': rule.id, 'date': rule.start_date, 'start_time': '10:30'}
+        barrier = threading.Barrier(len(clients))
+
+        def book(client):
+            api_client = APIClient()
+            api_client.force_authenticate(user=client)
+            barrier.wait()
+            try:
+                return api_client.post(url, data).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=len(clients)) as executor:
+            results = list(executor.map(book, clients))
+
+        # все запросы записываются на один и тот же созданный слот
+        assert results == [status.HTTP_200_OK] * len(clients)
+        slot = Slot.objects.get()
+        assert Consultation.objects.filter(slot=slot).count() == len(clients)
+
 
 @pytest.mark.django_db(transaction=True)
 class TestClientConsultationListView:
@@ -166,17 +498,17 @@ class TestClientConsultationListView:
         response = authenticated_api_client.get(url)
 
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == 1
-        assert response.data[0]['id'] == consultation.id
-        assert response.data[0]['specialist_username'] == consultation.slot.specialist.username
-        assert response.data[0]['status_display'] == consultation.get_status_display()
+        assert len(response.data['results']) == 1
+        assert response.data['results'][0]['id'] == consultation.id
+        assert response.data['results'][0]['specialist_username'] == consultation.slot.specialist.username
+        assert response.data['results'][0]['status_display'] == consultation.get_status_display()
 
     def test_get_consultations_empty(self, authenticated_api_client):
         url = reverse('client-consultations')
         response = authenticated_api_client.get(url)
 
         assert response.status_code == status.HTTP_200_OK
-        assert response.data == []
+        assert response.data['results'] == []
 
     def test_get_slots_non_client(self, authenticated_api_specialist):
         url = reverse('client-consultations')
@@ -186,12 +518,31 @@ class TestClientConsultationListView:
 
     def test_get_consultations_with_multiple_entries(self, authenticated_api_client, consultation, slot):
         url = reverse('client-consultations')
-        Consultation.objects.create(slot=slot, client=consultation.client, status='Pending')
-        Consultation.objects.create(slot=slot, client=consultation.client, status='Completed')
+        # на один слот клиент может отправить только одну заявку, поэтому берём другие слоты
+        for hour in (15, 16):
+            other_slot = Slot.objects.create(specialist=slot.specialist, date=slot.date,
+                                             start_time=time(hour, 0), end_time=time(hour, 30))
+            Consultation.objects.create(slot=other_slot, client=consultation.client, status='Pending')
         response = authenticated_api_client.get(url)
 
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) > 1
+        assert len(response.data['results']) > 1
+
+    def test_get_consultations_query_count(self, authenticated_api_client, user_client, django_assert_num_queries):
+        User = get_user_model()
+        date = timezone.now().date() + timezone.timedelta(days=1)
+        for i in range(5):
+            specialist = User.objects.create_user(username=f'specialist_{i}', email=f'specialist_{i}@example.com',
+                                                  password='password123', role='Specialist')
+            slot = Slot.objects.create(specialist=specialist, date=date, start_time=time(10 + i, 0),
+                                       end_time=time(10 + i, 30))
+            Consultation.objects.create(slot=slot, client=user_client)
+        url = reverse('client-consultations')
+
+        with django_assert_num_queries(1):
+            response = authenticated_api_client.get(url)
+
+        assert [c['specialist_username'] for c in response.data['results']] == [f'specialist_{i}' for i in range(5)]
 
 
 @pytest.mark.django_db
@@ -214,6 +565,14 @@ class TestCancelConsultationAPIView:
         assert consultation.is_canceled is True
         assert consultation.cancel_comment == 'Some reason'
         assert consultation.cancel_reason_choice == 'Personal'
+        assert Slot.objects.get(id=consultation.slot_id).is_available is True
+
+    def test_cancel_consultation_concurrent(self, consultation):
+        # вторая отмена по устаревшему объекту не проходит условный UPDATE
+        Consultation.objects.filter(id=consultation.id).update(status='Accepted', is_canceled=True)
+        serializer = CancelConsultationSerializer()
+        with pytest.raises(ValidationError):
+            serializer.update(consultation, {'cancel_comment': 'Some reason'})
 
     def test_cancel_consultation_not_accepted(self, authenticated_api_client, consultation):
         url = reverse('cancel-consultation')
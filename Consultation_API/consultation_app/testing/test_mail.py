@@ -0,0 +1,185 @@
+import pytest
+import time
+from io import StringIO
+from django.core.management import call_command
+from django.test import override_settings
+from benchmarks.fake_smtp import FakeSMTPServer
+from consultation_app.mail import build_message, email_connection, email_payload
+from datetime import time as dt_time
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from consultation_app.models import Consultation, Slot
+from consultation_app.tasks import (send_email, send_email_batch, send_confirmation_email, send_accepted_status_email,
+                                    send_rejected_status_email)
+from consultation_app.tokens import read_activation_token
+
+
+@pytest.fixture
+def smtp_server():
+    with FakeSMTPServer() as server:
+        with override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                               EMAIL_HOST='127.0.0.1', EMAIL_PORT=server.port, EMAIL_USE_SSL=False,
+                               EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='', DEFAULT_FROM_EMAIL='noreply@example.com'):
+            yield server
+
+
+def make_payloads(count):
+    return [email_payload(f'client_{i}@example.com', 'consultation_rejected') for i in range(count)]
+
+
+class TestPooledEmailConnection:
+
+    def test_batch_uses_one_connection(self, smtp_server):
+        assert send_email_batch(make_payloads(20)) == 20
+        assert send_email_batch(make_payloads(5)) == 5
+
+        assert smtp_server.messages == 25
+        assert smtp_server.connections == 1
+
+    def test_reconnect_after_disconnect(self, smtp_server):
+        send_email_batch(make_payloads(2))
+        # сервер оборвал соединение: письмо отправляется повторно по новому соединению
+        email_connection._connection.connection.close()
+        send_email_batch(make_payloads(3))
+
+        assert smtp_server.messages == 5
+        assert smtp_server.connections == 2
+
+    def test_reconnect_after_idle(self, smtp_server, settings):
+        settings.EMAIL_CONNECTION_MAX_IDLE = 0.5
+        send_email_batch(make_payloads(2))
+        time.sleep(0.6)
+        send_email_batch(make_payloads(2))
+
+        assert smtp_server.messages == 4
+        assert smtp_server.connections == 2
+
+
+class TestFailedMessages:
+
+    @pytest.fixture
+    def refusing_server(self, request):
+        with FakeSMTPServer(refused={'client_1@example.com': request.param}) as server:
+            with override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                                   EMAIL_HOST='127.0.0.1', EMAIL_PORT=server.port, EMAIL_USE_SSL=False,
+                                   EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+                                   DEFAULT_FROM_EMAIL='noreply@example.com'):
+                yield server
+
+    @pytest.mark.parametrize('refusing_server', ['550 mailbox unavailable'], indirect=True)
+    def test_refused_address_does_not_stop_batch(self, refusing_server):
+        # адрес отклонён окончательно: остальные письма отправляются, отклонённое не повторяется
+        assert send_email_batch.delay(make_payloads(4)).get() == 3
+
+        assert refusing_server.messages == 3
+        assert refusing_server.recipients.count('client_1@example.com') == 1
+
+    @pytest.mark.parametrize('refusing_server', ['451 try again later'], indirect=True)
+    def test_temporary_failure_retried(self, refusing_server, monkeypatch):
+        # временная ошибка: повторяется только неотправленное письмо, не больше EMAIL_SEND_MAX_RETRIES раз.
+        # Без пробрасывания исключений eager-режим выполняет повторы синхронно, а не поднимает Retry
+        monkeypatch.setitem(send_email_batch.app.conf, 'CELERY_TASK_EAGER_PROPAGATES', False)
+        send_email_batch.delay(make_payloads(4))
+
+        assert refusing_server.messages == 3
+        assert refusing_server.recipients.count('client_0@example.com') == 1
+        assert refusing_server.recipients.count('client_1@example.com') == 1 + send_email_batch.max_retries
+
+
+class TestEmailPayload:
+
+    def test_build_message_renders_template(self):
+        message = build_message(email_payload('user@example.com', 'registration_confirmation', username='user',
+                                              confirmation_url='http://site/confirm/1/'))
+
+        assert message.to == ['user@example.com']
+        assert message.subject == 'Подтверждение регистрации'
+        assert 'http://site/confirm/1/' in message.body
+        assert 'Ваш логин: user' in message.body
+
+    def test_unknown_template(self):
+        with pytest.raises(ValueError):
+            email_payload('user@example.com', 'unknown')
+
+    @pytest.mark.django_db
+    def test_worker_does_not_query_database(self, django_assert_num_queries, mailoutbox):
+        with django_assert_num_queries(0):
+            send_email(email_payload('user@example.com', 'consultation_accepted'))
+            send_email_batch(make_payloads(3))
+
+        assert len(mailoutbox) == 4
+
+
+@pytest.mark.django_db
+class TestLegacyEmailTasks:
+    # сообщения, поставленные в брокер до перехода на send_email, обрабатываются прежними задачами
+
+    @pytest.fixture
+    def consultation(self):
+        User = get_user_model()
+        specialist = User.objects.create_user(username='specialist', email='specialist@example.com',
+                                              role='Specialist')
+        client = User.objects.create_user(username='client', email='client@example.com', role='Client')
+        slot = Slot.objects.create(specialist=specialist, date=timezone.now().date() + timezone.timedelta(days=1),
+                                   start_time=dt_time(10, 0), end_time=dt_time(10, 30))
+        return Consultation.objects.create(slot=slot, client=client)
+
+    def test_confirmation(self, mailoutbox):
+        user = get_user_model().objects.create_user(username='new_user', email='new@example.com', role='Client')
+
+        send_confirmation_email.delay(user.id, 'password123')
+
+        message = mailoutbox[0]
+        assert message.to == ['new@example.com']
+        assert 'password123' not in message.body
+        token = message.body.split('/confirm/')[1].split('/')[0]
+        assert read_activation_token(token) == user.id
+
+    def test_confirmation_active_user(self, mailoutbox):
+        user = get_user_model().objects.create_user(username='new_user', email='new@example.com', role='Client',
+                                                    is_active=True)
+
+        send_confirmation_email(user.id, 'password123')
+        assert mailoutbox == []
+
+    def test_status(self, consultation, mailoutbox):
+        send_accepted_status_email.delay(consultation.id)
+        send_rejected_status_email.delay(consultation.id)
+
+        assert [(message.to, message.body) for message in mailoutbox] == [
+            (['client@example.com'], 'Здравствуйте!\n\nСпециалист подтвердил вашу консультацию.'),
+            (['client@example.com'], 'Здравствуйте!\n\nСпециалист отклонил ваш запрос на консультацию.'),
+        ]
+
+
+@pytest.mark.django_db
+class TestSendActivationLinks:
+    # ссылки с UUID из удалённой колонки activation_token заменяются новыми подписанными ссылками
+
+    def test_sends_signed_links_to_inactive_users(self, mailoutbox, django_capture_on_commit_callbacks):
+        User = get_user_model()
+        inactive = [User.objects.create_user(username=f'user_{i}', email=f'user_{i}@example.com', role='Client')
+                    for i in range(3)]
+        User.objects.create_user(username='active', email='active@example.com', role='Client', is_active=True)
+        User.objects.create_user(username='blocked', email='blocked@example.com', role='Client', is_blocked=True)
+        out = StringIO()
+
+        with django_capture_on_commit_callbacks(execute=True) as callbacks:
+            call_command('send_activation_links', '--batch-size', '2', stdout=out)
+
+        # две задачи Celery: пачка из двух писем и остаток
+        assert len(callbacks) == 2
+        assert [message.to for message in mailoutbox] == [[user.email] for user in inactive]
+        for user, message in zip(inactive, mailoutbox):
+            token = message.body.split('/confirm/')[1].split('/')[0]
+            assert read_activation_token(token) == user.id
+        assert 'Activation links queued for 3 users' in out.getvalue()
+
+    def test_dry_run(self, mailoutbox):
+        get_user_model().objects.create_user(username='new_user', email='new@example.com', role='Client')
+        out = StringIO()
+
+        call_command('send_activation_links', '--dry-run', stdout=out)
+
+        assert mailoutbox == []
+        assert out.getvalue() == 'Inactive users: 1\n'
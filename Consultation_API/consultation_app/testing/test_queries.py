@@ -0,0 +1,31 @@
+import pytest
+from io import StringIO
+from django.core.management import call_command
+
+
+@pytest.mark.django_db
+class TestExplainQueriesCommand:
+
+    @pytest.fixture
+    def report(self):
+        out = StringIO()
+        # на пустой тестовой БД seq scan дешевле любого индекса, поэтому проверяется, что индекс применим
+        call_command('explain_queries', '--disable-seqscan', '--check', stdout=out)
+        return {line.split(':')[0].split()[-1]: line for line in out.getvalue().splitlines()}
+
+    def test_slot_lists_use_keyset_indexes(self, report):
+        # на пустой таблице оба частичных индекса свободных слотов стоят одинаково
+        assert 'slot_available_' in report['client_slots']
+        assert 'slot_available_search_idx' in report['client_slots_filtered']
+        assert 'slot_available_specialist_idx' in report['client_slots_by_specialist']
+        assert 'slot_specialist_keyset_idx' in report['specialist_slots']
+        assert 'slot_specialist_keyset_idx' in report['specialist_slots_by_dates']
+
+    def test_booking_checks_use_constraint_indexes(self, report):
+        assert 'unique_accepted_consultation_slot' in report['booking_checks']
+        assert 'unique_consultation_slot_client' in report['booking_checks']
+        assert 'unique_consultation_slot_client' in report['slot_consultations']
+
+    def test_all_queries_use_indexes(self, report):
+        assert len(report) == 9
+        assert all(line.startswith('OK') for line in report.values())
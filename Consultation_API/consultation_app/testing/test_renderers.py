@@ -0,0 +1,115 @@
+import pytest
+import uuid
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO
+from django.conf import settings
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework import status
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from consultation_app.models import *
+from consultation_app.renderers import ORJSONParser, ORJSONRenderer
+from consultation_app.serializers import ClientSlotListSerializer
+
+
+def client_slot_payload():
+    specialist = User(id=3, username='user3')
+    slots = []
+    for i in range(3):
+        slot = Slot(id=i + 1, specialist=specialist, date=date(2024, 9, 23), start_time=time(10 + i, 0),
+                    end_time=time(10 + i, 30), context='Контекст' if i else None)
+        slot.duration = timedelta(minutes=30)
+        slot.rule_id = None
+        slots.append(slot)
+    return {'next': 'http://testserver/api/client_slots/?cursor=eyJwIjpbXX0=', 'previous': None,
+            'results': ClientSlotListSerializer(slots, many=True).data}
+
+
+class TestORJSONRenderer:
+
+    @pytest.mark.parametrize('data', [
+        client_slot_payload(),
+        {'date': date(2024, 9, 23), 'start_time': time(13, 0), 'end_time': time(13, 30, 15, 250000),
+         'duration': timedelta(hours=1, minutes=30)},
+        {'created': datetime(2024, 9, 23, 10, 0, 0, 123456, tzinfo=dt_timezone.utc),
+         'naive': datetime(2024, 9, 23, 10, 0)},
+        {'detail': ErrorDetail('Слота с таким id не существует', code='not_found')},
+        {'slots': [{'0': [ErrorDetail('Время слота пересекается с другим слотом', code='invalid')]}]},
+        {'amount': Decimal('10.50'), 'id': uuid.UUID(int=1), 'lazy': gettext_lazy('Роль'), 1: 'int key'},
+        {'separators': 'line\u2028paragraph\u2029', 'nested': [1, 2.5, True, None, (3, 4)]},
+        ['Вы уже отправили запрос на консультацию на эту дату'],
+    ])
+    def test_same_output_as_json_renderer(self, data):
+        assert ORJSONRenderer().render(data) == JSONRenderer().render(data)
+
+    def test_indent(self):
+        data = client_slot_payload()
+
+        assert (ORJSONRenderer().render(data, 'application/json; indent=4') ==
+                JSONRenderer().render(data, 'application/json; indent=4'))
+
+    def test_none(self):
+        assert ORJSONRenderer().render(None) == b''
+
+    @pytest.mark.parametrize('value', [float('nan'), float('inf'), Decimal('NaN'), Decimal('-Infinity')])
+    def test_non_finite(self, value):
+        data = {'results': [{'context': None, 'value': value}]}
+
+        with pytest.raises(ValueError) as expected:
+            JSONRenderer().render(data)
+        with pytest.raises(ValueError) as exc:
+            ORJSONRenderer().render(data)
+
+        assert str(exc.value) == str(expected.value)
+
+
+class TestORJSONParser:
+
+    def test_same_result_as_json_parser(self):
+        body = '{"slot_id": 1, "slots": [{"date": "2024-09-23", "context": "Контекст"}], "x": 1.5}'.encode()
+
+        assert ORJSONParser().parse(BytesIO(body)) == JSONParser().parse(BytesIO(body))
+
+    def test_other_encoding(self):
+        body = '{"context": "Контекст"}'.encode('cp1251')
+
+        assert ORJSONParser().parse(BytesIO(body), parser_context={'encoding': 'cp1251'}) == {'context': 'Контекст'}
+
+    def test_lone_surrogate(self):
+        # orjson не принимает одиночные суррогаты, модуль json принимает
+        body = b'{"context": "\\ud800"}'
+
+        assert ORJSONParser().parse(BytesIO(body)) == JSONParser().parse(BytesIO(body))
+
+    @pytest.mark.parametrize('body', [b'{"slot_id": ', b'{"value": NaN}', b'\xff', b'[1, 2,]', b''])
+    def test_invalid(self, body):
+        with pytest.raises(ParseError) as expected:
+            JSONParser().parse(BytesIO(body))
+        with pytest.raises(ParseError) as exc:
+            ORJSONParser().parse(BytesIO(body))
+
+        assert str(exc.value.detail) == str(expected.value.detail)
+
+
+@pytest.mark.django_db
+class TestJSONBackendSettings:
+
+    def test_default_backend(self):
+        assert settings.REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'][0] == 'consultation_app.renderers.ORJSONRenderer'
+        assert settings.REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'][0] == 'consultation_app.renderers.ORJSONParser'
+
+    def test_invalid_json_body(self):
+        user = User.objects.create_user(username='client_user', email='client@example.com', password='password123',
+                                        role='Client')
+        api_client = APIClient()
+        api_client.force_authenticate(user=user)
+
+        response = api_client.post(reverse('create-consultation'), data=b'{"slot_id": ',
+                                   content_type='application/json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()['detail'] == 'JSON parse error - Expecting value: line 1 column 13 (char 12)'
@@ -0,0 +1,119 @@
+import json
+import pytest
+from asgiref.sync import async_to_sync
+from datetime import time
+from rest_framework.test import APIClient
+from django.urls import reverse
+from rest_framework import status
+from django.utils import timezone
+from consultation_app.models import *
+from consultation_app.rows import ClientSlotRows
+from consultation_app.serializers import (SpecialistSlotListSerializer, ClientSlotListSerializer,
+                                          SpecialistConsultationListSerializer, ClientConsultationListSerializer)
+
+
+def read_stream(response):
+    # асинхронные представления отдают поток асинхронным итератором
+    if response.is_async:
+        async def read():
+            return b''.join([part async for part in response.streaming_content])
+        return async_to_sync(read)()
+    return b''.join(response.streaming_content)
+
+
+@pytest.mark.django_db
+class TestFastListRendering:
+    # быстрый путь через .values() отдаёт тот же JSON, что и сериализаторы списков
+
+    @pytest.mark.parametrize('url_name, role, serializer_class, queryset', [
+        ('specialist-slots', 'specialist', SpecialistSlotListSerializer,
+         lambda user: Slot.objects.filter(specialist=user).order_by('date', 'start_time', 'id')),
+        ('client-slots', 'client', ClientSlotListSerializer,
+         lambda user: Slot.objects.available_for_booking().order_by('date', 'start_time', 'specialist_id')),
+        ('specialist-consultations', 'specialist', SpecialistConsultationListSerializer,
+         lambda user: Consultation.objects.filter(slot__specialist=user).order_by('slot__date', 'slot__start_time',
+                                                                                  'id')),
+        ('client-consultations', 'client', ClientConsultationListSerializer,
+         lambda user: Consultation.objects.filter(client=user).order_by('slot__date', 'slot__start_time', 'id')),
+    ])
+    def test_same_json_as_serializer(self, consultations, user_client, user_specialist, url_name, role,
+                                     serializer_class, queryset):
+        user = user_client if role == 'client' else user_specialist
+        api_client = APIClient()
+        api_client.force_authenticate(user=user)
+
+        response = api_client.get(reverse(url_name))
+
+        assert response.status_code == status.HTTP_200_OK
+        expected = serializer_class(queryset(user), many=True).data
+        assert response.json()['results'] == expected
+        assert len(expected) > 0
+
+    def test_virtual_slots_same_json_as_serializer(self, user_specialist):
+        tomorrow = timezone.now().date() + timezone.timedelta(days=1)
+        rule = AvailabilityRule.objects.create(specialist=user_specialist, weekdays=[tomorrow.weekday()],
+                                               start_time=time(10, 0), end_time=time(11, 0),
+                                               slot_duration=timezone.timedelta(minutes=30),
+                                               start_date=tomorrow, end_date=tomorrow)
+        slots = list(rule.iter_slots(tomorrow))
+
+        assert ClientSlotRows.render(slots) == ClientSlotListSerializer(slots, many=True).data
+
+    def test_pagination_cursor_from_rows(self, consultations, user_client):
+        api_client = APIClient()
+        api_client.force_authenticate(user=user_client)
+        url = reverse('client-consultations')
+
+        first = api_client.get(url, {'page_size': 2}).json()
+        second = api_client.get(first['next']).json()
+
+        assert [row['id'] for row in first['results'] + second['results']] == [c.id for c in consultations]
+        assert second['next'] is None
+
+
+@pytest.mark.django_db
+class TestStreamingList:
+
+    @pytest.fixture
+    def specialist_api(self, user_specialist):
+        api_client = APIClient()
+        api_client.force_authenticate(user=user_specialist)
+        return api_client
+
+    @pytest.mark.parametrize('chunk_size', [1, 2, 2000])
+    def test_stream_whole_list(self, settings, specialist_api, user_specialist, consultations, chunk_size):
+        settings.LIST_STREAM_CHUNK_SIZE = chunk_size
+        settings.PAGINATION_PAGE_SIZE = 1
+
+        response = specialist_api.get(reverse('specialist-consultations'), {'stream': 'true'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        assert response['Content-Type'] == 'application/json'
+        expected = SpecialistConsultationListSerializer(
+            Consultation.objects.filter(slot__specialist=user_specialist).order_by('slot__date', 'slot__start_time',
+                                                                                  'id'), many=True).data
+        assert json.loads(read_stream(response)) == expected
+
+    def test_stream_empty_list(self, specialist_api):
+        response = specialist_api.get(reverse('specialist-slots'), {'stream': '1'})
+
+        assert json.loads(read_stream(response)) == []
+
+    def test_stream_not_cached(self, specialist_api, user_specialist, consultations):
+        url = reverse('specialist-slots')
+        first = json.loads(read_stream(specialist_api.get(url, {'stream': 'true'})))
+        Slot.objects.filter(specialist=user_specialist).update(context='Updated')
+        second = json.loads(read_stream(specialist_api.get(url, {'stream': 'true'})))
+
+        assert len(first) == len(second) == 4
+        assert {slot['context'] for slot in second} == {'Updated'}
+
+    def test_client_slots_not_streamed(self, user_client, consultations):
+        api_client = APIClient()
+        api_client.force_authenticate(user=user_client)
+
+        response = api_client.get(reverse('client-slots'), {'stream': 'true'})
+
+        assert not response.streaming
+        assert 'results' in response.data
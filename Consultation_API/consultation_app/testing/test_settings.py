@@ -0,0 +1,98 @@
+import importlib
+import runpy
+import sys
+import pytest
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+
+def load_production_settings():
+    sys.modules.pop('Consultation_API.settings_production', None)
+    return importlib.import_module('Consultation_API.settings_production')
+
+
+def load_gunicorn_config():
+    return runpy.run_path(str(settings.BASE_DIR / 'gunicorn.conf.py'))
+
+
+class TestProductionSettings:
+
+    @pytest.fixture(autouse=True)
+    def env(self, monkeypatch):
+        monkeypatch.setenv('DJANGO_SECRET_KEY', 'production-secret')
+        monkeypatch.setenv('DJANGO_ALLOWED_HOSTS', 'api.example.com, web_prod')
+        monkeypatch.setenv('CACHE_REDIS_URL', 'redis://redis:6379/1')
+        monkeypatch.delenv('CONN_MAX_AGE', raising=False)
+        monkeypatch.delenv('GUNICORN_WORKER_MODE', raising=False)
+        yield
+        sys.modules.pop('Consultation_API.settings_production', None)
+
+    def test_overrides(self):
+        production = load_production_settings()
+
+        assert production.DEBUG is False
+        assert production.SECRET_KEY == 'production-secret'
+        assert production.ALLOWED_HOSTS == ['api.example.com', 'web_prod']
+        assert production.DATABASES['default']['CONN_MAX_AGE'] == 60
+        assert production.DATABASES['default']['CONN_HEALTH_CHECKS'] is True
+        assert production.CELERY_TASK_ALWAYS_EAGER is False
+        assert production.CACHES['default']['BACKEND'] == 'django_redis.cache.RedisCache'
+        assert production.CACHES['default']['LOCATION'] == 'redis://redis:6379/1'
+        # остальное берётся из базовых настроек
+        assert production.REST_FRAMEWORK == settings.REST_FRAMEWORK
+
+    def test_base_settings_not_changed(self):
+        load_production_settings()
+
+        # DATABASES базовых настроек (и соединения тестов) не меняются
+        assert settings.DATABASES['default']['CONN_MAX_AGE'] == 0
+        assert settings.DATABASES['default']['CONN_HEALTH_CHECKS'] is False
+
+    def test_asgi_without_persistent_connections(self, monkeypatch):
+        monkeypatch.setenv('GUNICORN_WORKER_MODE', 'asgi')
+
+        assert load_production_settings().DATABASES['default']['CONN_MAX_AGE'] == 0
+
+    def test_secret_key_required(self, monkeypatch):
+        monkeypatch.delenv('DJANGO_SECRET_KEY')
+
+        with pytest.raises(KeyError):
+            load_production_settings()
+
+    def test_cache_redis_url_required(self, monkeypatch):
+        # кэш в памяти процесса не годится для нескольких воркеров
+        monkeypatch.delenv('CACHE_REDIS_URL')
+
+        with pytest.raises(ImproperlyConfigured):
+            load_production_settings()
+
+
+class TestGunicornConfig:
+
+    @pytest.fixture(autouse=True)
+    def env(self, monkeypatch):
+        for name in ('WEB_CONCURRENCY', 'GUNICORN_THREADS', 'GUNICORN_WORKER_MODE'):
+            monkeypatch.delenv(name, raising=False)
+        monkeypatch.setattr('os.sched_getaffinity', lambda pid: {0, 1, 2, 3}, raising=False)
+
+    def test_wsgi_workers_from_cores(self):
+        config = load_gunicorn_config()
+
+        assert config['worker_class'] == 'gthread'
+        assert config['wsgi_app'] == 'Consultation_API.wsgi:application'
+        assert config['workers'] == 9
+        assert config['threads'] == 4
+
+    def test_asgi_workers_from_cores(self, monkeypatch):
+        monkeypatch.setenv('GUNICORN_WORKER_MODE', 'asgi')
+
+        config = load_gunicorn_config()
+
+        assert config['worker_class'] == 'uvicorn.workers.UvicornWorker'
+        assert config['wsgi_app'] == 'Consultation_API.asgi:application'
+        assert config['workers'] == 4
+
+    def test_explicit_concurrency(self, monkeypatch):
+        monkeypatch.setenv('WEB_CONCURRENCY', '2')
+
+        assert load_gunicorn_config()['workers'] == 2
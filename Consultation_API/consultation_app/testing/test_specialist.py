@@ -1,11 +1,16 @@
 import pytest
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import time
+from django.db import connection
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from django.urls import reverse
 from rest_framework import status
 from django.utils import timezone
+from django.conf import settings
 from consultation_app.models import *
+from consultation_app.tokens import make_activation_token
 from dateutil.parser import parse
 
 
@@ -119,6 +124,65 @@ class TestUserRegistrationAPIView:
         assert user.check_password(valid_user_data['password'])
         assert user.role == valid_user_data['role']
 
+    def test_registration_sends_confirmation_email(self, api_client, valid_user_data, mailoutbox):
+        url = reverse('registration-api')
+        api_client.post(url, valid_user_data)
+
+        user = User.objects.get(username='testuser')
+        assert len(mailoutbox) == 1
+        assert mailoutbox[0].to == [valid_user_data['email']]
+        assert reverse('confirm-registration', args=[make_activation_token(user.id)]) in mailoutbox[0].body
+        assert valid_user_data['password'] not in mailoutbox[0].body
+
+    def test_registration_payload_has_no_password(self, api_client, valid_user_data, monkeypatch):
+        payloads = []
+        monkeypatch.setattr('consultation_app.views.send_email.delay', payloads.append)
+        api_client.post(reverse('registration-api'), valid_user_data)
+
+        assert len(payloads) == 1
+        assert valid_user_data['password'] not in str(payloads[0])
+
+    def test_confirm_registration(self, api_client, valid_user_data, django_assert_num_queries):
+        api_client.post(reverse('registration-api'), valid_user_data)
+        user = User.objects.get(username='testuser')
+
+        url = reverse('confirm-registration', args=[make_activation_token(user.id)])
+        # один UPDATE is_active по первичному ключу
+        with django_assert_num_queries(1):
+            response = api_client.get(url)
+        assert response.status_code == status.HTTP_302_FOUND
+        user.refresh_from_db()
+        assert user.is_active
+
+        response = api_client.get(url)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['message'] == 'Ваш аккаунт уже активирован'
+
+    def test_confirm_registration_unknown_user(self, api_client):
+        response = api_client.get(reverse('confirm-registration', args=[make_activation_token(10 ** 9)]))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_confirm_registration_invalid_token(self, api_client, valid_user_data, django_assert_num_queries):
+        api_client.post(reverse('registration-api'), valid_user_data)
+        user = User.objects.get(username='testuser')
+        # подпись от другого id не подходит
+        forged = f'{user.id + 1}:' + make_activation_token(user.id).split(':', 1)[1]
+
+        with django_assert_num_queries(0):
+            response = api_client.get(reverse('confirm-registration', args=[forged]))
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_confirm_registration_expired_token(self, api_client, valid_user_data, settings):
+        api_client.post(reverse('registration-api'), valid_user_data)
+        user = User.objects.get(username='testuser')
+        token = make_activation_token(user.id)
+        settings.ACTIVATION_TOKEN_MAX_AGE = -1
+
+        response = api_client.get(reverse('confirm-registration', args=[token]))
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        user.refresh_from_db()
+        assert not user.is_active
+
     def test_registration_not_success(self, api_client, invalid_user_data):
         url = reverse('registration-api')
         response = api_client.post(url, invalid_user_data)
@@ -145,6 +209,34 @@ class TestUserRegistrationAPIView:
         assert response.status_code == status.HTTP_400_BAD_REQUEST
         assert 'username' in response.data
 
+    def test_registration_duplicate_email(self, api_client, valid_user_data):
+        url = reverse('registration-api')
+        api_client.post(url, valid_user_data)
+        response = api_client.post(url, {**valid_user_data, 'username': 'another'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['email'] == ['Этот email уже используется']
+        assert User.objects.filter(email=valid_user_data['email']).count() == 1
+
+    def test_registration_without_lookups(self, api_client, valid_user_data, django_assert_num_queries):
+        # только INSERT в savepoint: уникальность проверяют ограничения БД
+        url = reverse('registration-api')
+        with django_assert_num_queries(3):
+            response = api_client.post(url, valid_user_data)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert 'hash;dur=' in response['Server-Timing']
+
+    def test_registration_with_scrypt_hasher(self, api_client, valid_user_data, settings):
+        settings.PASSWORD_HASHERS = ['django.contrib.auth.hashers.ScryptPasswordHasher',
+                                     'django.contrib.auth.hashers.PBKDF2PasswordHasher']
+        url = reverse('registration-api')
+        api_client.post(url, valid_user_data)
+
+        user = User.objects.get(username='testuser')
+        assert user.password.startswith('scrypt$')
+        assert user.check_password(valid_user_data['password'])
+
 
 @pytest.mark.django_db
 class TestCreateSlotAPIView:
@@ -213,6 +305,263 @@ class TestCreateSlotAPIView:
         assert 'end_time' in response.data
 
 
+@pytest.mark.django_db
+class TestBulkCreateSlotAPIView:
+
+    @pytest.fixture
+    def slots_data(self, valid_slot_data):
+        date = valid_slot_data['date']
+        return [
+            {'date': date, 'start_time': '15:00:00', 'end_time': '15:30:00'},
+            {'date': date, 'start_time': '13:00:00', 'end_time': '13:30:00', 'context': 'Some context here'},
+            {'date': date + timezone.timedelta(days=1), 'start_time': '13:00:00', 'end_time': '14:00:00'},
+        ]
+
+    def test_bulk_create_slots_success(self, authenticated_api_specialist, user_specialist, slots_data):
+        url = reverse('create-slots')
+        response = authenticated_api_specialist.post(url, {'slots': slots_data}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['message'] == 'Слоты успешно созданы'
+        assert len(response.data['data']) == 3
+        slots = Slot.objects.filter(specialist=user_specialist).order_by('date', 'start_time')
+        assert [str(slot.duration) for slot in slots] == ['0:30:00', '0:30:00', '1:00:00']
+        assert slots[0].context == 'Some context here'
+
+    def test_bulk_create_slots_query_count(self, authenticated_api_specialist, slots_data,
+                                           django_assert_max_num_queries):
+        url = reverse('create-slots')
+        # одна выборка существующих слотов, вставка всех слотов одним запросом и savepoint
+        with django_assert_max_num_queries(4):
+            response = authenticated_api_specialist.post(url, {'slots': slots_data}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_bulk_create_slots_overlap_in_batch(self, authenticated_api_specialist, user_specialist, slots_data):
+        slots_data.append({'date': slots_data[0]['date'], 'start_time': '15:15:00', 'end_time': '15:45:00'})
+        url = reverse('create-slots')
+        response = authenticated_api_specialist.post(url, {'slots': slots_data}, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        errors = response.data['slots']
+        assert errors[0]['detail'] == ['Время слота пересекается с другим слотом в запросе']
+        assert errors[1] == {}
+        assert errors[2] == {}
+        assert errors[3]['detail'] == ['Время слота пересекается с другим слотом в запросе']
+        assert not Slot.objects.filter(specialist=user_specialist).exists()
+
+    def test_bulk_create_slots_overlap_existing(self, authenticated_api_specialist, user_specialist, slot,
+                                                slots_data):
+        slots_data[1]['start_time'] = '13:15:00'
+        slots_data[1]['end_time'] = '13:45:00'
+        url = reverse('create-slots')
+        response = authenticated_api_specialist.post(url, {'slots': slots_data}, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        errors = response.data['slots']
+        assert errors[1]['detail'] == ['Время слота пересекается с другим слотом']
+        assert errors[0] == {}
+        assert errors[2] == {}
+        assert Slot.objects.filter(specialist=user_specialist).count() == 1
+
+    def test_bulk_create_slots_overlap_pair(self, authenticated_api_specialist, user_specialist, valid_slot_data):
+        date = valid_slot_data['date']
+        data = [{'date': date, 'start_time': '09:00:00', 'end_time': '12:00:00'},
+                {'date': date, 'start_time': '12:00:00', 'end_time': '12:30:00'},
+                {'date': date, 'start_time': '10:30:00', 'end_time': '11:00:00'}]
+        url = reverse('create-slots')
+        response = authenticated_api_specialist.post(url, {'slots': data}, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['slots'] == [{'detail': ['Время слота пересекается с другим слотом в запросе']}, {},
+                                          {'detail': ['Время слота пересекается с другим слотом в запросе']}]
+
+    def test_bulk_create_slots_overlap_request_and_existing(self, authenticated_api_specialist, user_specialist,
+                                                            valid_slot_data):
+        date = valid_slot_data['date']
+        Slot.objects.create(specialist=user_specialist, date=date, start_time=time(10, 0), end_time=time(12, 0))
+        # оба слота запроса лежат внутри существующего и пересекаются между собой
+        data = [{'date': date, 'start_time': '10:30:00', 'end_time': '10:45:00'},
+                {'date': date, 'start_time': '10:40:00', 'end_time': '11:00:00'},
+                {'date': date, 'start_time': '12:00:00', 'end_time': '12:30:00'}]
+        url = reverse('create-slots')
+        response = authenticated_api_specialist.post(url, {'slots': data}, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        both = ['Время слота пересекается с другим слотом', 'Время слота пересекается с другим слотом в запросе']
+        errors = response.data['slots']
+        assert sorted(errors[0]['detail']) == both
+        assert sorted(errors[1]['detail']) == both
+        assert errors[2] == {}
+
+    def test_bulk_create_slots_adjacent(self, authenticated_api_specialist, user_specialist, slot, valid_slot_data):
+        url = reverse('create-slots')
+        data = [{'date': valid_slot_data['date'], 'start_time': '13:30:00', 'end_time': '14:00:00'},
+                {'date': valid_slot_data['date'], 'start_time': '12:30:00', 'end_time': '13:00:00'}]
+        response = authenticated_api_specialist.post(url, {'slots': data}, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert Slot.objects.filter(specialist=user_specialist).count() == 3
+
+    def test_bulk_create_slots_item_validation(self, authenticated_api_specialist, slots_data):
+        slots_data[2]['end_time'] = '12:30:00'
+        url = reverse('create-slots')
+        response = authenticated_api_specialist.post(url, {'slots': slots_data}, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['slots'][2]['detail'][0] == 'Время окончания должно быть позже времени начала'
+        assert not Slot.objects.exists()
+
+    def test_bulk_create_slots_item_validation_with_overlap(self, authenticated_api_specialist, slots_data):
+        # ошибки полей и пересечения остальных слотов приходят одним ответом
+        slots_data[2]['end_time'] = '12:30:00'
+        slots_data.append({'date': slots_data[0]['date'], 'start_time': '15:15:00', 'end_time': '15:45:00'})
+        url = reverse('create-slots')
+        response = authenticated_api_specialist.post(url, {'slots': slots_data}, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        errors = response.data['slots']
+        assert errors[0]['detail'] == ['Время слота пересекается с другим слотом в запросе']
+        assert errors[1] == {}
+        assert errors[2]['detail'] == ['Время окончания должно быть позже времени начала']
+        assert errors[3]['detail'] == ['Время слота пересекается с другим слотом в запросе']
+
+    def test_bulk_create_slots_not_list(self, authenticated_api_specialist):
+        url = reverse('create-slots')
+        response = authenticated_api_specialist.post(url, {'slots': {'date': '2030-01-01'}}, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'slots' in response.data
+
+    def test_bulk_create_slots_empty(self, authenticated_api_specialist):
+        url = reverse('create-slots')
+        response = authenticated_api_specialist.post(url, {'slots': []}, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'slots' in response.data
+
+    def test_bulk_create_slots_non_specialist(self, authenticated_api_client, slots_data):
+        url = reverse('create-slots')
+        response = authenticated_api_client.post(url, {'slots': slots_data}, format='json')
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db
+class TestAvailabilityRuleAPIView:
+
+    @pytest.fixture
+    def rule_data(self):
+        start_date = timezone.now().date() + timezone.timedelta(days=1)
+        return {
+            'weekdays': [0, 2],
+            'start_time': '10:00',
+            'end_time': '13:00',
+            'slot_duration': '00:30:00',
+            'start_date': start_date,
+            'end_date': start_date + timezone.timedelta(days=60),
+        }
+
+    def test_create_rule_success(self, authenticated_api_specialist, user_specialist, rule_data):
+        url = reverse('create-availability-rule')
+        response = authenticated_api_specialist.post(url, rule_data, format='json')
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['message'] == 'Правило успешно создано'
+        rule = AvailabilityRule.objects.get(id=response.data['data']['id'])
+        assert rule.specialist == user_specialist
+        assert rule.weekdays == [0, 2]
+        assert not Slot.objects.exists()
+
+    def test_create_rule_overlap(self, authenticated_api_specialist, rule_data):
+        url = reverse('create-availability-rule')
+        authenticated_api_specialist.post(url, rule_data, format='json')
+
+        overlapping_data = rule_data.copy()
+        overlapping_data.update({'weekdays': [2, 4], 'start_time': '12:00', 'end_time': '14:00'})
+        response = authenticated_api_specialist.post(url, overlapping_data, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['detail'][0] == 'Правило пересекается с другим правилом'
+
+    def test_create_rule_invalid_duration(self, authenticated_api_specialist, rule_data):
+        rule_data['slot_duration'] = '04:00:00'
+        url = reverse('create-availability-rule')
+        response = authenticated_api_specialist.post(url, rule_data, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['detail'][0] == 'Длительность слота должна укладываться в окно правила'
+
+    def test_create_rule_start_too_far(self, authenticated_api_specialist, rule_data):
+        max_days = settings.AVAILABILITY_RULE_MAX_DAYS
+        rule_data['start_date'] = timezone.now().date() + timezone.timedelta(days=max_days + 1)
+        rule_data['end_date'] = rule_data['start_date']
+        url = reverse('create-availability-rule')
+        response = authenticated_api_specialist.post(url, rule_data, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['detail'][0] == (
+            f'Правило не может начинаться позже чем через {settings.AVAILABILITY_RULE_MAX_DAYS} дней')
+
+    def test_create_rule_invalid_weekday(self, authenticated_api_specialist, rule_data):
+        rule_data['weekdays'] = [7]
+        url = reverse('create-availability-rule')
+        response = authenticated_api_specialist.post(url, rule_data, format='json')
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'weekdays' in response.data
+
+    def test_list_and_delete_rule(self, authenticated_api_specialist, rule_data):
+        authenticated_api_specialist.post(reverse('create-availability-rule'), rule_data, format='json')
+        response = authenticated_api_specialist.get(reverse('specialist-availability-rules'))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data) == 1
+
+        url = reverse('delete-availability-rule', kwargs={'id': response.data[0]['id']})
+        response = authenticated_api_specialist.delete(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert not AvailabilityRule.objects.exists()
+
+        response = authenticated_api_specialist.delete(url)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_create_rule_non_specialist(self, authenticated_api_client, rule_data):
+        url = reverse('create-availability-rule')
+        response = authenticated_api_client.post(url, rule_data, format='json')
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.django_db(transaction=True)
+class TestCreateSlotConcurrency:
+
+    def test_create_overlapping_slots_concurrently(self, user_specialist, valid_slot_data):
+        url = reverse('create-slot')
+        # соседние интервалы пересекаются, часть параллельных запросов должна получить отказ
+        payloads = [{'date': valid_slot_data['date'], 'start_time': time(13, minute), 'end_time': time(13, minute + 20)}
+                     for minute in range(0, 40, 5)]
+        barrier = threading.Barrier(len(payloads))
+
+        def create(payload):
+            api_client = APIClient()
+            api_client.force_authenticate(user=user_specialist)
+            barrier.wait()
+            try:
+                return api_client.post(url, payload).status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=len(payloads)) as executor:
+            results = list(executor.map(create, payloads))
+
+        slots = list(Slot.objects.filter(specialist=user_specialist).order_by('start_time'))
+        assert results.count(status.HTTP_200_OK) == len(slots)
+        assert results.count(status.HTTP_400_BAD_REQUEST) == len(payloads) - len(slots)
+        for previous, current in zip(slots, slots[1:]):
+            assert previous.end_time <= current.start_time
+
+
 @pytest.mark.django_db
 class TestSpecialistSlotListView:
 
@@ -221,9 +570,9 @@ class TestSpecialistSlotListView:
         response = authenticated_api_specialist.get(url)
         assert response.status_code == status.HTTP_200_OK
         # проверяем, что создался 1 слот
-        assert len(response.data) == 1
+        assert len(response.data['results']) == 1
 
-        slot_data = response.data[0]
+        slot_data = response.data['results'][0]
         slot = Slot.objects.get(id=slot_data['id'])
 
         # преобразовываем строки в формат datetime
@@ -239,7 +588,19 @@ class TestSpecialistSlotListView:
         url = reverse('specialist-slots')
         response = authenticated_api_specialist.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert response.data == []
+        assert response.data['results'] == []
+
+    def test_get_slots_query_count(self, authenticated_api_specialist, user_specialist, django_assert_num_queries):
+        date = timezone.now().date() + timezone.timedelta(days=1)
+        for hour in range(10, 15):
+            Slot.objects.create(specialist=user_specialist, date=date, start_time=time(hour, 0),
+                                end_time=time(hour, 30))
+        url = reverse('specialist-slots')
+
+        with django_assert_num_queries(1):
+            response = authenticated_api_specialist.get(url)
+
+        assert len(response.data['results']) == 5
 
     def test_get_slots_non_specialist(self, authenticated_api_client):
         url = reverse('specialist-slots')
@@ -255,17 +616,17 @@ class TestSpecialistConsultationListView:
         response = authenticated_api_specialist.get(url)
 
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == 1
-        assert response.data[0]['id'] == consultation.id
-        assert response.data[0]['client_username'] == consultation.client.username
-        assert response.data[0]['status_display'] == consultation.get_status_display()
+        assert len(response.data['results']) == 1
+        assert response.data['results'][0]['id'] == consultation.id
+        assert response.data['results'][0]['client_username'] == consultation.client.username
+        assert response.data['results'][0]['status_display'] == consultation.get_status_display()
 
     def test_get_consultations_empty(self, authenticated_api_specialist):
         url = reverse('specialist-consultations')
         response = authenticated_api_specialist.get(url)
 
         assert response.status_code == status.HTTP_200_OK
-        assert response.data == []
+        assert response.data['results'] == []
 
     def test_get_slots_non_specialist(self, authenticated_api_client):
         url = reverse('specialist-consultations')
@@ -275,12 +636,29 @@ class TestSpecialistConsultationListView:
 
     def test_get_consultations_with_multiple_entries(self, authenticated_api_specialist, consultation, slot):
         url = reverse('specialist-consultations')
-        Consultation.objects.create(slot=slot, client=consultation.client, status='Pending')
-        Consultation.objects.create(slot=slot, client=consultation.client, status='Completed')
+        User = get_user_model()
+        # на один слот клиент может отправить только одну заявку, поэтому заявки от других клиентов
+        for i in range(2):
+            other_client = User.objects.create_user(username=f'other_client_{i}', email=f'other_{i}@example.com',
+                                                    password='password123', role='Client')
+            Consultation.objects.create(slot=slot, client=other_client, status='Pending')
         response = authenticated_api_specialist.get(url)
 
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) > 1
+        assert len(response.data['results']) > 1
+
+    def test_get_consultations_query_count(self, authenticated_api_specialist, slot, django_assert_num_queries):
+        User = get_user_model()
+        for i in range(5):
+            client = User.objects.create_user(username=f'client_{i}', email=f'client_{i}@example.com',
+                                              password='password123', role='Client')
+            Consultation.objects.create(slot=slot, client=client)
+        url = reverse('specialist-consultations')
+
+        with django_assert_num_queries(1):
+            response = authenticated_api_specialist.get(url)
+
+        assert {c['client_username'] for c in response.data['results']} == {f'client_{i}' for i in range(5)}
 
 
 @pytest.mark.django_db
@@ -299,6 +677,116 @@ class TestUpdateStatusConsultationAPIView:
         assert consultation.status == 'Accepted'
         assert not consultation.slot.is_available
 
+    def test_update_status_sends_email_on_commit(self, authenticated_api_specialist, consultation, mailoutbox,
+                                                 django_capture_on_commit_callbacks):
+        url = reverse('update-status')
+        with django_capture_on_commit_callbacks() as callbacks:
+            authenticated_api_specialist.patch(url, {'consultation_id': consultation.id, 'status': 'Rejected'})
+        assert mailoutbox == []
+
+        for callback in callbacks:
+            callback()
+        assert len(mailoutbox) == 1
+        assert mailoutbox[0].to == ['client@example.com']
+        assert 'отклонил' in mailoutbox[0].body
+
+    def test_update_status_reads_consultation_once(self, authenticated_api_specialist, consultation,
+                                                   django_assert_num_queries):
+        # консультация вместе со слотом и клиентом, UPDATE статуса, savepoint atomic и его освобождение
+        url = reverse('update-status')
+        with django_assert_num_queries(4):
+            response = authenticated_api_specialist.patch(url, {'consultation_id': consultation.id,
+                                                               'status': 'Rejected'})
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_update_status_accept_notifies_waitlist(self, authenticated_api_specialist, consultation, slot, mailoutbox,
+                                                    django_capture_on_commit_callbacks):
+        User = get_user_model()
+        waitlist = []
+        for i in range(5):
+            client = User.objects.create_user(username=f'waiting_{i}', email=f'waiting_{i}@example.com', role='Client')
+            waitlist.append(Consultation.objects.create(slot=slot, client=client))
+        # уже отклонённый и отменённый клиентом запросы повторно не уведомляются
+        Consultation.objects.filter(id=waitlist[0].id).update(status='Rejected')
+        Consultation.objects.filter(id=waitlist[1].id).update(is_canceled=True)
+
+        url = reverse('update-status')
+        with django_capture_on_commit_callbacks() as callbacks:
+            response = authenticated_api_specialist.patch(url, {'consultation_id': consultation.id,
+                                                               'status': 'Accepted'})
+        assert response.status_code == status.HTTP_200_OK
+        # сброс версии кэша слотов и одна задача со всеми письмами
+        assert len(callbacks) == 2
+        for callback in callbacks:
+            callback()
+
+        recipients = sorted(message.to[0] for message in mailoutbox)
+        assert recipients == ['client@example.com', 'waiting_2@example.com',
+                              'waiting_3@example.com', 'waiting_4@example.com']
+        assert set(Consultation.objects.filter(slot=slot).exclude(id=consultation.id)
+                   .values_list('status', flat=True)) == {'Rejected'}
+
+    def test_update_status_accept_after_cancel(self, authenticated_api_specialist, consultation, slot):
+        # клиент отменил подтверждённую консультацию, слот снова свободен: новый запрос можно подтвердить
+        Consultation.objects.filter(id=consultation.id).update(status='Accepted', is_canceled=True)
+        client = get_user_model().objects.create_user(username='next_client', email='next@example.com', role='Client')
+        next_consultation = Consultation.objects.create(slot=slot, client=client)
+
+        url = reverse('update-status')
+        response = authenticated_api_specialist.patch(url, {'consultation_id': next_consultation.id,
+                                                           'status': 'Accepted'})
+
+        assert response.status_code == status.HTTP_200_OK
+        next_consultation.refresh_from_db()
+        assert next_consultation.status == 'Accepted'
+
+    def test_update_status_accept_when_slot_taken(self, authenticated_api_specialist, consultation, slot,
+                                                  mailoutbox, django_capture_on_commit_callbacks):
+        url = reverse('update-status')
+        with django_capture_on_commit_callbacks(execute=True):
+            authenticated_api_specialist.patch(url, {'consultation_id': consultation.id, 'status': 'Accepted'})
+        mailoutbox.clear()
+        client = get_user_model().objects.create_user(username='next_client', email='next@example.com', role='Client')
+        next_consultation = Consultation.objects.create(slot=slot, client=client)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            response = authenticated_api_specialist.patch(url, {'consultation_id': next_consultation.id,
+                                                               'status': 'Accepted'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['detail'] == 'Для данного слота уже существует подтверждённая консультация'
+        consultation.refresh_from_db()
+        next_consultation.refresh_from_db()
+        assert consultation.status == 'Accepted'
+        assert next_consultation.status == 'Pending'
+        assert mailoutbox == []
+
+    def test_update_status_accept_constraint(self, authenticated_api_specialist, consultation, slot, mailoutbox,
+                                             django_capture_on_commit_callbacks):
+        # занятость слота разошлась с консультациями (слот свободен, но подтверждённая консультация есть):
+        # вторую подтверждённую консультацию не даёт создать ограничение в БД
+        client = get_user_model().objects.create_user(username='next_client', email='next@example.com', role='Client')
+        accepted = Consultation.objects.create(slot=slot, client=client, status='Accepted')
+
+        url = reverse('update-status')
+        with django_capture_on_commit_callbacks(execute=True):
+            response = authenticated_api_specialist.patch(url, {'consultation_id': consultation.id,
+                                                               'status': 'Accepted'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['detail'] == 'Для данного слота уже существует подтверждённая консультация'
+        accepted.refresh_from_db()
+        consultation.refresh_from_db()
+        slot.refresh_from_db()
+        assert accepted.status == 'Accepted'
+        assert consultation.status == 'Pending'
+        assert slot.is_available
+        assert mailoutbox == []
+
+    def test_reject_others_not_chainable(self, consultation):
+        # отклонение затрагивает все запросы на слот, поэтому доступно только у менеджера
+        assert not hasattr(Consultation.objects.filter(slot=consultation.slot), 'reject_others')
+
     def test_update_status_invalid_status(self, authenticated_api_specialist, consultation):
         url = reverse('update-status')
         data = {
@@ -357,6 +845,20 @@ class TestSlotUpdateAPIView:
         assert 'start_time' in response.data['data']
         assert 'end_time' in response.data['data']
 
+    def test_update_slot_duration(self, authenticated_api_specialist, slot):
+        url = reverse('update-slot')
+        response = authenticated_api_specialist.patch(url, {'id': slot.id, 'end_time': time(14, 0)})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['data']['duration'] == '01:00:00'
+
+    def test_duration_generated_by_database(self, slot):
+        assert slot.duration == timezone.timedelta(minutes=30)
+        # QuerySet.update() не вызывает save(), длительность всё равно пересчитывает БД
+        Slot.objects.filter(id=slot.id).update(end_time=time(15, 0))
+        slot.refresh_from_db()
+        assert slot.duration == timezone.timedelta(hours=2)
+
     def test_update_slot_invalid_id(self, authenticated_api_specialist):
         url = reverse('update-slot')
         data = {
@@ -421,3 +923,28 @@ class TestSlotUpdateAPIView:
 
         assert response.status_code == status.HTTP_400_BAD_REQUEST
         assert response.data['detail'] == 'Время слота пересекается с другим слотом специалиста'
+
+    def test_update_slot_keeps_specialist(self, authenticated_api_specialist, user_specialist, slot):
+        User = get_user_model()
+        User.objects.create_user(username='other_specialist', email='other@example.com', role='Specialist')
+        url = reverse('update-slot')
+        response = authenticated_api_specialist.patch(url, {'id': slot.id, 'specialist_username': 'other_specialist'})
+
+        # слот не передаётся другому пользователю, specialist_username только проверяется
+        assert response.status_code == status.HTTP_200_OK
+        slot.refresh_from_db()
+        assert slot.specialist == user_specialist
+
+    def test_update_slot_transfer_time_overlap(self, authenticated_api_specialist, slot):
+        User = get_user_model()
+        other_specialist = User.objects.create_user(username='other_specialist', email='other@example.com',
+                                                    role='Specialist')
+        Slot.objects.create(specialist=other_specialist, date=slot.date, start_time=time(13, 15),
+                            end_time=time(13, 45))
+        url = reverse('update-slot')
+        response = authenticated_api_specialist.patch(url, {'id': slot.id, 'specialist_username': 'other_specialist'})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['detail'] == 'Время слота пересекается с другим слотом специалиста'
+        slot.refresh_from_db()
+        assert slot.specialist != other_specialist
@@ -0,0 +1,23 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+
+class StageTimer:
+    # Длительность этапов обработки запроса в миллисекундах: пишется в лог и в заголовок Server-Timing
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+    def server_timing(self) -> str:
+        return ', '.join(f'{name};dur={duration:.1f}' for name, duration in self.stages.items())
+
+    def __str__(self) -> str:
+        return ', '.join(f'{name}={duration:.1f}ms' for name, duration in self.stages.items())
@@ -0,0 +1,23 @@
+from typing import Optional
+
+from django.conf import settings
+from django.core import signing
+
+# Токен подтверждения регистрации - id пользователя с отметкой времени и подписью на SECRET_KEY.
+# Подпись и срок действия проверяются без обращения к БД
+ACTIVATION_TOKEN_SALT = 'consultation_app.activation'
+
+
+def make_activation_token(user_id: int) -> str:
+    return signing.TimestampSigner(salt=ACTIVATION_TOKEN_SALT).sign(str(user_id))
+
+
+def read_activation_token(token: str) -> Optional[int]:
+    try:
+        value = signing.TimestampSigner(salt=ACTIVATION_TOKEN_SALT).unsign(
+            token, max_age=settings.ACTIVATION_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        # SignatureExpired - подкласс BadSignature
+        return None
+    return int(value)
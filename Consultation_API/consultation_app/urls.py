@@ -24,7 +24,10 @@ urlpatterns = [
     path('registration/', UserRegistrationAPIView.as_view(), name='registration-api'),
     path('block_user/', BlockUserAPIView.as_view(), name='block-user'),
     path('unblock_user/', UnblockUserAPIView.as_view(), name='unblock-user'),
+    path('block_users/', BulkBlockUserAPIView.as_view(), name='block-users'),
+    path('unblock_users/', BulkUnblockUserAPIView.as_view(), name='unblock-users'),
     path('create_slot/', CreateSlotAPIView.as_view(), name='create-slot'),
+    path('create_slots/', BulkCreateSlotAPIView.as_view(), name='create-slots'),
     path('specialist_slots/', (SpecialistSlotListView.as_view()), name='specialist-slots'),
     path('client_slots/', (ClientSlotListView.as_view()), name='client-slots'),
     path('create_consultation/', ClientConsultationAPIView.as_view(), name='create-consultation'),
@@ -35,5 +38,9 @@ urlpatterns = [
     path('update_status/', UpdateStatusConsultationAPIView.as_view(), name='update-status'),
     path('update_slot/', SlotUpdateAPIView.as_view(), name='update-slot'),
     path('cancel_consultation/', CancelConsultationAPIView.as_view(), name='cancel-consultation'),
-    path('delete_slot/<int:id>/', SlotDeleteAPIView.as_view(), name='delete_slot')
+    path('delete_slot/<int:id>/', SlotDeleteAPIView.as_view(), name='delete_slot'),
+    path('create_availability_rule/', CreateAvailabilityRuleAPIView.as_view(), name='create-availability-rule'),
+    path('specialist_availability_rules/', AvailabilityRuleListView.as_view(), name='specialist-availability-rules'),
+    path('delete_availability_rule/<int:id>/', AvailabilityRuleDeleteAPIView.as_view(),
+         name='delete-availability-rule')
 ]
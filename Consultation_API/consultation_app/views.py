@@ -1,17 +1,30 @@
 import logging
+import math
 from datetime import datetime
-from django.db.models import Q, QuerySet
-from django.shortcuts import get_object_or_404, redirect
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef, QuerySet
+from django.shortcuts import redirect
 from rest_framework import status
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import AllowAny
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from drf_spectacular.utils import extend_schema, OpenApiResponse, OpenApiExample, extend_schema_view
+from django_filters.rest_framework import DjangoFilterBackend
 from .serializers import *
 from .permissions import *
+from .pagination import SlotCursorPagination, ClientSlotCursorPagination, ConsultationCursorPagination
+from .async_views import AsyncListAPIView
+from .blocked_users import blocked_users
+from .cache import VersionedCacheListMixin
+from .filters import ClientSlotFilter
+from .rows import (FastListMixin, SpecialistSlotRows, ClientSlotRows, SpecialistConsultationRows,
+                   ClientConsultationRows, field_value)
+from .timing import StageTimer
+from .tokens import make_activation_token, read_activation_token
 
 logger = logging.getLogger(__name__)
 
@@ -62,14 +75,25 @@ class UserRegistrationAPIView(APIView):
         tags=['For everyone']
     )
     def post(self, request: Request) -> Response:
-        serializer = UserRegistrationSerializer(data=request.data)
-        if serializer.is_valid():
+        timer = StageTimer()
+        serializer = UserRegistrationSerializer(data=request.data, context={'timer': timer})
+        with timer.stage('validate'):
+            is_valid = serializer.is_valid()
+        if is_valid:
             user = serializer.save()
-            raw_password = serializer.raw_password
-            send_confirmation_email.delay(user.id, raw_password)
-            logger.info(f'User {request.data["username"]} has registered')
-            return Response({'message': 'Для подтверждения регистрации на указанную почту отправлено письмо'},
-                            status=status.HTTP_200_OK)
+            with timer.stage('enqueue'):
+                # все данные письма уже есть в памяти, воркеру не нужно перечитывать пользователя.
+                # Пароль в очередь не попадает: в письме только логин и подписанная ссылка с ограниченным сроком
+                token = make_activation_token(user.id)
+                send_email.delay(email_payload(
+                    user.email, 'registration_confirmation', username=user.username,
+                    confirmation_url=f'{settings.SITE_URL}/confirm/{token}/'
+                ))
+            logger.info(f'User {request.data["username"]} has registered ({timer})')
+            response = Response({'message': 'Для подтверждения регистрации на указанную почту отправлено письмо'},
+                                status=status.HTTP_200_OK)
+            response['Server-Timing'] = timer.server_timing()
+            return response
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -78,14 +102,17 @@ class ConfirmRegistrationAPIView(APIView):
 
     @extend_schema(exclude=True)
     def get(self, request: Request, token: str) -> Response:
-        user = get_object_or_404(User, activation_token=token)
-
-        if user.is_active:
-            return Response({'message': 'Ваш аккаунт уже активирован'}, status=status.HTTP_400_BAD_REQUEST)
-
-        user.is_active = True
-        user.save()
-        logger.info(f'User {user.username} has activated the account')
+        # поддельная или просроченная ссылка отклоняется без запроса к БД
+        user_id = read_activation_token(token)
+        if user_id is None:
+            return Response({'detail': 'Ссылка подтверждения недействительна или устарела'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        # активация - UPDATE одной колонки по первичному ключу, пользователь не загружается
+        if not User.objects.filter(id=user_id, is_active=False).update(is_active=True):
+            if User.objects.filter(id=user_id).exists():
+                return Response({'message': 'Ваш аккаунт уже активирован'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'detail': 'Пользователь не найден'}, status=status.HTTP_404_NOT_FOUND)
+        logger.info(f'User with id = {user_id} has activated the account')
         return redirect('swagger-ui')
 
 
@@ -144,19 +171,18 @@ class BlockUserAPIView(APIView):
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid():
             user_id = serializer.validated_data['id']
-            try:
-                user = User.objects.get(id=user_id)
-                if user.is_blocked == False:
-                    user.is_blocked = True
-                    user.save()
-                    logger.info(f'User {user.username} has been blocked')
-                    return Response({'message': 'Пользователь заблокирован'}, status=status.HTTP_200_OK)
-                logger.warning(f'User {user.username} is already blocked')
+            # условный UPDATE одной колонки без чтения пользователя; update() не отправляет post_save,
+            # поэтому реестр заблокированных обновляется явно
+            if User.objects.filter(id=user_id, is_blocked=False).update(is_blocked=True):
+                blocked_users.changed()
+                logger.info(f'User with id {user_id} has been blocked')
+                return Response({'message': 'Пользователь заблокирован'}, status=status.HTTP_200_OK)
+            if User.objects.filter(id=user_id).exists():
+                logger.warning(f'User with id {user_id} is already blocked')
                 return Response({'detail': 'Пользователь с таким id уже заблокирован'},
                                 status=status.HTTP_400_BAD_REQUEST)
-            except User.DoesNotExist:
-                logger.warning(f'User with id {user_id} not exist')
-                return Response({'detail': 'Пользователь с таким id не найден'}, status=status.HTTP_404_NOT_FOUND)
+            logger.warning(f'User with id {user_id} not exist')
+            return Response({'detail': 'Пользователь с таким id не найден'}, status=status.HTTP_404_NOT_FOUND)
         logger.error(f'User block request failed validation: {serializer.errors}')
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -216,24 +242,120 @@ class UnblockUserAPIView(APIView):
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid():
             user_id = serializer.validated_data['id']
-            try:
-                user = User.objects.get(id=user_id)
-                if user.is_blocked:
-                    user.is_blocked = False
-                    user.save()
-                    logger.info(f'User {user.username} has been unblocked')
-                    return Response({'message': 'Пользователь разблокирован'}, status=status.HTTP_200_OK)
-                else:
-                    logger.warning(f'User {user.username} is not blocked')
-                    return Response({'detail': 'Пользователь с таким id не заблокирован'},
-                                    status=status.HTTP_400_BAD_REQUEST)
-            except User.DoesNotExist:
-                logger.warning(f'User with id {user_id} not exist')
-                return Response({'detail': 'Пользователь с таким id не найден'}, status=status.HTTP_404_NOT_FOUND)
+            if User.objects.filter(id=user_id, is_blocked=True).update(is_blocked=False):
+                blocked_users.changed()
+                logger.info(f'User with id {user_id} has been unblocked')
+                return Response({'message': 'Пользователь разблокирован'}, status=status.HTTP_200_OK)
+            if User.objects.filter(id=user_id).exists():
+                logger.warning(f'User with id {user_id} is not blocked')
+                return Response({'detail': 'Пользователь с таким id не заблокирован'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            logger.warning(f'User with id {user_id} not exist')
+            return Response({'detail': 'Пользователь с таким id не найден'}, status=status.HTTP_404_NOT_FOUND)
         logger.error(f'User block request failed validation: {serializer.errors}')
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class BulkBlockUserAPIView(APIView):
+    serializer_class = BulkBlockUserSerializer
+    permission_classes = [IsAdminUser]
+    is_blocked = True
+
+    @extend_schema(
+        summary='Массовая блокировка',
+        description='Метод для блокировки списка пользователей одним запросом. В ответе id пользователей, '
+                    'которые были заблокированы, уже находились в этом состоянии и которых не существует',
+        request=BulkBlockUserSerializer,
+        responses={
+            200: OpenApiResponse(
+                response=BulkBlockUserSerializer,
+                description='Успешный запрос',
+                examples=[
+                    OpenApiExample(
+                        'Успешный запрос',
+                        value={'changed': [1, 2], 'unchanged': [3], 'not_found': [100]})
+                ]
+            ),
+            400: OpenApiResponse(
+                response=BulkBlockUserSerializer,
+                description='Неверный запрос',
+                examples=[
+                    OpenApiExample(
+                        'Пустой список',
+                        value={'ids': ['Этот список не может быть пустым.']}
+                    )
+                ]
+            )
+        },
+        examples=[
+            OpenApiExample(
+                'Пример запроса',
+                description='Пример запроса',
+                value={'ids': [1, 2, 3, 100]},
+                status_codes=[str(status.HTTP_202_ACCEPTED)],
+            )
+        ],
+        tags=['For admin']
+    )
+    def post(self, request: Request) -> Response:
+        return self.set_blocked(request)
+
+    def set_blocked(self, request: Request) -> Response:
+        serializer = self.serializer_class(data=request.data)
+        if serializer.is_valid():
+            result = User.objects.set_blocked(serializer.validated_data['ids'], self.is_blocked)
+            if result['changed']:
+                blocked_users.changed()
+            action = 'blocked' if self.is_blocked else 'unblocked'
+            logger.info(f'{len(result["changed"])} users have been {action}: {result["changed"]}')
+            return Response(result, status=status.HTTP_200_OK)
+        logger.error(f'Bulk user block request failed validation: {serializer.errors}')
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class BulkUnblockUserAPIView(BulkBlockUserAPIView):
+    is_blocked = False
+
+    @extend_schema(
+        summary='Массовая разблокировка',
+        description='Метод для разблокировки списка пользователей одним запросом. В ответе id пользователей, '
+                    'которые были разблокированы, уже находились в этом состоянии и которых не существует',
+        request=BulkBlockUserSerializer,
+        responses={
+            200: OpenApiResponse(
+                response=BulkBlockUserSerializer,
+                description='Успешный запрос',
+                examples=[
+                    OpenApiExample(
+                        'Успешный запрос',
+                        value={'changed': [1, 2], 'unchanged': [3], 'not_found': [100]})
+                ]
+            ),
+            400: OpenApiResponse(
+                response=BulkBlockUserSerializer,
+                description='Неверный запрос',
+                examples=[
+                    OpenApiExample(
+                        'Пустой список',
+                        value={'ids': ['Этот список не может быть пустым.']}
+                    )
+                ]
+            )
+        },
+        examples=[
+            OpenApiExample(
+                'Пример запроса',
+                description='Пример запроса',
+                value={'ids': [1, 2, 3, 100]},
+                status_codes=[str(status.HTTP_202_ACCEPTED)],
+            )
+        ],
+        tags=['For admin']
+    )
+    def post(self, request: Request) -> Response:
+        return self.set_blocked(request)
+
+
 class CreateSlotAPIView(APIView):
     permission_classes = [IsSpecialistUser]
     serializer_class = SlotSerializer
@@ -317,15 +439,11 @@ class CreateSlotAPIView(APIView):
     def post(self, request: Request) -> Response:
         serializer = self.serializer_class(data=request.data, context={'request': request})
         if serializer.is_valid():
-            validated_data = serializer.validated_data
-            slot_data = {
-                'specialist': request.user,
-                'date': validated_data['date'],
-                'start_time': validated_data['start_time'],
-                'end_time': validated_data['end_time'],
-                'context': validated_data.get('context', None)
-            }
-            slot = Slot.objects.create(**slot_data)
+            try:
+                slot = serializer.save(specialist=request.user)
+            except ValidationError as e:
+                logger.error(f'Creating slot request failed validation: {e.detail}')
+                return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
             slot_serializer = SlotSerializer(slot)
             logger.info(f'Slot with id = {slot.id} has been created')
             return Response({'message': 'Слот успешно создан', 'data': slot_serializer.data}, status=status.HTTP_200_OK)
@@ -333,6 +451,205 @@ class CreateSlotAPIView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class BulkCreateSlotAPIView(APIView):
+    permission_classes = [IsSpecialistUser]
+    serializer_class = BulkSlotSerializer
+
+    @extend_schema(
+        summary='Массовое создание слотов',
+        description='Метод для создания специалистом нескольких слотов одним запросом. '
+                    'Слоты создаются все вместе или не создаётся ни один, ошибки возвращаются для каждого слота',
+        request=BulkSlotSerializer,
+        responses={
+            200: OpenApiResponse(
+                response=SlotSerializer(many=True),
+                description='Успешный запрос',
+                examples=[
+                    OpenApiExample(
+                        'Успешный запрос',
+                        value={"message": "Слоты успешно созданы",
+                               "data": [
+                                   {
+                                       "id": 17,
+                                       "date": "2024-09-22",
+                                       "start_time": "13:00:00",
+                                       "end_time": "13:30:00",
+                                       "duration": "00:30:00",
+                                       "context": None
+                                   },
+                                   {
+                                       "id": 18,
+                                       "date": "2024-09-22",
+                                       "start_time": "14:00:00",
+                                       "end_time": "14:30:00",
+                                       "duration": "00:30:00",
+                                       "context": None
+                                   }
+                               ]
+                               }
+                    )
+                ]
+            ),
+            400: OpenApiResponse(
+                response=BulkSlotSerializer,
+                description='Неверный запрос',
+                examples=[
+                    OpenApiExample(
+                        'Пересечение слотов',
+                        value={
+                            'slots': [
+                                {},
+                                {'detail': ['Время слота пересекается с другим слотом в запросе']},
+                                {'detail': ['Время слота пересекается с другим слотом в запросе',
+                                            'Время слота пересекается с другим слотом']}
+                            ]
+                        }
+                    )
+                ]
+            )
+        },
+        examples=[
+            OpenApiExample(
+                'Пример запроса',
+                description='Пример запроса',
+                value={'slots': [
+                    {'date': '2024-09-05', 'start_time': '13:00', 'end_time': '13:30'},
+                    {'date': '2024-09-05', 'start_time': '14:00', 'end_time': '14:30', 'context': 'Some context here'}
+                ]},
+                status_codes=[str(status.HTTP_202_ACCEPTED)],
+            )
+        ],
+        tags=['For specialist']
+    )
+    def post(self, request: Request) -> Response:
+        serializer = self.serializer_class(data=request.data, context={'request': request})
+        if serializer.is_valid():
+            try:
+                slots = serializer.save()
+            except ValidationError as e:
+                logger.error(f'Bulk creating slots request failed validation: {e.detail}')
+                return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+            logger.info(f'User {request.user} has created {len(slots)} slots')
+            return Response({'message': 'Слоты успешно созданы', 'data': SlotSerializer(slots, many=True).data},
+                            status=status.HTTP_200_OK)
+        logger.error(f'Bulk creating slots request failed validation: {serializer.errors}')
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class CreateAvailabilityRuleAPIView(APIView):
+    permission_classes = [IsSpecialistUser]
+    serializer_class = AvailabilityRuleSerializer
+
+    @extend_schema(
+        summary='Создание правила расписания',
+        description='Метод для создания специалистом повторяющегося расписания. Слоты по правилу не сохраняются '
+                    'в БД, а показываются клиентам как виртуальные и создаются только при записи на консультацию. '
+                    'weekdays - дни недели от 0 (понедельник) до 6 (воскресенье)',
+        request=AvailabilityRuleSerializer,
+        responses={
+            200: OpenApiResponse(
+                response=AvailabilityRuleSerializer,
+                description='Успешный запрос',
+                examples=[
+                    OpenApiExample(
+                        'Успешный запрос',
+                        value={"message": "Правило успешно создано",
+                               "data": {
+                                   "id": 3,
+                                   "weekdays": [0, 2],
+                                   "start_time": "10:00:00",
+                                   "end_time": "13:00:00",
+                                   "slot_duration": "00:30:00",
+                                   "start_date": "2024-09-02",
+                                   "end_date": "2024-12-31",
+                                   "context": None
+                               }
+                               }
+                    )
+                ]
+            ),
+            400: OpenApiResponse(
+                response=AvailabilityRuleSerializer,
+                description='Неверный запрос',
+                examples=[
+                    OpenApiExample(
+                        'Пересечение с другим правилом',
+                        value={'detail': ['Правило пересекается с другим правилом']}
+                    ),
+                    OpenApiExample(
+                        'Некорректная длительность',
+                        value={'detail': ['Длительность слота должна укладываться в окно правила']}
+                    )
+                ]
+            )
+        },
+        examples=[
+            OpenApiExample(
+                'Пример запроса',
+                description='Понедельник и среда с 10:00 до 13:00 по 30 минут до конца года',
+                value={'weekdays': [0, 2],
+                       'start_time': '10:00',
+                       'end_time': '13:00',
+                       'slot_duration': '00:30:00',
+                       'start_date': '2024-09-02',
+                       'end_date': '2024-12-31'},
+                status_codes=[str(status.HTTP_202_ACCEPTED)],
+            )
+        ],
+        tags=['For specialist']
+    )
+    def post(self, request: Request) -> Response:
+        serializer = self.serializer_class(data=request.data, context={'request': request})
+        if serializer.is_valid():
+            rule = serializer.save(specialist=request.user)
+            logger.info(f'Availability rule with id = {rule.id} has been created')
+            return Response({'message': 'Правило успешно создано', 'data': serializer.data}, status=status.HTTP_200_OK)
+        logger.error(f'Creating availability rule request failed validation: {serializer.errors}')
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@extend_schema_view(
+    get=extend_schema(
+        summary='Получение правил расписания',
+        description='Получение специалистом всех личных правил расписания',
+        tags=['For specialist'],
+    )
+)
+class AvailabilityRuleListView(ListAPIView):
+    serializer_class = AvailabilityRuleSerializer
+    permission_classes = [IsSpecialistUser]
+
+    def get_queryset(self) -> QuerySet(AvailabilityRule):
+        return AvailabilityRule.objects.filter(specialist=self.request.user).order_by('start_date', 'start_time')
+
+
+class AvailabilityRuleDeleteAPIView(APIView):
+    permission_classes = [IsSpecialistUser]
+
+    @extend_schema(
+        summary='Удаление правила расписания',
+        description='Удаление правила по id. Слоты, на которые уже записались клиенты, остаются',
+        request=None,
+        responses={
+            200: OpenApiResponse(
+                description='Успешный запрос',
+                examples=[OpenApiExample('Успешный запрос', value={'message': 'Правило успешно удалено'})]
+            ),
+            404: OpenApiResponse(
+                description='Не найдено',
+                examples=[OpenApiExample('Не найдено', value={'detail': 'Вашего правила с таким id не существует'})]
+            )
+        },
+        tags=['For specialist']
+    )
+    def delete(self, request: Request, id: int) -> Response:
+        deleted, _ = AvailabilityRule.objects.filter(id=id, specialist=request.user).delete()
+        if not deleted:
+            return Response({'detail': 'Вашего правила с таким id не существует'}, status=status.HTTP_404_NOT_FOUND)
+        logger.info(f'User {request.user} has deleted availability rule with id = {id}')
+        return Response({'message': 'Правило успешно удалено'}, status=status.HTTP_200_OK)
+
+
 @extend_schema_view(
     get=extend_schema(
         summary='Получение всех слотов',
@@ -360,18 +677,22 @@ class CreateSlotAPIView(APIView):
         }
     )
 )
-class SpecialistSlotListView(ListAPIView):
+class SpecialistSlotListView(VersionedCacheListMixin, FastListMixin, ListAPIView):
     serializer_class = SpecialistSlotListSerializer
+    list_rows = SpecialistSlotRows
     permission_classes = [IsSpecialistUser]
+    pagination_class = SlotCursorPagination
+    cache_per_specialist = True
 
     def get_queryset(self) -> QuerySet(Slot):
-        return Slot.objects.filter(specialist=self.request.user)
+        return Slot.objects.filter(specialist=self.request.user).for_specialist_list()
 
 
 @extend_schema_view(
     get=extend_schema(
         summary='Получение всех слотов',
-        description='Получение клиентом всех доступных для записи слотов',
+        description='Получение клиентом всех доступных для записи слотов, включая виртуальные слоты из правил '
+                    'расписания специалистов (id = null, rule_id указывает на правило)',
         tags=['For client'],
         responses={
             200: OpenApiResponse(
@@ -386,7 +707,20 @@ class SpecialistSlotListView(ListAPIView):
                                "start_time": "12:00:00",
                                "end_time": "13:00:00",
                                "duration": "01:00:00",
-                               "context": "Some context here"
+                               "context": "Some context here",
+                               "rule_id": None
+                               }
+                    ),
+                    OpenApiExample(
+                        'Виртуальный слот',
+                        value={"id": None,
+                               "specialist_username": "user3",
+                               "date": "2024-09-23",
+                               "start_time": "10:30:00",
+                               "end_time": "11:00:00",
+                               "duration": "00:30:00",
+                               "context": None,
+                               "rule_id": 3
                                }
                     )
                 ]
@@ -394,17 +728,37 @@ class SpecialistSlotListView(ListAPIView):
         }
     )
 )
-class ClientSlotListView(ListAPIView):
+class ClientSlotListView(VersionedCacheListMixin, FastListMixin, AsyncListAPIView):
     serializer_class = ClientSlotListSerializer
+    list_rows = ClientSlotRows
+    # виртуальные слоты из правил разворачиваются и сливаются только постранично
+    stream_query_param = None
     permission_classes = [IsClientUser]
+    # страница сливает реальные слоты с виртуальными, развёрнутыми из правил расписания
+    pagination_class = ClientSlotCursorPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ClientSlotFilter
 
     def get_queryset(self) -> QuerySet(Slot):
+        return Slot.objects.available_for_booking().for_client_list()
+
+    def get_filterset(self) -> ClientSlotFilter:
+        # тот же набор фильтров, что DjangoFilterBackend применяет к реальным слотам. Пагинация применяет его
+        # к виртуальным слотам из правил. Ошибки фильтров бэкенд уже вернул до пагинации
+        filterset = DjangoFilterBackend().get_filterset(self.request, self.get_queryset(), self)
+        filterset.is_valid()
+        return filterset
+
+    def get_cache_timeout(self) -> int:
+        # страница должна перестать отдаваться из кэша в момент, когда начнётся самый ранний слот на ней
+        timeout = super().get_cache_timeout()
         now = timezone.now()
-        # фильтруем, чтобы либо дата была больше сегодняшней, либо сегодня, но время старта больше текущего времени
-        return Slot.objects.filter(
-            Q(is_available=True) &
-            (Q(date__gt=now.date()) | Q(date=now.date(), start_time__gte=now.time()))
-        )
+        # на странице словари из .values() и виртуальные слоты из правил
+        for slot in self.paginator.page:
+            starts_at = datetime.combine(field_value(slot, 'date'), field_value(slot, 'start_time'),
+                                         tzinfo=now.tzinfo)
+            timeout = min(timeout, math.ceil((starts_at - now).total_seconds()))
+        return timeout
 
 
 class ClientConsultationAPIView(APIView):
@@ -413,7 +767,8 @@ class ClientConsultationAPIView(APIView):
 
     @extend_schema(
         summary='Создание запроса на консультацию',
-        description='Метод для создания клиентом запроса на консультацию по id свободного слота',
+        description='Метод для создания клиентом запроса на консультацию по id свободного слота. '
+                    'Для виртуального слота из правила расписания вместо slot_id передаются rule_id, date и start_time',
         request=ConsultationSerializer,
         responses={
             200: OpenApiResponse(
@@ -474,27 +829,52 @@ class ClientConsultationAPIView(APIView):
                 description='Пример запроса',
                 value={'slot_id': 1},
                 status_codes=[str(status.HTTP_202_ACCEPTED)],
+            ),
+            OpenApiExample(
+                'Запрос на виртуальный слот',
+                description='Запись на слот из правила расписания',
+                value={'rule_id': 3, 'date': '2024-09-23', 'start_time': '10:30'},
+                status_codes=[str(status.HTTP_202_ACCEPTED)],
             )
         ],
         tags=['For client']
     )
     def post(self, request: Request) -> Response:
-        serializer = self.serializer_class(data=request.data)
+        data = request.data
+        if 'rule_id' in request.data:
+            # запись на виртуальный слот из правила расписания: реальный слот создаётся только сейчас
+            virtual_serializer = VirtualSlotSerializer(data=request.data)
+            if not virtual_serializer.is_valid():
+                logger.error(f'User {request.user.username} failed to book a virtual slot: {virtual_serializer.errors}')
+                return Response(virtual_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                slot = virtual_serializer.save()
+            except ValidationError as e:
+                logger.error(f'User {request.user.username} failed to book a virtual slot: {e.detail}')
+                return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+            data = {'slot_id': slot.id}
+
+        serializer = self.serializer_class(data=data)
         if serializer.is_valid():
             slot_id = serializer.validated_data['slot_id']
 
-            try:
-                slot = Slot.objects.get(id=slot_id)
-            except Slot.DoesNotExist:
+            # слот и обе проверки занятости читаются одним запросом
+            slot = Slot.objects.select_related('specialist').annotate(
+                has_accepted=Exists(Consultation.objects.filter(slot=OuterRef('pk'), status='Accepted',
+                                                                is_canceled=False)),
+                already_requested=Exists(Consultation.objects.filter(slot=OuterRef('pk'), client=request.user)),
+            ).filter(id=slot_id).first()
+
+            if slot is None:
                 logger.error(f'Slot with id={slot_id} does not exist.')
                 return Response({'detail': 'Слота с таким id не существует'}, status=status.HTTP_404_NOT_FOUND)
 
-            if Consultation.objects.filter(slot_id=slot_id, status='Accepted').exists():
+            if slot.has_accepted:
                 logger.error(f'Failed by user {request.user.username} for slot {slot_id}')
                 return Response({'detail': 'Для данного слота уже существует подтверждённая консультация'},
                                 status=status.HTTP_400_BAD_REQUEST)
 
-            if Consultation.objects.filter(slot_id=slot_id, client=request.user):
+            if slot.already_requested:
                 logger.error(f'Failed by User {request.user.username} for slot {slot_id}')
                 return Response({'detail': 'Вы уже отправили запрос на консультацию на эту дату'},
                                 status=status.HTTP_400_BAD_REQUEST)
@@ -510,7 +890,17 @@ class ClientConsultationAPIView(APIView):
                 'slot': slot,
                 'client': request.user
             }
-            consultation = Consultation.objects.create(**consultation_data)
+            # Единственная запись - один INSERT. Дубль от параллельного запроса того же клиента
+            # отсекает ограничение unique_consultation_slot_client, поэтому блокировка слота не нужна
+            try:
+                consultation = Consultation.objects.create(**consultation_data)
+            except IntegrityError as e:
+                if 'unique_consultation_slot_client' not in str(e):
+                    raise
+                logger.error(f'Failed by User {request.user.username} for slot {slot_id}')
+                return Response({'detail': 'Вы уже отправили запрос на консультацию на эту дату'},
+                                status=status.HTTP_400_BAD_REQUEST)
+
             consultation_serializer = ConsultationSerializer(consultation)
             logger.info(f'User {request.user.username} has created a consultation with id = {consultation.id}')
             return Response(
@@ -547,13 +937,15 @@ class ClientConsultationAPIView(APIView):
         }
     )
 )
-class SpecialistConsultationListView(ListAPIView):
+class SpecialistConsultationListView(FastListMixin, AsyncListAPIView):
     serializer_class = SpecialistConsultationListSerializer
+    list_rows = SpecialistConsultationRows
     permission_classes = [IsSpecialistUser]
+    pagination_class = ConsultationCursorPagination
 
     def get_queryset(self) -> QuerySet(Consultation):
         user = self.request.user
-        return Consultation.objects.filter(slot__specialist=user)
+        return Consultation.objects.filter(slot__specialist=user).for_specialist_list()
 
 
 @extend_schema_view(
@@ -583,13 +975,15 @@ class SpecialistConsultationListView(ListAPIView):
         }
     )
 )
-class ClientConsultationListView(ListAPIView):
+class ClientConsultationListView(FastListMixin, AsyncListAPIView):
     serializer_class = ClientConsultationListSerializer
+    list_rows = ClientConsultationRows
     permission_classes = [IsClientUser]
+    pagination_class = ConsultationCursorPagination
 
     def get_queryset(self) -> QuerySet(Consultation):
         user = self.request.user
-        return Consultation.objects.filter(client=user)
+        return Consultation.objects.filter(client=user).for_client_list()
 
 
 class UpdateStatusConsultationAPIView(APIView):
@@ -651,10 +1045,21 @@ class UpdateStatusConsultationAPIView(APIView):
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid():
             consultation_id = serializer.validated_data['consultation_id']
-            consultation = Consultation.objects.filter(id=consultation_id).first()
-            if not consultation or consultation.slot.specialist != request.user:
+            # слот и клиент (email для уведомления) читаются тем же запросом, что и консультация
+            consultation = Consultation.objects.select_related('slot', 'client').filter(id=consultation_id).first()
+            if not consultation or consultation.slot.specialist_id != request.user.id:
                 return Response({'detail': 'Вашей консультации с таким id не существует'}, status=status.HTTP_404_NOT_FOUND)
-            serializer.update(consultation, serializer.validated_data)
+            try:
+                with transaction.atomic():
+                    serializer.update(consultation, serializer.validated_data)
+            except (ValidationError, IntegrityError) as e:
+                # другая консультация на этот слот уже подтверждена: слот уже занят (ValidationError сериализатора)
+                # или, если занятость слота разошлась с консультациями, сработало ограничение в БД
+                if isinstance(e, IntegrityError) and 'unique_accepted_consultation_slot' not in str(e):
+                    raise
+                logger.error(f'Failed to accept consultation {consultation_id}: slot already has an accepted one')
+                return Response({'detail': 'Для данного слота уже существует подтверждённая консультация'},
+                                status=status.HTTP_400_BAD_REQUEST)
             logger.info(f'Consultation with id = {consultation_id} has been updated successfully')
             return Response({'message': 'Статус консультации обновлён'}, status=status.HTTP_200_OK)
         logger.error(f'Invalid data received for consultation update: {serializer.errors}')
@@ -812,7 +1217,8 @@ class CancelConsultationAPIView(APIView):
         serializer = self.serializer_class(data=request.data)
         if serializer.is_valid():
             consultation_id = serializer.validated_data['consultation_id']
-            consultation = Consultation.objects.filter(id=consultation_id, client=request.user).first()
+            consultation = Consultation.objects.select_related('slot').filter(id=consultation_id,
+                                                                              client=request.user).first()
             if not consultation:
                 return Response(
                     {'detail': 'Вашей консультации с таким id не существует'},
@@ -0,0 +1,42 @@
+# Конфигурация gunicorn для продакшена:  gunicorn -c gunicorn.conf.py
+#
+# GUNICORN_WORKER_MODE=wsgi (по умолчанию) - процессы gthread с потоками, синхронные представления
+# выполняются в потоках, постоянные соединения с БД (CONN_MAX_AGE) переиспользуются потоками.
+# Асинхронные списки (слоты и консультации клиента, консультации специалиста) под WSGI выполняются через
+# async_to_sync: цикл событий на запрос и переходы между потоками, около 0.3 мс на запрос.
+# GUNICORN_WORKER_MODE=asgi - процессы uvicorn, по одному циклу событий на ядро; асинхронные списки
+# обслуживают много медленных клиентов без потока на запрос, но соединения с БД не переиспользуются
+# (CONN_MAX_AGE = 0). Режимы сравниваются нагрузочным тестом benchmarks/load_test.py, результаты в README.
+# Число процессов можно задать явно через WEB_CONCURRENCY, потоков - через GUNICORN_THREADS.
+import os
+
+worker_mode = os.getenv('GUNICORN_WORKER_MODE', 'wsgi')
+# ядра, доступные процессу (в контейнере с ограничением cpuset это меньше, чем ядер на машине)
+cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+
+if worker_mode == 'asgi':
+    wsgi_app = 'Consultation_API.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    # цикл событий не блокируется ожиданием БД и клиентов, больше процессов, чем ядер, не нужно
+    workers = int(os.getenv('WEB_CONCURRENCY', cores))
+else:
+    wsgi_app = 'Consultation_API.wsgi:application'
+    worker_class = 'gthread'
+    # классическая формула 2 * ядра + 1: пока одни процессы ждут БД и Redis, другие занимают CPU
+    workers = int(os.getenv('WEB_CONCURRENCY', 2 * cores + 1))
+    threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+# перезапуск процесса после N запросов (с разбросом, чтобы процессы не перезапускались одновременно)
+# ограничивает рост памяти из-за фрагментации и утечек в зависимостях
+max_requests = 2000
+max_requests_jitter = 200
+
+timeout = 30
+graceful_timeout = 30
+# keep-alive для соединений от балансировщика
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'